@@ -0,0 +1,178 @@
+"""Admission control for the booking endpoints.
+
+Each request must take a token from its user's bucket and its event's bucket,
+and is shed outright while too many bookings are in flight or a booking stage
+has recently been slow. Rejections are cheap 429s that tell the client when
+to retry, so overload never reaches EventService or the database.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at `rate` tokens per second"""
+
+    def __init__(self, rate, capacity, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.tokens = capacity
+        self.updated = clock()
+
+    def try_acquire(self):
+        """Take one token; return (admitted, seconds until a token is available)"""
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True, 0
+        return False, (1 - self.tokens) / self.rate
+
+class KeyedRateLimiter:
+    """One token bucket per key, with least recently used keys evicted.
+
+    Evicting a bucket only forgets its history, which at worst gives that
+    key a fresh burst, so memory stays bounded under many distinct keys.
+    """
+
+    def __init__(self, rate, capacity, max_keys=100000, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.max_keys = max_keys
+        self.clock = clock
+        self.buckets = OrderedDict()
+        self.lock = threading.Lock()
+
+    def try_acquire(self, key):
+        if not self.rate:
+            return True, 0
+        with self.lock:
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                bucket = self.buckets[key] = TokenBucket(self.rate, self.capacity, self.clock)
+                if len(self.buckets) > self.max_keys:
+                    self.buckets.popitem(last=False)
+            else:
+                self.buckets.move_to_end(key)
+            return bucket.try_acquire()
+
+class AdmissionController:
+    def __init__(self, user_rate=5, user_burst=10, event_rate=200, event_burst=400,
+                 max_in_flight=100, latency_threshold=2.0, latency_window=5.0,
+                 clock=time.monotonic):
+        self.user_limiter = KeyedRateLimiter(user_rate, user_burst, clock=clock)
+        self.event_limiter = KeyedRateLimiter(event_rate, event_burst, clock=clock)
+        self.max_in_flight = max_in_flight
+        self.latency_threshold = latency_threshold
+        self.latency_window = latency_window
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        # stage -> [smoothed latency in seconds, time of last sample]
+        self.stage_latency = {}
+        self.counters = {
+            'admitted': 0,
+            'rejected_user_rate': 0,
+            'rejected_event_rate': 0,
+            'shed_in_flight': 0,
+            'shed_latency': 0
+        }
+
+    def _count(self, name):
+        with self.lock:
+            self.counters[name] += 1
+
+    def slow_stage(self):
+        """Name of a stage whose recent latency exceeds the threshold, if any.
+
+        Samples older than the latency window are ignored, so shedding stops
+        on its own once no slow requests are completing.
+        """
+        if not self.latency_threshold:
+            return None
+        now = self.clock()
+        with self.lock:
+            for stage, (latency, sampled_at) in self.stage_latency.items():
+                if latency > self.latency_threshold and now - sampled_at < self.latency_window:
+                    return stage
+        return None
+
+    def admit(self, user_id, event_id):
+        """Return (admitted, reason, retry_after_seconds) and reserve an in-flight slot"""
+        with self.lock:
+            if self.max_in_flight and self.in_flight >= self.max_in_flight:
+                self.counters['shed_in_flight'] += 1
+                return False, 'Too many bookings in progress', 1
+
+        if self.slow_stage():
+            self._count('shed_latency')
+            return False, 'Booking service is overloaded', 1
+
+        admitted, retry_after = self.user_limiter.try_acquire(user_id)
+        if not admitted:
+            self._count('rejected_user_rate')
+            return False, 'Too many booking requests for this user', retry_after
+
+        admitted, retry_after = self.event_limiter.try_acquire(event_id)
+        if not admitted:
+            self._count('rejected_event_rate')
+            return False, 'Too many booking requests for this event', retry_after
+
+        with self.lock:
+            # Re-check under the lock: other requests may have been admitted
+            # while this one was taking its tokens
+            if self.max_in_flight and self.in_flight >= self.max_in_flight:
+                self.counters['shed_in_flight'] += 1
+                return False, 'Too many bookings in progress', 1
+            self.in_flight += 1
+            self.counters['admitted'] += 1
+        return True, None, 0
+
+    def release(self):
+        with self.lock:
+            self.in_flight -= 1
+
+    def record_latency(self, stage, seconds, smoothing=0.2):
+        now = self.clock()
+        with self.lock:
+            previous = self.stage_latency.get(stage)
+            if previous is None:
+                latency = seconds
+            else:
+                latency = previous[0] + smoothing * (seconds - previous[0])
+            self.stage_latency[stage] = [latency, now]
+
+    @contextmanager
+    def stage(self, name):
+        """Time a block of work as one booking stage"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_latency(name, time.perf_counter() - started)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'in_flight': self.in_flight,
+                'counters': dict(self.counters),
+                'stage_latency_ms': {
+                    stage: round(latency * 1000, 1)
+                    for stage, (latency, _) in self.stage_latency.items()
+                },
+                'limits': {
+                    'user_rate': self.user_limiter.rate,
+                    'user_burst': self.user_limiter.capacity,
+                    'event_rate': self.event_limiter.rate,
+                    'event_burst': self.event_limiter.capacity,
+                    'max_in_flight': self.max_in_flight,
+                    'latency_threshold_ms': self.latency_threshold * 1000
+                }
+            }
+
+def retry_after_header(seconds):
+    """Retry-After takes whole seconds; never tell clients to retry immediately"""
+    return str(max(1, math.ceil(seconds)))
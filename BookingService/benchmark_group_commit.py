@@ -0,0 +1,112 @@
+"""Throughput and latency of booking writes with and without group commit.
+
+Each simulated request performs the two writes of a booking, the PENDING
+insert and the confirmation (payment, status change and saga steps), the
+same way book_tickets does, through commit_unit. Run against the database
+in --database-url (PostgreSQL is what matters; the default is a throwaway
+SQLite file) at several concurrency levels:
+
+    python benchmark_group_commit.py --database-url postgresql://... --concurrency 1 8 32 64
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+os.environ.setdefault('SAGA_WORKERS', '0')
+
+from app import (create_app, commit_unit, db, record_status_transition, start_confirmation_saga,
+                 Booking, Payment)
+
+EVENT_ID = 'benchmark-group-commit'
+
+def book_once(index):
+    def insert_booking():
+        booking = Booking(user_id=index, event_id=EVENT_ID, tickets=1, total_price=10, status='PENDING')
+        db.session.add(booking)
+        record_status_transition(booking, None, 'PENDING')
+        return booking
+    booking = commit_unit(insert_booking, EVENT_ID)
+
+    def insert_confirmation():
+        db.session.add(booking)
+        payment = Payment(booking_id=booking.id, amount=10, payment_method='CREDIT_CARD',
+                          transaction_id=f'TXN-BENCH-{index}', status='COMPLETED')
+        db.session.add(payment)
+        record_status_transition(booking, booking.status, 'CONFIRMED')
+        booking.status = 'CONFIRMED'
+        return start_confirmation_saga(booking, payment.transaction_id, {'booking_id': booking.id})
+    commit_unit(insert_confirmation, EVENT_ID)
+
+def run(database_url, group_commit, concurrency, bookings, window_ms):
+    """Return (bookings per second, latencies in ms, average batch size)"""
+    config = {
+        'SQLALCHEMY_DATABASE_URI': database_url,
+        'GROUP_COMMIT_ENABLED': group_commit,
+        'GROUP_COMMIT_WINDOW_MS': window_ms
+    }
+    if not database_url.startswith('sqlite'):
+        # One connection per request thread plus the writer
+        config['SQLALCHEMY_ENGINE_OPTIONS'] = {'pool_size': concurrency + 1, 'max_overflow': 0}
+    app = create_app(config)
+    with app.app_context():
+        db.create_all()
+
+    per_thread = max(1, bookings // concurrency)
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(thread_index):
+        own = []
+        with app.app_context():
+            for i in range(per_thread):
+                started = time.perf_counter()
+                book_once(thread_index * per_thread + i)
+                own.append((time.perf_counter() - started) * 1000)
+        with lock:
+            latencies.extend(own)
+
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    writer = app.extensions.get('group_commit')
+    batch = writer.snapshot()['average_batch'] if writer else 1
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+    return len(latencies) / elapsed, latencies, batch
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Benchmark booking writes with and without group commit')
+    parser.add_argument('--database-url', default=None,
+                        help='Database to write to (default: a temporary SQLite file)')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32, 64],
+                        help='Concurrent request threads to test (default: 1 8 32 64)')
+    parser.add_argument('--bookings', type=int, default=2000,
+                        help='Bookings per run (default: 2000)')
+    parser.add_argument('--window-ms', type=float, default=2,
+                        help='Group commit window in milliseconds (default: 2)')
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    directory = tempfile.mkdtemp()
+
+    print(f"{'mode':<8} {'threads':>7} {'bookings/s':>11} {'p50 ms':>8} {'p99 ms':>8} {'batch':>6}")
+    for concurrency in args.concurrency:
+        for group_commit in (False, True):
+            url = args.database_url or f"sqlite:///{os.path.join(directory, f'{concurrency}-{group_commit}.db')}"
+            throughput, latencies, batch = run(url, group_commit, concurrency, args.bookings, args.window_ms)
+            print(f"{'group' if group_commit else 'direct':<8} {concurrency:>7} {throughput:>11.0f} "
+                  f"{statistics.median(latencies):>8.2f} {percentile(latencies, 0.99):>8.2f} {batch:>6.1f}")
@@ -0,0 +1,203 @@
+"""Micro-benchmarks of BookingService internals, compared with a baseline.
+
+They need no running services: models are built in memory, the user
+history query runs against an in-memory SQLite database seeded with
+bookings, and notifications go to an in-memory stand-in for the broker.
+Each benchmark calls its function `number` times per repeat, and the
+fastest repeat is kept, being the one least disturbed by the rest of the
+machine. Results are compared with the baseline file, and a benchmark
+slower than its baseline by more than --tolerance counts as a regression.
+When there is no baseline yet, the results become the baseline; it is
+kept out of git, so each machine records its own on its first run.
+
+    python benchmarks.py                  # run and compare
+    python benchmarks.py --save-baseline  # run and store as the new baseline
+    python benchmarks.py --filter to_dict
+
+Timings are only comparable on the machine that recorded the baseline.
+"""
+import argparse
+import gc
+import json
+import os
+import statistics
+import sys
+import time
+import warnings
+from collections import deque
+from datetime import datetime
+from decimal import Decimal
+
+os.environ.setdefault('SAGA_WORKERS', '0')
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks_baseline.json')
+
+# name -> (setup returning the function to time, calls per repeat)
+BENCHMARKS = {}
+
+def benchmark(number):
+    def register(setup):
+        BENCHMARKS[setup.__name__] = (setup, number)
+        return setup
+    return register
+
+def sample_booking():
+    from app import Booking
+    now = datetime(2026, 1, 1, 12, 0, 0)
+    return Booking(id=1, user_id=7, event_id='evt-bench', tickets=2, total_price=Decimal('50.00'),
+                   status='CONFIRMED', created_at=now, updated_at=now)
+
+class InMemoryBroker:
+    """Stands in for BrokerConnection, keeping the last messages"""
+
+    def __init__(self):
+        self.published = deque(maxlen=1000)
+
+    def publish(self, routing_key, body, priority=None, message_id=None):
+        self.published.append((routing_key, body, priority, message_id))
+
+    def publish_many(self, messages):
+        self.published.extend(messages)
+
+@benchmark(number=20000)
+def booking_to_dict():
+    return sample_booking().to_dict
+
+@benchmark(number=20000)
+def payment_to_dict():
+    from app import Payment
+    payment = Payment(id=1, booking_id=1, amount=Decimal('50.00'), payment_method='CREDIT_CARD',
+                      transaction_id='TXN-7-1767268800', status='COMPLETED', created_at=datetime(2026, 1, 1))
+    return payment.to_dict
+
+@benchmark(number=20000)
+def notification_payload():
+    from app import notification_envelope
+    booking = sample_booking()
+
+    def build():
+        # The CONFIRMED notification of book_tickets
+        return notification_envelope({
+            'booking_id': booking.id,
+            'user_id': booking.user_id,
+            'user_email': 'user7@example.com',
+            'event_id': booking.event_id,
+            'event_name': 'Benchmark Event',
+            'tickets': booking.tickets,
+            'total_price': float(booking.total_price),
+            'status': 'CONFIRMED',
+            'timestamp': datetime.utcnow().isoformat()
+        })
+    return build
+
+@benchmark(number=300)
+def user_bookings_query():
+    from app import create_app, db, Booking, Payment
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://'})
+    with app.app_context():
+        db.create_all()
+        # 500 users with 10 bookings each, most of them paid
+        bookings = [Booking(user_id=i % 500 + 1, event_id=f'evt-{i % 40}', tickets=1 + i % 4,
+                            total_price=Decimal('25.00'), status='CONFIRMED') for i in range(5000)]
+        db.session.add_all(bookings)
+        db.session.flush()
+        db.session.add_all(Payment(booking_id=booking.id, amount=booking.total_price, payment_method='CREDIT_CARD',
+                                   transaction_id=f'TXN-{booking.id}', status='COMPLETED')
+                           for booking in bookings if booking.id % 5)
+        db.session.commit()
+
+    client = app.test_client()
+    def query():
+        response = client.get('/api/bookings/user/42')
+        assert response.status_code == 200
+    return query
+
+@benchmark(number=20000)
+def publish_message():
+    import clients
+    from app import publish_message as publish
+    clients._broker = InMemoryBroker()
+    booking = sample_booking()
+    message = {'booking_id': booking.id, 'user_id': booking.user_id, 'event_id': booking.event_id,
+               'tickets': booking.tickets, 'status': 'CONFIRMED', 'timestamp': '2026-01-01T12:00:00'}
+    return lambda: publish(message)
+
+def measure(setup, number, repeat):
+    """Seconds per call: best and median over repeat batches of number calls"""
+    call = setup()
+    call()
+    timings = []
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            for _ in range(number):
+                call()
+            timings.append((time.perf_counter() - started) / number)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return {
+        'best_us': round(min(timings) * 1e6, 3),
+        'median_us': round(statistics.median(timings) * 1e6, 3),
+        'number': number,
+        'repeat': repeat
+    }
+
+def compare(results, baseline, tolerance):
+    """Print results next to their baseline; returns the names that regressed"""
+    regressions = []
+    print(f"{'benchmark':<22} {'best us':>10} {'baseline':>10} {'change':>8}")
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            print(f"{name:<22} {result['best_us']:>10.2f} {'-':>10} {'new':>8}")
+            continue
+        change = result['best_us'] / previous['best_us'] - 1
+        flag = ''
+        if change > tolerance:
+            regressions.append(name)
+            flag = '  ❌ regression'
+        print(f"{name:<22} {result['best_us']:>10.2f} {previous['best_us']:>10.2f} {change:>+8.1%}{flag}")
+    return regressions
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Run BookingService micro-benchmarks and compare them with a baseline')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE,
+                        help='Baseline JSON file (default: benchmarks_baseline.json)')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='Store the results as the new baseline (default: False)')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Slowdown over the baseline counted as a regression (default: 0.25)')
+    parser.add_argument('--repeat', type=int, default=7,
+                        help='Batches timed per benchmark (default: 7)')
+    parser.add_argument('--filter', default=None,
+                        help='Only run benchmarks whose name contains this')
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    # SQLAlchemy's SQLite warnings would land in the middle of the table
+    warnings.simplefilter('ignore')
+
+    results = {}
+    for name, (setup, number) in BENCHMARKS.items():
+        if args.filter and args.filter not in name:
+            continue
+        results[name] = measure(setup, number, args.repeat)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    regressions = compare(results, baseline, args.tolerance)
+
+    if args.save_baseline or not baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump({**baseline, **results}, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"Saved baseline to {args.baseline}")
+    elif regressions:
+        print(f"❌ {len(regressions)} benchmarks regressed by more than {args.tolerance:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
@@ -0,0 +1,237 @@
+"""Push booking status changes to clients waiting on them.
+
+record_status_transition notes every status change on the session. When
+the transaction commits, the changes are published as events to a hub, and
+the hub hands each event to the subscribers of its booking: the SSE and
+long-poll requests of GET /api/bookings/<id>/events. Rolled back changes
+are never published.
+
+How events reach the hub of every worker process is up to the backend:
+
+- LocalBackend delivers them in the committing process only. It is meant
+  for a single worker and for tests.
+- PostgresBackend sends them with NOTIFY inside the committing transaction,
+  so PostgreSQL delivers them exactly when the transaction commits, and
+  every worker LISTENs on a connection of its own.
+
+A subscriber is a small deque and an event, and the streams hold no
+database connection while they wait. Under a cooperative server (gunicorn
+-k gevent) the waits are greenlets rather than threads, so a worker can hold
+tens of thousands of idle streams.
+"""
+import json
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+class StreamLimitReached(Exception):
+    """The process already serves as many event streams as it allows"""
+
+class Subscription:
+    def __init__(self, hub, booking_id, max_queue=100):
+        self.hub = hub
+        self.booking_id = booking_id
+        self.events = deque(maxlen=max_queue)
+        self.ready = threading.Event()
+
+    def put(self, booking_event):
+        self.events.append(booking_event)
+        self.ready.set()
+
+    def get(self, timeout):
+        """Events published since the last call, waiting up to timeout seconds for one"""
+        self.ready.wait(timeout)
+        self.ready.clear()
+        events = []
+        while self.events:
+            events.append(self.events.popleft())
+        return events
+
+    def close(self):
+        self.hub.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class LocalBackend:
+    """Deliver events to this process only"""
+
+    def start(self, dispatch):
+        self.dispatch = dispatch
+
+    def ensure_listening(self):
+        pass
+
+    def before_commit(self, session, events):
+        pass
+
+    def after_commit(self, events):
+        for booking_event in events:
+            self.dispatch(booking_event)
+
+class PostgresBackend:
+    """Fan events out to every worker with PostgreSQL LISTEN/NOTIFY.
+
+    database_urls are the databases bookings are committed to: the primary,
+    or every shard.
+    """
+
+    def __init__(self, database_urls, channel='booking_events', reconnect_delay=5):
+        self.database_urls = database_urls
+        self.channel = channel
+        self.reconnect_delay = reconnect_delay
+        self.lock = threading.Lock()
+        self.threads = []
+
+    def start(self, dispatch):
+        self.dispatch = dispatch
+
+    def ensure_listening(self):
+        # Started with the first stream so forked workers each get their own
+        # listeners, and processes nobody streams from never LISTEN
+        if self.threads and all(thread.is_alive() for thread in self.threads):
+            return
+        with self.lock:
+            if self.threads and all(thread.is_alive() for thread in self.threads):
+                return
+            self.threads = [
+                threading.Thread(target=self._listen, args=(url,), name='booking-events-listener', daemon=True)
+                for url in self.database_urls
+            ]
+            for thread in self.threads:
+                thread.start()
+
+    def before_commit(self, session, events):
+        # One statement however many bookings changed
+        session.execute(
+            text('SELECT pg_notify(:channel, payload) FROM unnest(CAST(:payloads AS text[])) AS payload'),
+            {'channel': self.channel, 'payloads': [json.dumps(booking_event) for booking_event in events]}
+        )
+
+    def after_commit(self, events):
+        # Delivered back to this process by its own listener
+        pass
+
+    def _listen(self, url):
+        import select
+        import psycopg2
+        while True:
+            connection = None
+            try:
+                connection = psycopg2.connect(url)
+                connection.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                connection.cursor().execute(f'LISTEN {self.channel}')
+                while True:
+                    if select.select([connection], [], [], 30) == ([], [], []):
+                        continue
+                    connection.poll()
+                    while connection.notifies:
+                        self.dispatch(json.loads(connection.notifies.pop(0).payload))
+            except Exception as e:
+                print(f"Booking event listener lost its connection: {e}")
+                time.sleep(self.reconnect_delay)
+            finally:
+                if connection is not None:
+                    connection.close()
+
+class BookingEventHub:
+    def __init__(self, backend=None, max_streams=20000):
+        self.backend = backend or LocalBackend()
+        self.max_streams = max_streams
+        self.lock = threading.Lock()
+        # booking_id -> set of Subscriptions
+        self.subscribers = {}
+        self.streams = 0
+        self.stats = {'published': 0, 'delivered': 0}
+        self.backend.start(self.dispatch)
+
+    def subscribe(self, booking_id):
+        self.backend.ensure_listening()
+        with self.lock:
+            if self.streams >= self.max_streams:
+                raise StreamLimitReached(f'{self.streams} event streams open')
+            subscription = Subscription(self, booking_id)
+            self.subscribers.setdefault(booking_id, set()).add(subscription)
+            self.streams += 1
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            subscriptions = self.subscribers.get(subscription.booking_id)
+            if subscriptions is None or subscription not in subscriptions:
+                return
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self.subscribers[subscription.booking_id]
+            self.streams -= 1
+
+    def dispatch(self, booking_event):
+        """Hand a committed event to the subscribers of its booking"""
+        with self.lock:
+            self.stats['published'] += 1
+            subscriptions = list(self.subscribers.get(booking_event['booking_id'], ()))
+            self.stats['delivered'] += len(subscriptions)
+        for subscription in subscriptions:
+            subscription.put(booking_event)
+
+    def snapshot(self):
+        with self.lock:
+            return {'streams': self.streams, 'bookings': len(self.subscribers), **self.stats}
+
+def make_event(booking, old_status, new_status):
+    return {
+        'booking_id': booking.id,
+        'event_id': booking.event_id,
+        'status': new_status,
+        'previous_status': old_status,
+        'timestamp': datetime.utcnow().isoformat()
+    }
+
+def note_transition(session, booking, old_status, new_status):
+    """Publish a status change when session commits; booking needs an id and event_id"""
+    session.info.setdefault('booking_transitions', []).append((booking, old_status, new_status))
+
+def _current_hub():
+    from flask import current_app, has_app_context
+    if not has_app_context():
+        return None
+    return current_app.extensions.get('booking_events')
+
+def _before_commit(session):
+    if session.in_nested_transaction():
+        return
+    transitions = session.info.pop('booking_transitions', None)
+    hub = _current_hub()
+    if not transitions or hub is None:
+        return
+    # New bookings get their ids here
+    session.flush()
+    events = [make_event(booking, old_status, new_status) for booking, old_status, new_status in transitions]
+    hub.backend.before_commit(session, events)
+    session.info['booking_events'] = events
+
+def _after_commit(session):
+    events = session.info.pop('booking_events', None)
+    hub = _current_hub()
+    if events and hub is not None:
+        hub.backend.after_commit(events)
+
+def _after_soft_rollback(session, previous_transaction):
+    if not previous_transaction.nested:
+        session.info.pop('booking_transitions', None)
+        session.info.pop('booking_events', None)
+
+def install_session_hooks():
+    """Publish the status changes of every session when it commits"""
+    if event.contains(Session, 'before_commit', _before_commit):
+        return
+    event.listen(Session, 'before_commit', _before_commit)
+    event.listen(Session, 'after_commit', _after_commit)
+    event.listen(Session, 'after_soft_rollback', _after_soft_rollback)
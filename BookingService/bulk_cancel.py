@@ -0,0 +1,260 @@
+"""Cancel every booking of a cancelled event.
+
+Cancelling bookings one at a time through PUT /api/bookings/<id>/cancel
+costs a commit, an EventService round trip and a notification per booking.
+An event cancellation works through the event's active (PENDING and
+CONFIRMED) bookings in chunks instead. Each chunk is one transaction that
+cancels up to chunk_size bookings with a single UPDATE ... RETURNING,
+applies them to the event's sales summary at once, refunds their payments,
+skips their outstanding saga steps and records their ids on the job.
+EventService is not called: the event no longer sells tickets, so there is
+no inventory to give back. The chunk's notifications are then published in
+one batch over the shared RabbitMQ connection, with the recipients' emails
+looked up together, and the ids are cleared.
+
+The event_cancellations row holds the job's progress and works as a lease.
+A runner claims it with a conditional update and refreshes it with every
+chunk, so one process at a time works on an event, and a job whose runner
+died can be claimed again once the lease has run out. A resumed job first
+publishes the notifications of a chunk that was committed but not yet
+notified, so every booking is notified at least once, then carries on with
+the bookings that are still active.
+"""
+import argparse
+import json
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+
+from sqlalchemy import or_, text
+from sqlalchemy.exc import IntegrityError
+
+ACTIVE_STATUSES = ('PENDING', 'CONFIRMED')
+
+# The old status comes from the subquery, since RETURNING only sees new values
+CANCEL_CHUNK_SQL = """
+    UPDATE bookings AS b SET status = 'CANCELLED', updated_at = :now
+    FROM (
+        SELECT id, status FROM bookings
+        WHERE event_id = :event_id AND status IN ('PENDING', 'CONFIRMED')
+        ORDER BY id LIMIT :limit
+        FOR UPDATE
+    ) AS old
+    WHERE b.id = old.id
+    RETURNING b.id, b.user_id, b.event_id, b.tickets, b.total_price, old.status AS old_status
+"""
+
+def cancel_bookings(event_id, limit):
+    """Cancel up to limit active bookings of an event in the current transaction.
+
+    Returns rows of id, user_id, event_id, tickets, total_price and old_status.
+    """
+    from app import db, Booking
+
+    now = datetime.utcnow()
+    if db.session.connection().dialect.name == 'postgresql':
+        return db.session.execute(text(CANCEL_CHUNK_SQL), {'event_id': event_id, 'limit': limit, 'now': now}).all()
+
+    # Without UPDATE ... RETURNING, read the chunk first in the same transaction
+    rows = db.session.query(
+        Booking.id, Booking.user_id, Booking.event_id, Booking.tickets, Booking.total_price,
+        Booking.status.label('old_status')
+    ).filter(
+        Booking.event_id == event_id,
+        Booking.status.in_(ACTIVE_STATUSES)
+    ).order_by(Booking.id).limit(limit).with_for_update().all()
+    if rows:
+        Booking.query.filter(Booking.id.in_([row.id for row in rows])).update(
+            {'status': 'CANCELLED', 'updated_at': now}, synchronize_session=False
+        )
+    return rows
+
+class BulkCanceller:
+    def __init__(self, app, chunk_size=1000, lease=60):
+        self.app = app
+        self.chunk_size = chunk_size
+        self.lease = lease
+        self.lock = threading.Lock()
+        # event_id -> thread cancelling it in this process
+        self.threads = {}
+
+    def start(self, event_id):
+        """Claim an event's cancellation and run it in a background thread.
+
+        Returns False if it is already running here or in another process.
+        Must be called in an app context.
+        """
+        with self.lock:
+            thread = self.threads.get(event_id)
+            if thread is not None and thread.is_alive():
+                return False
+            if not self.claim(event_id):
+                return False
+            thread = threading.Thread(target=self._run_logged, args=(event_id,),
+                                      name=f'bulk-cancel-{event_id}', daemon=True)
+            self.threads[event_id] = thread
+            thread.start()
+            return True
+
+    def wait(self, event_id, timeout=None):
+        thread = self.threads.get(event_id)
+        if thread is not None:
+            thread.join(timeout)
+
+    def claim(self, event_id):
+        """Create or take over the event's job; True if the caller now owns it.
+
+        Must be called in an app context.
+        """
+        from app import db, use_event_shard, Booking, EventCancellation
+
+        use_event_shard(event_id)
+        now = datetime.utcnow()
+        remaining = Booking.query.filter(
+            Booking.event_id == event_id,
+            Booking.status.in_(ACTIVE_STATUSES)
+        ).count()
+
+        if EventCancellation.query.get(event_id) is None:
+            db.session.add(EventCancellation(event_id=event_id, total=remaining, started_at=now, updated_at=now))
+            try:
+                db.session.commit()
+                return True
+            except IntegrityError:
+                # Created by another process just now
+                db.session.rollback()
+                return False
+
+        claimed = EventCancellation.query.filter(
+            EventCancellation.event_id == event_id,
+            or_(EventCancellation.status != 'RUNNING',
+                EventCancellation.updated_at < now - timedelta(seconds=self.lease))
+        ).update({
+            'status': 'RUNNING',
+            'total': EventCancellation.cancelled + remaining,
+            'last_error': None,
+            'finished_at': None,
+            'updated_at': now
+        }, synchronize_session=False)
+        db.session.commit()
+        return bool(claimed)
+
+    def run(self, event_id, on_chunk=None):
+        """Cancel the bookings of a claimed event in this thread and return its progress"""
+        from app import db, use_event_shard, Booking, EventCancellation
+
+        with self.app.app_context():
+            use_event_shard(event_id)
+            try:
+                job = EventCancellation.query.get(event_id)
+                if job.unnotified:
+                    ids = json.loads(job.unnotified)
+                    self._notify(job, Booking.query.filter(Booking.id.in_(ids)).all())
+                while True:
+                    rows = self._cancel_chunk(job)
+                    if not rows:
+                        break
+                    self._notify(job, rows)
+                    if on_chunk is not None:
+                        on_chunk(job.to_dict())
+                job.status = 'DONE'
+                job.finished_at = datetime.utcnow()
+                db.session.commit()
+                return job.to_dict()
+            except Exception as e:
+                db.session.rollback()
+                job = EventCancellation.query.get(event_id)
+                job.status = 'FAILED'
+                job.last_error = str(e)
+                db.session.commit()
+                raise
+
+    def _run_logged(self, event_id):
+        try:
+            progress = self.run(event_id)
+            print(f"Cancelled {progress['cancelled']} bookings of event {event_id}")
+        except Exception as e:
+            print(f"Error cancelling bookings of event {event_id}: {e}")
+
+    def _cancel_chunk(self, job):
+        from app import db, apply_summary_deltas, note_transition, summary_deltas, Payment, SagaStep
+
+        rows = cancel_bookings(job.event_id, self.chunk_size)
+        if not rows:
+            db.session.rollback()
+            return rows
+        ids = [row.id for row in rows]
+
+        deltas = Counter()
+        for row in rows:
+            deltas.update(summary_deltas(row.old_status, 'CANCELLED', row.tickets, row.total_price or 0))
+            note_transition(db.session, row, row.old_status, 'CANCELLED')
+        apply_summary_deltas(job.event_id, deltas)
+
+        Payment.query.filter(
+            Payment.booking_id.in_(ids),
+            Payment.status == 'COMPLETED'
+        ).update({'status': 'REFUNDED'}, synchronize_session=False)
+        # Inventory decrements and confirmation notifications still queued
+        # are moot now
+        SagaStep.query.filter(
+            SagaStep.booking_id.in_(ids),
+            SagaStep.status.in_(['WAITING', 'PENDING'])
+        ).update({'status': 'SKIPPED'}, synchronize_session=False)
+
+        job.cancelled += len(rows)
+        job.unnotified = json.dumps(ids)
+        db.session.commit()
+        return rows
+
+    def _notify(self, job, bookings):
+        from app import db, get_user_directory, publish_messages
+
+        emails = get_user_directory().emails_for({booking.user_id for booking in bookings})
+        timestamp = datetime.utcnow().isoformat()
+        publish_messages([{
+            'booking_id': booking.id,
+            'user_id': booking.user_id,
+            'user_email': emails[booking.user_id],
+            'event_id': booking.event_id,
+            'tickets': booking.tickets,
+            'status': 'CANCELLED',
+            'reason': 'EVENT_CANCELLED',
+            'timestamp': timestamp
+        } for booking in bookings])
+
+        job.notified += len(bookings)
+        job.unnotified = None
+        db.session.commit()
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Cancel every active booking of a cancelled event')
+    parser.add_argument('event_id', help='Event whose bookings are cancelled')
+    parser.add_argument('--chunk-size', type=int, default=None,
+                        help='Bookings cancelled per transaction (default: BULK_CANCEL_CHUNK_SIZE)')
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_arguments()
+
+    from app import create_app, db, EventCancellation
+
+    app = create_app({'SAGA_WORKERS': 0})
+    canceller = app.extensions['bulk_cancel']
+    if args.chunk_size:
+        canceller.chunk_size = args.chunk_size
+    with app.app_context():
+        router = app.extensions.get('shards')
+        for shard in (router.shards if router else [None]):
+            EventCancellation.__table__.create(shard.connect() if shard else db.engine, checkfirst=True)
+        claimed = canceller.claim(args.event_id)
+
+    if not claimed:
+        print(f"❌ Cancellation of event {args.event_id} is running in another process")
+        raise SystemExit(1)
+
+    def report(progress):
+        print(f"Cancelled {progress['cancelled']}/{progress['total']} bookings, notified {progress['notified']}")
+
+    progress = canceller.run(args.event_id, on_chunk=report)
+    print(f"✅ Cancelled {progress['cancelled']} bookings of event {args.event_id}")
@@ -0,0 +1,187 @@
+"""Process-local clients for the services BookingService talks to.
+
+Clients are created on first use instead of at import time, so scripts that
+never touch the network start quickly. Every client is dropped in a forked
+child so worker processes never share sockets with their parent.
+"""
+import os
+import threading
+
+_lock = threading.RLock()
+_http_session = None
+_broker = None
+_user_directory = None
+
+def get_http_session():
+    """Shared requests session with connection pooling for this process"""
+    global _http_session
+    if _http_session is None:
+        with _lock:
+            if _http_session is None:
+                import requests
+                _http_session = requests.Session()
+    return _http_session
+
+class BrokerConnection:
+    """A RabbitMQ connection reused across publishes.
+
+    Messages are published to a durable topic exchange, so each consumer
+    binds its queue to the routing keys it cares about instead of filtering
+    every message in code. The queues in bindings are declared as priority
+    queues and bound on connect, which keeps messages for consumers that
+    are not running yet.
+
+    pika's BlockingConnection is not thread-safe, so publishes are
+    serialized. A dropped connection is reopened once before giving up.
+    """
+
+    def __init__(self, host, exchange='booking_events', bindings=None, max_priority=10):
+        self.host = host
+        self.exchange = exchange
+        # queue name -> routing key patterns
+        self.bindings = bindings or {}
+        self.max_priority = max_priority
+        self.lock = threading.Lock()
+        self.connection = None
+        self.channel = None
+
+    def _connect(self):
+        import pika
+        self.connection = pika.BlockingConnection(pika.ConnectionParameters(self.host))
+        self.channel = self.connection.channel()
+        self.channel.exchange_declare(exchange=self.exchange, exchange_type='topic', durable=True)
+        for queue, patterns in self.bindings.items():
+            self.channel.queue_declare(queue=queue, durable=True,
+                                       arguments={'x-max-priority': self.max_priority})
+            for pattern in patterns:
+                self.channel.queue_bind(queue=queue, exchange=self.exchange, routing_key=pattern)
+
+    def _discard(self):
+        try:
+            if self.connection is not None and self.connection.is_open:
+                self.connection.close()
+        except Exception:
+            pass
+        self.connection = None
+        self.channel = None
+
+    def publish(self, routing_key, body, priority=None, message_id=None):
+        self.publish_many([(routing_key, body, priority, message_id)])
+
+    def publish_many(self, messages):
+        """Publish (routing_key, body, priority, message_id) tuples holding the connection once"""
+        import pika
+        with self.lock:
+            sent = 0
+            for attempt in range(2):
+                try:
+                    if self.channel is None or not self.channel.is_open:
+                        self._connect()
+                    for routing_key, body, priority, message_id in messages[sent:]:
+                        self.channel.basic_publish(
+                            exchange=self.exchange,
+                            routing_key=routing_key,
+                            body=body,
+                            properties=pika.BasicProperties(
+                                content_type='application/json',
+                                delivery_mode=2,  # make message persistent
+                                priority=priority,
+                                message_id=message_id
+                            )
+                        )
+                        sent += 1
+                    return
+                except pika.exceptions.AMQPError:
+                    self._discard()
+                    if attempt:
+                        raise
+
+    def ping(self):
+        """Open the connection if needed and service its heartbeats; raises if the broker is unreachable"""
+        with self.lock:
+            try:
+                if self.channel is None or not self.channel.is_open:
+                    self._connect()
+                self.connection.process_data_events(time_limit=0)
+            except Exception:
+                self._discard()
+                raise
+
+    def close(self):
+        with self.lock:
+            self._discard()
+
+def get_broker():
+    """Shared RabbitMQ connection for this process"""
+    global _broker
+    if _broker is None:
+        with _lock:
+            if _broker is None:
+                # Try both variable names to handle potential typo in .env file
+                host = os.getenv('RABBITMQ_HOST', os.getenv('RABBMQ_HOST', 'localhost'))
+                # NotificationService stores every booking notification
+                queue = os.getenv('RABBITMQ_QUEUE', 'booking_notifications')
+                _broker = BrokerConnection(
+                    host,
+                    exchange=os.getenv('RABBITMQ_EXCHANGE', 'booking_events'),
+                    bindings={queue: ['booking.#']},
+                    max_priority=int(os.getenv('RABBITMQ_MAX_PRIORITY', 10))
+                )
+    return _broker
+
+def get_user_directory():
+    """Shared cached UserService client for this process"""
+    global _user_directory
+    if _user_directory is None:
+        with _lock:
+            if _user_directory is None:
+                from user_directory import UserDirectory
+                if not os.getenv('USER_SERVICE_TOKEN'):
+                    print("USER_SERVICE_TOKEN is not set; UserService refuses lookups and notifications use placeholder emails")
+                _user_directory = UserDirectory(
+                    os.getenv('USER_SERVICE_URL', 'http://localhost:3001'),
+                    service_token=os.getenv('USER_SERVICE_TOKEN') or None,
+                    ttl=float(os.getenv('USER_CACHE_TTL', 300)),
+                    max_entries=int(os.getenv('USER_CACHE_SIZE', 10000)),
+                    timeout=float(os.getenv('USER_SERVICE_TIMEOUT', 1))
+                )
+    return _user_directory
+
+def install_pool_fork_guard():
+    """Keep SQLAlchemy pools from handing parent connections to forked children.
+
+    Connections are tagged with the pid that opened them; a checkout from a
+    different process discards the connection without closing the parent's
+    socket and transparently opens a new one.
+    """
+    from sqlalchemy import event
+    from sqlalchemy.pool import Pool
+
+    if event.contains(Pool, 'connect', _record_pid):
+        return
+    event.listen(Pool, 'connect', _record_pid)
+    event.listen(Pool, 'checkout', _check_pid)
+
+def _record_pid(dbapi_connection, connection_record):
+    connection_record.info['pid'] = os.getpid()
+
+def _check_pid(dbapi_connection, connection_record, connection_proxy):
+    from sqlalchemy import exc
+    if connection_record.info.get('pid') != os.getpid():
+        connection_record.dbapi_connection = connection_proxy.dbapi_connection = None
+        raise exc.DisconnectionError(
+            f"Connection record belongs to pid {connection_record.info.get('pid')}, "
+            f"attempting to check out in pid {os.getpid()}"
+        )
+
+def _reset_after_fork():
+    # Drop references without closing: closing would send frames on sockets
+    # the parent process is still using.
+    global _lock, _http_session, _broker, _user_directory
+    _lock = threading.RLock()
+    _http_session = None
+    _broker = None
+    _user_directory = None
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
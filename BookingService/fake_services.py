@@ -0,0 +1,141 @@
+"""Local stand-ins for the services BookingService talks to, used by the tests"""
+import json
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+class _FakeServer:
+    """Runs a handler class on a random local port in a background thread"""
+
+    def __init__(self, handler_class):
+        handler = type(handler_class.__name__, (handler_class,), {'service': self})
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}'
+        self.requests = []
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+class _JSONHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_json(self):
+        length = int(self.headers.get('Content-Length', 0))
+        return json.loads(self.rfile.read(length)) if length else None
+
+class _EventHandler(_JSONHandler):
+    def do_GET(self):
+        url = urlparse(self.path)
+        with self.service.lock:
+            self.service.requests.append(('GET', url.path))
+            match = re.fullmatch(r'/api/events/([^/]+)(/availability)?', url.path)
+            event = self.service.events.get(match.group(1)) if match else None
+            if event is None:
+                return self.send_json(404, {'error': 'Event not found'})
+            if match.group(2):
+                tickets = int(parse_qs(url.query).get('tickets', ['1'])[0])
+                return self.send_json(200, {'available': event['availableTickets'] >= tickets})
+            return self.send_json(200, dict(event))
+
+    def do_PUT(self):
+        url = urlparse(self.path)
+        payload = self.read_json()
+        with self.service.lock:
+            self.service.requests.append(('PUT', url.path))
+            if self.service.fail_writes:
+                return self.send_json(503, {'error': 'Service unavailable'})
+            match = re.fullmatch(r'/api/events/([^/]+)(/book)?', url.path)
+            event = self.service.events.get(match.group(1)) if match else None
+            if event is None:
+                return self.send_json(404, {'error': 'Event not found'})
+            if match.group(2):
+                tickets = int(parse_qs(url.query).get('tickets', ['1'])[0])
+                if event['availableTickets'] < tickets:
+                    return self.send_json(400, {'error': 'Not enough tickets available'})
+                event['availableTickets'] -= tickets
+            else:
+                event.update(payload or {})
+            return self.send_json(200, dict(event))
+
+class FakeEventService(_FakeServer):
+    """Minimal in-memory EventService exposing the endpoints BookingService uses"""
+
+    def __init__(self):
+        super().__init__(_EventHandler)
+        self.events = {}
+        self.fail_writes = False
+
+    def add_event(self, event_id, price=25.0, available_tickets=100, title=None):
+        self.events[event_id] = {
+            'id': event_id,
+            'title': title or f'Event {event_id}',
+            'price': price,
+            'availableTickets': available_tickets
+        }
+        return self.events[event_id]
+
+class _UserHandler(_JSONHandler):
+    def do_GET(self):
+        url = urlparse(self.path)
+        if self.service.delay:
+            time.sleep(self.service.delay)
+        with self.service.lock:
+            self.service.requests.append(('GET', self.path))
+            if url.path != '/api/users/lookup':
+                return self.send_json(404, {'message': 'Not found'})
+            if self.service.fail:
+                return self.send_json(500, {'message': 'Server error'})
+            ids = [int(i) for i in parse_qs(url.query).get('ids', [''])[0].split(',') if i]
+            return self.send_json(200, [self.service.users[i] for i in ids if i in self.service.users])
+
+class FakeUserService(_FakeServer):
+    """Minimal in-memory UserService exposing the batch lookup endpoint"""
+
+    def __init__(self):
+        super().__init__(_UserHandler)
+        self.users = {}
+        self.fail = False
+        self.delay = 0
+
+    def add_user(self, user_id, email=None, username=None):
+        self.users[user_id] = {
+            'id': user_id,
+            'username': username or f'user{user_id}',
+            'email': email or f'user{user_id}@users.test',
+            'full_name': f'User {user_id}'
+        }
+        return self.users[user_id]
+
+_shared_event_service = None
+
+def shared_event_service():
+    """Start (once) a FakeEventService and point EVENT_SERVICE_URL at it.
+
+    Test modules share one instance so they can be run together without
+    fighting over the environment variable.
+    """
+    global _shared_event_service
+    if _shared_event_service is None:
+        _shared_event_service = FakeEventService().start()
+        os.environ['EVENT_SERVICE_URL'] = _shared_event_service.url
+    return _shared_event_service
@@ -0,0 +1,173 @@
+"""Group commit of booking writes.
+
+Under on-sale load every request thread commits its own small transaction,
+and the database pays a commit (a WAL flush on PostgreSQL) per booking.
+With group commit enabled, request threads hand their writes to a writer
+thread as units of work instead. The writer collects the units that arrive
+within a window of a few milliseconds, runs them in one transaction and
+commits once. On PostgreSQL it first draws the ids of all new rows from
+their sequences, one query per table, so the ORM can write each table with
+a single multi-row INSERT instead of one INSERT ... RETURNING per row.
+
+A unit is a function that adds its rows to db.session and returns a result.
+If anything in a batch fails, the batch is rolled back and every unit runs
+again in its own transaction, so only the request whose unit failed sees
+the error. Units must therefore be safe to run twice: create new objects
+inside the unit rather than before it. Objects a unit returns are detached
+after the commit with their attributes loaded, so the request thread can
+keep reading them and pass them to a later unit.
+"""
+import queue
+import threading
+import time
+from collections import defaultdict
+
+from sqlalchemy import Integer, inspect, text
+
+class _Pending:
+    """A unit of work waiting for its batch to commit"""
+
+    def __init__(self, work, shard):
+        self.work = work
+        self.shard = shard
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+    def resolve(self, result=None, error=None):
+        self.result = result
+        self.error = error
+        self.done.set()
+
+def assign_primary_keys(session):
+    """Give new rows ids from their sequences, one query per table (PostgreSQL only)"""
+    if session.connection().dialect.name != 'postgresql':
+        return
+    missing = defaultdict(list)
+    for obj in session.new:
+        mapper = inspect(obj).mapper
+        for column in mapper.primary_key:
+            key = mapper.get_property_by_column(column).key
+            # _type_affinity sees through with_variant(), so BIGINT ids count too
+            if issubclass(column.type._type_affinity, Integer) and getattr(obj, key) is None:
+                missing[(column.table.fullname, column.name, key)].append(obj)
+
+    for (table, column, key), objects in missing.items():
+        ids = session.execute(
+            text('SELECT nextval(pg_get_serial_sequence(:table, :column)) FROM generate_series(1, :count)'),
+            {'table': table, 'column': column, 'count': len(objects)}
+        ).scalars().all()
+        # Not backed by a sequence: leave the ids to the database
+        if None in ids:
+            continue
+        for obj, new_id in zip(objects, ids):
+            setattr(obj, key, new_id)
+
+class GroupCommitWriter:
+    def __init__(self, app, window_ms=2, max_batch=200, timeout=30):
+        self.app = app
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.timeout = timeout
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.thread = None
+        self.stats = {'units': 0, 'batches': 0, 'fallbacks': 0, 'errors': 0}
+
+    def submit(self, work, shard=None):
+        """Run work() in the next group commit and return its result, or raise its error.
+
+        shard is the shard whose database the unit writes to, None without
+        sharding.
+        """
+        pending = _Pending(work, shard)
+        self._ensure_thread()
+        self.queue.put(pending)
+        if not pending.done.wait(self.timeout):
+            # Like a lost connection: the unit may still be committed
+            raise TimeoutError('Group commit did not finish in time')
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def _ensure_thread(self):
+        # Started on first use so forked workers each get their own thread
+        if self.thread is None or not self.thread.is_alive():
+            with self.lock:
+                if self.thread is None or not self.thread.is_alive():
+                    self.thread = threading.Thread(target=self._run, name='group-commit', daemon=True)
+                    self.thread.start()
+
+    def _collect(self):
+        """Block for the first unit, then gather more until the window closes"""
+        batch = [self.queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            groups = {}
+            for pending in batch:
+                groups.setdefault(pending.shard, []).append(pending)
+            for shard, units in groups.items():
+                try:
+                    self._commit(shard, units)
+                except Exception as e:
+                    for pending in units:
+                        if not pending.done.is_set():
+                            pending.resolve(error=e)
+
+    def _commit(self, shard, units):
+        from app import db, use_shard
+
+        error = None
+        with self.app.app_context():
+            if shard is not None:
+                use_shard(shard)
+            session = db.session()
+            # Results are handed to other threads after the commit, so their
+            # attributes must stay loaded
+            session.expire_on_commit = False
+            try:
+                # Flushing once at the end lets each table be written in one statement
+                with session.no_autoflush:
+                    results = [pending.work() for pending in units]
+                assign_primary_keys(session)
+                session.commit()
+            except Exception as e:
+                session.rollback()
+                error = e
+            else:
+                session.expunge_all()
+
+        if error is None:
+            with self.lock:
+                self.stats['units'] += len(units)
+                self.stats['batches'] += 1
+            for pending, result in zip(units, results):
+                pending.resolve(result)
+        elif len(units) == 1:
+            with self.lock:
+                self.stats['errors'] += 1
+            units[0].resolve(error=error)
+        else:
+            with self.lock:
+                self.stats['fallbacks'] += 1
+            # Find the failing units by committing each on its own
+            for pending in units:
+                self._commit(shard, [pending])
+
+    def snapshot(self):
+        with self.lock:
+            stats = dict(self.stats)
+        stats['average_batch'] = round(stats['units'] / stats['batches'], 1) if stats['batches'] else 0
+        return stats
@@ -0,0 +1,104 @@
+"""Readiness of this instance, probed in the background.
+
+If the readiness endpoint checked the database, RabbitMQ and EventService
+itself, every probe would wait on them, and a hanging dependency would make
+the probe time out slowly instead of failing. The prober runs the checks on
+its own threads every interval instead, each with a timeout, and readiness
+requests only read the last results. A check that fails or does not answer
+in time makes the instance unready right away, so the load balancer drains
+it within one interval. Results that have not been refreshed for a few
+intervals, for example because the prober thread died, count as a failure
+too.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+class HealthProber:
+    def __init__(self, checks, required=None, interval=5, timeout=2, clock=time.monotonic):
+        # name -> function that raises if the dependency is unhealthy
+        self.checks = checks
+        # Checks that decide readiness; the others are only reported
+        self.required = set(checks if required is None else required)
+        self.interval = interval
+        self.timeout = timeout
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.results = {}
+        self.checked_at = None
+        # name -> future of a check that may still be running
+        self.in_flight = {}
+        self.executor = None
+        self.thread = None
+
+    def ensure_started(self):
+        # Started on first use so forked workers each get their own threads
+        if self.thread is None or not self.thread.is_alive():
+            with self.lock:
+                if self.thread is None or not self.thread.is_alive():
+                    self.executor = None
+                    self.in_flight = {}
+                    self.thread = threading.Thread(target=self._run, name='health-prober', daemon=True)
+                    self.thread.start()
+
+    def probe(self):
+        """Run every check once, waiting at most timeout for the answers"""
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=len(self.checks), thread_name_prefix='health-check')
+        futures = {}
+        for name, check in self.checks.items():
+            future = self.in_flight.get(name)
+            # A check still hanging from an earlier round is not started twice
+            if future is None or future.done():
+                future = self.executor.submit(self._timed, check)
+                self.in_flight[name] = future
+            futures[name] = future
+        wait(futures.values(), timeout=self.timeout)
+
+        results = {}
+        for name, future in futures.items():
+            if not future.done():
+                results[name] = {'status': 'DOWN', 'error': f'No answer within {self.timeout}s'}
+                continue
+            error, latency_ms = future.result()
+            results[name] = {'status': 'DOWN' if error else 'UP', 'latency_ms': round(latency_ms, 1)}
+            if error:
+                results[name]['error'] = error
+        with self.lock:
+            self.results = results
+            self.checked_at = self.clock()
+        return results
+
+    def status(self):
+        """Last probe results; status is UP only if every required check passed"""
+        with self.lock:
+            results = dict(self.results)
+            checked_at = self.checked_at
+        if checked_at is None:
+            return {'status': 'DOWN', 'reason': 'Not probed yet', 'checks': {}}
+
+        age = self.clock() - checked_at
+        body = {'status': 'UP', 'age_seconds': round(age, 1), 'checks': results}
+        if age > self.interval * 3 + self.timeout:
+            body['status'] = 'DOWN'
+            body['reason'] = 'Health results are stale'
+        elif any(results[name]['status'] != 'UP' for name in self.required if name in results):
+            body['status'] = 'DOWN'
+        return body
+
+    def _timed(self, check):
+        started = time.perf_counter()
+        try:
+            check()
+            error = None
+        except Exception as e:
+            error = str(e) or e.__class__.__name__
+        return error, (time.perf_counter() - started) * 1000
+
+    def _run(self):
+        while True:
+            try:
+                self.probe()
+            except Exception as e:
+                print(f"Error probing health: {e}")
+            time.sleep(self.interval)
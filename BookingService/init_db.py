@@ -1,4 +1,6 @@
-from app import db, app
+from app import create_app, db
+
+app = create_app({'SAGA_WORKERS': 0})
 
 # Don't create tables, just connect to existing database
 with app.app_context():
@@ -8,4 +10,4 @@ with app.app_context():
         print("Successfully connected to the existing PostgreSQL database!")
     except Exception as e:
         print(f"Error connecting to the database: {e}")
-        print("Please make sure your PostgreSQL server is running and the database exists.") 
\ No newline at end of file
+        print("Please make sure your PostgreSQL server is running and the database exists.")
\ No newline at end of file
@@ -0,0 +1,48 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+# Snippets run in a fresh interpreter; each prints its own elapsed time so
+# interpreter boot is excluded from the measurement
+TARGETS = {
+    'app factory': "from app import create_app; create_app()",
+    'rabbitmq consumer': "import rabbitmq_consumer",
+    'rebuild script': "import rebuild_event_stats",
+}
+
+TIMER = """
+import time
+started = time.perf_counter()
+{snippet}
+print((time.perf_counter() - started) * 1000)
+"""
+
+def measure(snippet, runs):
+    """Return per-run wall times in milliseconds for snippet"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    timings = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, '-c', TIMER.format(snippet=snippet)],
+            cwd=here, capture_output=True, text=True, check=True
+        ).stdout
+        timings.append(float(output.strip().splitlines()[-1]))
+    return timings
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Measure BookingService startup time')
+    parser.add_argument('--runs', type=int, default=5,
+                        help='Number of fresh processes per target (default: 5)')
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_arguments()
+
+    print("Measuring BookingService startup time...")
+    print("========================================")
+
+    for name, snippet in TARGETS.items():
+        timings = measure(snippet, args.runs)
+        print(f"{name:<20} median {statistics.median(timings):7.1f} ms   min {min(timings):7.1f} ms")
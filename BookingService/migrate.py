@@ -0,0 +1,128 @@
+"""Schema upgrades for databases created by earlier versions of the service.
+
+The app never creates tables itself, so a database set up before a table or
+index was added to the models does not get it on deploy. Every upgrade
+below checks the schema first and skips what is already there, so `python
+migrate.py` can be run on each deploy before the new version serves
+traffic. With sharding it upgrades every shard.
+
+On PostgreSQL, indexes on existing tables are built with CREATE INDEX
+CONCURRENTLY, so bookings keep being written while they build. Partitioned
+tables do not support it and are locked for writes while their index is
+built. Widening the booking id columns to BIGINT rewrites bookings and
+payments under an exclusive lock, once, so the first run after upgrading
+from INTEGER ids needs a maintenance window.
+"""
+import argparse
+
+from sqlalchemy import BigInteger, inspect, text
+
+from partitions import is_partitioned, quote
+
+def has_table(engine, table):
+    with engine.connect() as connection:
+        return inspect(connection).has_table(table)
+
+def create_index(engine, index):
+    """Create a model's index unless its columns are indexed already; True if created"""
+    table = index.table.name
+    columns = [column.name for column in index.columns]
+    with engine.connect() as connection:
+        if any(existing['column_names'] == columns for existing in inspect(connection).get_indexes(table)):
+            return False
+        concurrently = connection.dialect.name == 'postgresql' and not is_partitioned(connection, table)
+
+    if concurrently:
+        # CONCURRENTLY cannot run inside a transaction
+        with engine.execution_options(isolation_level='AUTOCOMMIT').connect() as connection:
+            connection.execute(text(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {quote(index.name)} "
+                f"ON {quote(table)} ({', '.join(quote(column) for column in columns)})"
+            ))
+    else:
+        index.create(engine, checkfirst=True)
+    return True
+
+def upgrade_event_stats(engine):
+    """Index bookings by event and add the per-event sales summary.
+
+    Returns True if the summary table was created and still has to be
+    filled from the booking history.
+    """
+    from app import Booking, EventSalesSummary
+    index = next(index for index in Booking.__table__.indexes if [c.name for c in index.columns] == ['event_id'])
+    if create_index(engine, index):
+        print(f"✅ Created index {index.name}")
+
+    if has_table(engine, EventSalesSummary.__tablename__):
+        return False
+    EventSalesSummary.__table__.create(engine, checkfirst=True)
+    print(f"✅ Created table {EventSalesSummary.__tablename__}")
+    return True
+
+# Columns holding booking ids, which no longer fit INTEGER once they encode a shard
+BOOKING_ID_COLUMNS = (('bookings', 'id'), ('payments', 'booking_id'))
+
+def widen_booking_ids(engine):
+    """Widen INTEGER booking id columns and the bookings id sequence to BIGINT.
+
+    PostgreSQL only; SQLite integer keys are 64-bit already. Returns the
+    columns that were changed.
+    """
+    if engine.dialect.name != 'postgresql':
+        return []
+    widened = []
+    with engine.begin() as connection:
+        inspector = inspect(connection)
+        for table, column in BOOKING_ID_COLUMNS:
+            if not inspector.has_table(table):
+                continue
+            current = next(info for info in inspector.get_columns(table) if info['name'] == column)
+            if isinstance(current['type'], BigInteger):
+                continue
+            connection.execute(text(f"ALTER TABLE {quote(table)} ALTER COLUMN {quote(column)} TYPE BIGINT"))
+            widened.append(f'{table}.{column}')
+        if 'bookings.id' in widened:
+            sequence = connection.execute(text("SELECT pg_get_serial_sequence('bookings', 'id')")).scalar()
+            if sequence:
+                # Raises the sequence's maximum along with its type
+                connection.execute(text(f"ALTER SEQUENCE {sequence} AS BIGINT"))
+    return widened
+
+def upgrade_saga(engine):
+    """Widen booking ids and add the saga_steps table of the confirmation saga"""
+    from app import SagaStep
+    for column in widen_booking_ids(engine):
+        print(f"✅ Widened {column} to BIGINT")
+    if not has_table(engine, SagaStep.__tablename__):
+        SagaStep.__table__.create(engine, checkfirst=True)
+        print(f"✅ Created table {SagaStep.__tablename__}")
+
+def upgrade(engine, batch_size=5000):
+    """Apply every upgrade the database bound to db.session still needs"""
+    from rebuild_event_stats import rebuild_event_stats
+
+    if upgrade_event_stats(engine):
+        print(f"✅ Backfilled the sales summary of {rebuild_event_stats(batch_size)} events")
+    upgrade_saga(engine)
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Bring an existing BookingService database up to the current schema')
+    parser.add_argument('--batch-size', type=int, default=5000,
+                        help='Bookings read per batch when backfilling (default: 5000)')
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_arguments()
+
+    from app import create_app, db, use_shard
+
+    app = create_app({'SAGA_WORKERS': 0})
+    with app.app_context():
+        router = app.extensions.get('shards')
+        for shard in (router.shards if router else [None]):
+            if shard is not None:
+                use_shard(shard)
+                print(f"Upgrading shard {shard.index}...")
+            upgrade(shard.connect() if shard else db.engine, args.batch_size)
+        print("✅ Schema is up to date")
@@ -0,0 +1,280 @@
+"""Monthly range partitioning of bookings and payments on created_at.
+
+PostgreSQL only. `migrate` converts the existing tables once: each table is
+renamed to <table>_legacy and attached as the partition holding everything
+before the cut-over month, so no rows are copied. `ensure` creates the
+upcoming monthly partitions and should run from cron. `archive` streams
+partitions older than a retention period to compressed files with a
+server-side cursor and then detaches them, so indexes, vacuum and queries on
+the live tables only cover recent data.
+
+Partitioned tables need the partition key in every unique constraint, so the
+primary keys become (id, created_at) and the payments -> bookings foreign key
+is dropped by `migrate`.
+"""
+import argparse
+import gzip
+import json
+import os
+import re
+from datetime import date, datetime
+
+PARTITIONED_TABLES = ('bookings', 'payments')
+
+# Secondary indexes created on the partitioned parents and inherited by partitions
+PARTITION_INDEXES = {
+    'bookings': ('user_id', 'event_id'),
+    'payments': ('booking_id',)
+}
+
+BOUND_PATTERN = re.compile(r"FROM \((MINVALUE|'([^']+)')\) TO \((MAXVALUE|'([^']+)')\)")
+
+def quote(identifier):
+    return '"' + identifier.replace('"', '""') + '"'
+
+def month_start(day):
+    return date(day.year, day.month, 1)
+
+def add_months(day, months):
+    month = day.month - 1 + months
+    return date(day.year + month // 12, month % 12 + 1, 1)
+
+def partition_name(table, start):
+    return f'{table}_p{start.year:04d}{start.month:02d}'
+
+def months_to_create(existing_upper, today, months_ahead):
+    """Month starts needing a partition so that data up to months_ahead fits.
+
+    New partitions begin where the existing ones end so they never overlap
+    the legacy partition or each other.
+    """
+    start = month_start(today)
+    if existing_upper is not None and existing_upper > start:
+        start = existing_upper
+    end = add_months(month_start(today), months_ahead + 1)
+    months = []
+    while start < end:
+        months.append(start)
+        start = add_months(start, 1)
+    return months
+
+def parse_bound(value):
+    if value is None:
+        return None
+    return datetime.fromisoformat(value).date()
+
+def list_partitions(connection, table):
+    """Return [(partition name, lower bound, upper bound)] ordered by bound; None means unbounded"""
+    from sqlalchemy import text
+    rows = connection.execute(text("""
+        SELECT child.relname, pg_get_expr(child.relpartbound, child.oid)
+        FROM pg_inherits
+        JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE parent.relname = :table
+    """), {'table': table}).fetchall()
+
+    partitions = []
+    for name, bound in rows:
+        match = BOUND_PATTERN.search(bound)
+        if not match:
+            continue
+        partitions.append((name, parse_bound(match.group(2)), parse_bound(match.group(4))))
+    partitions.sort(key=lambda p: p[2] or date.max)
+    return partitions
+
+def is_partitioned(connection, table):
+    from sqlalchemy import text
+    return connection.execute(
+        text("SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid WHERE c.relname = :table"),
+        {'table': table}
+    ).first() is not None
+
+def migrate_table(connection, table, cutover):
+    """Turn table into a partitioned table with its current contents as the legacy partition"""
+    from sqlalchemy import text
+    legacy = f'{table}_legacy'
+    sequence = connection.execute(
+        text("SELECT pg_get_serial_sequence(:table, 'id')"), {'table': table}
+    ).scalar()
+
+    statements = [
+        f"LOCK TABLE {quote(table)} IN ACCESS EXCLUSIVE MODE",
+        f"UPDATE {quote(table)} SET created_at = now() WHERE created_at IS NULL",
+        f"ALTER TABLE {quote(table)} ALTER COLUMN created_at SET NOT NULL",
+        f"ALTER TABLE {quote(table)} RENAME TO {quote(legacy)}",
+        f"CREATE TABLE {quote(table)} (LIKE {quote(legacy)} INCLUDING DEFAULTS) PARTITION BY RANGE (created_at)",
+        f"ALTER TABLE {quote(table)} ADD PRIMARY KEY (id, created_at)",
+        f"CREATE UNIQUE INDEX {quote(legacy + '_id_created_at')} ON {quote(legacy)} (id, created_at)",
+        # Lets ATTACH skip scanning the legacy rows to validate the range
+        f"ALTER TABLE {quote(legacy)} ADD CONSTRAINT {quote(legacy + '_range')} CHECK (created_at < '{cutover}')",
+        f"ALTER TABLE {quote(table)} ATTACH PARTITION {quote(legacy)} FOR VALUES FROM (MINVALUE) TO ('{cutover}')",
+        f"ALTER TABLE {quote(legacy)} DROP CONSTRAINT {quote(legacy + '_range')}",
+    ]
+    if sequence:
+        # Keep the id sequence alive when the legacy partition is archived and dropped
+        statements.append(f"ALTER SEQUENCE {sequence} OWNED BY {quote(table)}.id")
+    for column in PARTITION_INDEXES[table]:
+        statements.append(f"CREATE INDEX {quote(f'ix_{table}_{column}')} ON {quote(table)} ({quote(column)})")
+
+    for statement in statements:
+        connection.execute(text(statement))
+
+def migrate(engine, today=None):
+    from sqlalchemy import text
+    cutover = add_months(month_start(today or date.today()), 1)
+    with engine.begin() as connection:
+        connection.execute(text("ALTER TABLE payments DROP CONSTRAINT IF EXISTS payments_booking_id_fkey"))
+        for table in PARTITIONED_TABLES:
+            if is_partitioned(connection, table):
+                print(f"{table} is already partitioned")
+                continue
+            migrate_table(connection, table, cutover)
+            print(f"✅ Partitioned {table}; rows before {cutover} are in {table}_legacy")
+
+def ensure_partitions(engine, months_ahead=3, today=None):
+    """Create monthly partitions up to months_ahead months from today"""
+    from sqlalchemy import text
+    created = []
+    with engine.begin() as connection:
+        for table in PARTITIONED_TABLES:
+            partitions = list_partitions(connection, table)
+            upper = partitions[-1][2] if partitions else None
+            for start in months_to_create(upper, today or date.today(), months_ahead):
+                name = partition_name(table, start)
+                connection.execute(text(
+                    f"CREATE TABLE IF NOT EXISTS {quote(name)} PARTITION OF {quote(table)} "
+                    f"FOR VALUES FROM ('{start}') TO ('{add_months(start, 1)}')"
+                ))
+                created.append(name)
+    return created
+
+def write_ndjson(rows, path):
+    """Write row mappings to a gzip NDJSON file; return the row count"""
+    count = 0
+    with gzip.open(path, 'wt', encoding='utf-8') as output:
+        for row in rows:
+            output.write(json.dumps(dict(row), default=str))
+            output.write('\n')
+            count += 1
+    return count
+
+def write_parquet(batches, path):
+    """Write batches of row mappings to a compressed Parquet file; return the row count"""
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError("Parquet archives need pyarrow: pip install pyarrow")
+
+    writer = None
+    count = 0
+    try:
+        for batch in batches:
+            rows = [dict(row) for row in batch]
+            # Column types are inferred from the first batch and reused after
+            table = pyarrow.Table.from_pylist(rows, schema=writer.schema if writer else None)
+            if writer is None:
+                writer = pyarrow.parquet.ParquetWriter(path, table.schema, compression='zstd')
+            writer.write_table(table)
+            count += len(rows)
+    finally:
+        if writer is not None:
+            writer.close()
+    return count
+
+def stream_rows(connection, name, batch_size):
+    """Yield batches of row mappings from a table through a server-side cursor"""
+    from sqlalchemy import text
+    result = connection.execution_options(stream_results=True, max_row_buffer=batch_size).execute(
+        text(f"SELECT * FROM {quote(name)} ORDER BY id")
+    )
+    for batch in result.partitions(batch_size):
+        yield [row._mapping for row in batch]
+
+def archive_partition(engine, table, name, output_dir, file_format='ndjson', batch_size=5000, drop=False):
+    """Export one partition to output_dir, then detach (and optionally drop) it"""
+    from sqlalchemy import text
+    extension = 'ndjson.gz' if file_format == 'ndjson' else 'parquet'
+    path = os.path.join(output_dir, f'{name}.{extension}')
+    partial = path + '.partial'
+
+    with engine.connect() as connection:
+        with connection.begin():
+            batches = stream_rows(connection, name, batch_size)
+            if file_format == 'ndjson':
+                count = write_ndjson((row for batch in batches for row in batch), partial)
+            else:
+                count = write_parquet(batches, partial)
+    # Only a complete file gets its final name
+    os.replace(partial, path)
+
+    with engine.begin() as connection:
+        connection.execute(text(f"ALTER TABLE {quote(table)} DETACH PARTITION {quote(name)}"))
+        if drop:
+            connection.execute(text(f"DROP TABLE {quote(name)}"))
+    return path, count
+
+def archive(engine, older_than_months, output_dir, file_format='ndjson', batch_size=5000, drop=False, today=None):
+    """Archive every partition whose data ends before the retention cut-off"""
+    cutoff = add_months(month_start(today or date.today()), -older_than_months)
+    os.makedirs(output_dir, exist_ok=True)
+
+    archived = []
+    for table in PARTITIONED_TABLES:
+        with engine.connect() as connection:
+            partitions = list_partitions(connection, table)
+        for name, _, upper in partitions:
+            if upper is None or upper > cutoff:
+                continue
+            path, count = archive_partition(engine, table, name, output_dir, file_format, batch_size, drop)
+            print(f"Archived {count} rows from {name} to {path}")
+            archived.append(name)
+    return archived
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Manage time partitions of the bookings and payments tables')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    commands.add_parser('migrate', help='Convert bookings and payments into partitioned tables (run once)')
+
+    ensure = commands.add_parser('ensure', help='Create upcoming monthly partitions')
+    ensure.add_argument('--months-ahead', type=int, default=3,
+                        help='Months of partitions to keep ready (default: 3)')
+
+    archive_parser = commands.add_parser('archive', help='Export and detach old partitions')
+    archive_parser.add_argument('--older-than-months', type=int, default=12,
+                                help='Archive partitions ending before this many months ago (default: 12)')
+    archive_parser.add_argument('--output-dir', default='archive',
+                                help='Directory for archive files (default: archive)')
+    archive_parser.add_argument('--format', choices=['ndjson', 'parquet'], default='ndjson',
+                                help='Archive file format (default: ndjson)')
+    archive_parser.add_argument('--batch-size', type=int, default=5000,
+                                help='Rows fetched per round trip (default: 5000)')
+    archive_parser.add_argument('--drop', action='store_true',
+                                help='Drop partitions after detaching them (default: False)')
+
+    commands.add_parser('list', help='Show partitions and their bounds')
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_arguments()
+
+    from app import create_app, db
+
+    with create_app({'SAGA_WORKERS': 0}).app_context():
+        engine = db.engine
+        if args.command == 'migrate':
+            migrate(engine)
+            print(f"Created partitions: {', '.join(ensure_partitions(engine)) or 'none'}")
+        elif args.command == 'ensure':
+            print(f"Created partitions: {', '.join(ensure_partitions(engine, args.months_ahead)) or 'none'}")
+        elif args.command == 'archive':
+            archived = archive(engine, args.older_than_months, args.output_dir,
+                               args.format, args.batch_size, args.drop)
+            print(f"✅ Archived {len(archived)} partitions")
+        else:
+            with engine.connect() as connection:
+                for table in PARTITIONED_TABLES:
+                    for name, lower, upper in list_partitions(connection, table):
+                        print(f"{name:<24} {lower or 'MINVALUE'} -> {upper or 'MAXVALUE'}")
@@ -0,0 +1,171 @@
+"""Opt-in request profiling for production latency investigations.
+
+Two independent mechanisms, both off until configured:
+
+- Sampling: a fraction of requests runs under cProfile and the results are
+  merged into one table of hot functions. Only one request is profiled at
+  a time, which bounds the overhead and keeps cProfile's one-profiler limit.
+- Slow request capture: while a slow threshold is set, a background thread
+  samples the stacks of in-flight request threads at a fixed interval.
+  Samples of requests that finish under the threshold are dropped; slower
+  requests keep theirs as a capture showing where the time went.
+
+When the profiler is not enabled at all, create_app registers no hooks.
+"""
+import cProfile
+import pstats
+import random
+import sys
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime
+
+def function_label(filename, line, name):
+    return f'{name} ({filename}:{line})'
+
+class RequestProfiler:
+    def __init__(self, sample_rate=0.0, slow_threshold_ms=0, sample_interval_ms=10,
+                 max_captures=20, rand=random.random):
+        self.sample_rate = sample_rate
+        self.slow_threshold_ms = slow_threshold_ms
+        self.sample_interval = sample_interval_ms / 1000
+        self.rand = rand
+        self.lock = threading.Lock()
+        self.profile_lock = threading.Lock()
+        # (filename, line, name) -> [calls, own time, cumulative time]
+        self.functions = {}
+        self.profiled_requests = 0
+        self.captures = deque(maxlen=max_captures)
+        # thread id -> Counter of sampled stacks for requests being watched
+        self.watched = {}
+        self.sampler = None
+
+    def configure(self, sample_rate=None, slow_threshold_ms=None):
+        with self.lock:
+            if sample_rate is not None:
+                self.sample_rate = sample_rate
+            if slow_threshold_ms is not None:
+                self.slow_threshold_ms = slow_threshold_ms
+
+    def reset(self):
+        with self.lock:
+            self.functions = {}
+            self.profiled_requests = 0
+            self.captures.clear()
+
+    def start_request(self):
+        """Begin tracking the current request; returns a token for finish_request"""
+        profile = None
+        if self.sample_rate and self.rand() < self.sample_rate and self.profile_lock.acquire(blocking=False):
+            profile = cProfile.Profile()
+            profile.enable()
+
+        watching = False
+        if self.slow_threshold_ms:
+            with self.lock:
+                self.watched[threading.get_ident()] = Counter()
+            self._ensure_sampler()
+            watching = True
+        return (time.perf_counter(), profile, watching)
+
+    def finish_request(self, token, method, path):
+        started, profile, watching = token
+        duration_ms = (time.perf_counter() - started) * 1000
+
+        if profile is not None:
+            profile.disable()
+            self.profile_lock.release()
+            self._merge(profile)
+
+        if watching:
+            with self.lock:
+                stacks = self.watched.pop(threading.get_ident(), None)
+                if stacks is not None and self.slow_threshold_ms and duration_ms >= self.slow_threshold_ms:
+                    self.captures.append({
+                        'method': method,
+                        'path': path,
+                        'duration_ms': round(duration_ms, 1),
+                        'captured_at': datetime.utcnow().isoformat(),
+                        'samples': sum(stacks.values()),
+                        'stacks': [{'stack': stack, 'samples': count} for stack, count in stacks.most_common(10)]
+                    })
+
+    def _merge(self, profile):
+        stats = pstats.Stats(profile).stats
+        with self.lock:
+            self.profiled_requests += 1
+            for key, (_, calls, own, cumulative, _) in stats.items():
+                totals = self.functions.setdefault(key, [0, 0.0, 0.0])
+                totals[0] += calls
+                totals[1] += own
+                totals[2] += cumulative
+
+    def _ensure_sampler(self):
+        # Started on first use so forked workers each get their own thread
+        if self.sampler is None or not self.sampler.is_alive():
+            with self.lock:
+                if self.sampler is None or not self.sampler.is_alive():
+                    self.sampler = threading.Thread(target=self._sample, name='profiler-sampler', daemon=True)
+                    self.sampler.start()
+
+    def _sample(self):
+        while self.slow_threshold_ms:
+            time.sleep(self.sample_interval)
+            frames = sys._current_frames()
+            with self.lock:
+                for thread_id, stacks in self.watched.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        stacks[self._collapse(frame)] += 1
+
+    @staticmethod
+    def _collapse(frame, max_depth=40):
+        """Stack as 'outer;...;inner' like flame graph tools expect"""
+        names = []
+        while frame is not None and len(names) < max_depth:
+            code = frame.f_code
+            names.append(f'{code.co_name} ({code.co_filename}:{frame.f_lineno})')
+            frame = frame.f_back
+        return ';'.join(reversed(names))
+
+    def hot_functions(self, limit=30, sort='own'):
+        index = {'calls': 0, 'own': 1, 'cumulative': 2}[sort]
+        with self.lock:
+            ranked = sorted(self.functions.items(), key=lambda item: item[1][index], reverse=True)[:limit]
+        return [{
+            'function': function_label(*key),
+            'calls': calls,
+            'own_ms': round(own * 1000, 3),
+            'cumulative_ms': round(cumulative * 1000, 3)
+        } for key, (calls, own, cumulative) in ranked]
+
+    def snapshot(self, limit=30, sort='own'):
+        with self.lock:
+            summary = {
+                'sample_rate': self.sample_rate,
+                'slow_threshold_ms': self.slow_threshold_ms,
+                'profiled_requests': self.profiled_requests,
+                'slow_captures': len(self.captures)
+            }
+        return {**summary, 'hot_functions': self.hot_functions(limit, sort)}
+
+    def slow_requests(self):
+        with self.lock:
+            return list(self.captures)
+
+    def init_app(self, app):
+        """Track the requests of app with this profiler"""
+        from flask import g, request
+
+        @app.before_request
+        def start_profiling():
+            # Reading the profile should not show up in it
+            if (self.sample_rate or self.slow_threshold_ms) and not request.path.startswith('/admin/'):
+                g.profiler_token = self.start_request()
+
+        @app.teardown_request
+        def finish_profiling(exc):
+            token = g.pop('profiler_token', None)
+            if token is not None:
+                self.finish_request(token, request.method, request.path)
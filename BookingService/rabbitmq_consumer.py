@@ -1,23 +1,37 @@
-import pika
+"""Print booking notifications as they are published.
+
+Notifications go to a topic exchange with routing keys of the form
+booking.<status>.<event_id>, so the consumer binds only the patterns it
+wants and RabbitMQ drops the rest before they reach it:
+
+    python rabbitmq_consumer.py --status confirmed cancelled
+    python rabbitmq_consumer.py --event 64f1c2 --status '*'
+    python rabbitmq_consumer.py --pattern 'booking.#'
+
+With a pattern and no --queue, a temporary queue is used that goes away
+with the consumer, so nothing is taken from NotificationService. Without
+any pattern it reads RABBITMQ_QUEUE like before.
+"""
+import argparse
 import json
 import os
-from dotenv import load_dotenv
-
-# Load environment variables
-load_dotenv()
 
-# Get RabbitMQ host from environment variables
-rabbitmq_host = os.getenv('RABBITMQ_HOST', 'localhost')
-rabbitmq_queue = os.getenv('RABBITMQ_QUEUE', 'booking_notifications')
+def binding_patterns(statuses=None, event_ids=None):
+    """Routing key patterns for the given statuses and events; '*' matches any"""
+    return [
+        f'booking.{status.lower()}.{event_id}'
+        for status in (statuses or ['*'])
+        for event_id in (event_ids or ['*'])
+    ]
 
 def callback(ch, method, properties, body):
     """Process received messages"""
     try:
         message = json.loads(body)
-        print("\n✉️ Received message:")
+        print(f"\n✉️ Received message ({method.routing_key}, priority {properties.priority or 0}):")
         print(json.dumps(message, indent=2))
         print("-" * 50)
-        
+
         # Acknowledge the message (remove it from the queue)
         ch.basic_ack(delivery_tag=method.delivery_tag)
     except Exception as e:
@@ -25,23 +39,47 @@ def callback(ch, method, properties, body):
         # Reject the message and requeue it
         ch.basic_nack(delivery_tag=method.delivery_tag, requeue=True)
 
-def start_consumer():
-    """Start consuming messages from the queue"""
+def start_consumer(patterns=None, queue=None, prefetch=10):
+    """Start consuming messages whose routing keys match patterns"""
+    # Imported here so importing this module stays cheap
+    import pika
+    from dotenv import load_dotenv
+
+    # Load environment variables
+    load_dotenv()
+
+    # Get RabbitMQ host from environment variables
+    rabbitmq_host = os.getenv('RABBITMQ_HOST', 'localhost')
+    rabbitmq_exchange = os.getenv('RABBITMQ_EXCHANGE', 'booking_events')
+    max_priority = int(os.getenv('RABBITMQ_MAX_PRIORITY', 10))
+    if not patterns:
+        patterns = ['booking.#']
+        queue = queue or os.getenv('RABBITMQ_QUEUE', 'booking_notifications')
+
     try:
         # Connect to RabbitMQ
         connection = pika.BlockingConnection(pika.ConnectionParameters(rabbitmq_host))
         channel = connection.channel()
-        
-        # Declare the queue (in case it doesn't exist yet)
-        channel.queue_declare(queue=rabbitmq_queue, durable=True)
-        
-        # Set up the consumer
-        channel.basic_consume(queue=rabbitmq_queue, on_message_callback=callback)
-        
-        print(f"🔍 Listening for messages on queue: {rabbitmq_queue}")
+
+        # Declare the exchange and queue (in case they don't exist yet)
+        channel.exchange_declare(exchange=rabbitmq_exchange, exchange_type='topic', durable=True)
+        arguments = {'x-max-priority': max_priority}
+        if queue:
+            channel.queue_declare(queue=queue, durable=True, arguments=arguments)
+        else:
+            queue = channel.queue_declare(queue='', exclusive=True, arguments=arguments).method.queue
+        for pattern in patterns:
+            channel.queue_bind(queue=queue, exchange=rabbitmq_exchange, routing_key=pattern)
+
+        # Priorities only reorder messages the broker still holds, so keep
+        # the unacknowledged window small
+        channel.basic_qos(prefetch_count=prefetch)
+        channel.basic_consume(queue=queue, on_message_callback=callback)
+
+        print(f"🔍 Listening for {', '.join(patterns)} on queue: {queue}")
         print(f"Press Ctrl+C to exit")
         print("-" * 50)
-        
+
         # Start consuming messages
         channel.start_consuming()
     except KeyboardInterrupt:
@@ -49,5 +87,23 @@ def start_consumer():
     except Exception as e:
         print(f"Error starting consumer: {e}")
 
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Print booking notifications from RabbitMQ')
+    parser.add_argument('--status', nargs='+', metavar='STATUS',
+                        help='Only these statuses, e.g. confirmed cancelled')
+    parser.add_argument('--event', nargs='+', metavar='EVENT_ID',
+                        help='Only notifications of these events')
+    parser.add_argument('--pattern', nargs='+', default=[], metavar='PATTERN',
+                        help="Raw routing key patterns, e.g. 'booking.*.64f1c2'")
+    parser.add_argument('--queue',
+                        help='Durable queue to bind and read (default: a temporary queue)')
+    parser.add_argument('--prefetch', type=int, default=10,
+                        help='Unacknowledged messages held by the consumer (default: 10)')
+    return parser.parse_args()
+
 if __name__ == "__main__":
-    start_consumer() 
\ No newline at end of file
+    args = parse_arguments()
+    patterns = list(args.pattern)
+    if args.status or args.event:
+        patterns += binding_patterns(args.status, args.event)
+    start_consumer(patterns, args.queue, args.prefetch)
@@ -0,0 +1,96 @@
+import argparse
+from collections import defaultdict
+
+from sqlalchemy import text
+
+from app import create_app, db, use_shard, Booking, EventSalesSummary, summary_deltas
+
+def aggregate_bookings(batch_size, on_batch=None):
+    """Stream bookings in id order and fold them into per-event counters.
+
+    Only one batch of bookings plus one counter row per event is held in
+    memory, so the scan works regardless of the size of the table.
+    """
+    totals = defaultdict(lambda: defaultdict(int))
+    last_id = 0
+    scanned = 0
+
+    while True:
+        batch = (
+            db.session.query(Booking.id, Booking.event_id, Booking.status, Booking.tickets, Booking.total_price)
+            .filter(Booking.id > last_id)
+            .order_by(Booking.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not batch:
+            break
+
+        for booking_id, event_id, status, tickets, total_price in batch:
+            for column, delta in summary_deltas(None, status, tickets, total_price).items():
+                totals[event_id][column] += delta
+
+        last_id = batch[-1][0]
+        scanned += len(batch)
+        print(f"Scanned {scanned} bookings...")
+        if on_batch is not None:
+            on_batch(scanned)
+
+    return totals
+
+def lock_summary(session):
+    """Keep other transactions from writing the summary until this one ends.
+
+    Booking writes update the summary in the transaction that changes the
+    booking, so while the lock is held no status change can commit and the
+    scan sees every change that is not applied to the rebuilt rows later.
+    On PostgreSQL readers still see the old summary meanwhile. SQLite has
+    no table locks, so emptying the table takes its database write lock.
+    """
+    if session.connection().dialect.name == 'postgresql':
+        session.execute(text('LOCK TABLE event_sales_summary IN EXCLUSIVE MODE'))
+    EventSalesSummary.query.delete()
+
+def rebuild_event_stats(batch_size=5000, on_batch=None):
+    """Recompute the event_sales_summary table from the bookings history.
+
+    Booking status changes wait for the rebuild to finish, so run it when
+    the service is quiet.
+    """
+    EventSalesSummary.__table__.create(db.session().get_bind(), checkfirst=True)
+
+    # Lock, scan and swap the summary contents in a single transaction so
+    # no concurrent change is lost and readers never see a partial table
+    lock_summary(db.session)
+    totals = aggregate_bookings(batch_size, on_batch)
+
+    rows = [dict(event_id=event_id, **counters) for event_id, counters in totals.items()]
+    for start in range(0, len(rows), batch_size):
+        db.session.bulk_insert_mappings(EventSalesSummary, rows[start:start + batch_size])
+    db.session.commit()
+
+    return len(rows)
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Rebuild per-event sales summaries from booking history')
+    parser.add_argument('--batch-size', type=int, default=5000,
+                        help='Number of bookings read per batch (default: 5000)')
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_arguments()
+
+    app = create_app({'SAGA_WORKERS': 0})
+    with app.app_context():
+        router = app.extensions.get('shards')
+        # Each shard keeps the summaries of its own events
+        for shard in (router.shards if router else [None]):
+            if shard is not None:
+                use_shard(shard)
+                print(f"Rebuilding shard {shard.index}...")
+            try:
+                events = rebuild_event_stats(args.batch_size)
+                print(f"✅ Rebuilt sales summary for {events} events")
+            except Exception as e:
+                db.session.rollback()
+                print(f"❌ Error rebuilding sales summary: {e}")
@@ -0,0 +1,179 @@
+"""Reconcile ticket inventory between BookingService and EventService.
+
+EventService only stores how many tickets are still available, so the
+capacity of each event is recorded in the event_inventory table the first
+time the event is reconciled (available + sold, assuming the two services
+agree at that point). Afterwards the expected availability is that capacity
+minus the tickets of confirmed bookings, computed for all events in one
+grouped query. Bookings whose EventService decrement is still queued in the
+confirmation saga are left out, since EventService has not seen them yet.
+
+Inventories are fetched from EventService concurrently with a bounded
+number of requests in flight. By default discrepancies are only reported;
+with --repair the expected value is written back, unless EventService
+changed the event while the check was running.
+"""
+import argparse
+import os
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import func
+
+from app import create_app, db, use_shard, Booking, EventInventory, SagaStep
+
+Discrepancy = namedtuple('Discrepancy', ['event_id', 'capacity', 'sold', 'expected', 'actual'])
+
+def confirmed_tickets_by_event(session):
+    """Tickets of confirmed bookings per event that EventService should already reflect"""
+    unsettled = session.query(SagaStep.booking_id).filter(
+        SagaStep.step == 'event_decrement',
+        SagaStep.status.in_(['PENDING', 'RUNNING'])
+    )
+    rows = (
+        session.query(Booking.event_id, func.sum(Booking.tickets))
+        .filter(Booking.status == 'CONFIRMED', ~Booking.id.in_(unsettled))
+        .group_by(Booking.event_id)
+    )
+    return {event_id: int(tickets) for event_id, tickets in rows}
+
+def make_http_session(concurrency):
+    """requests session whose connection pool fits the number of parallel fetches"""
+    import requests
+    from requests.adapters import HTTPAdapter
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+def fetch_events(http, event_service_url, event_ids, concurrency=32, timeout=10):
+    """Fetch events in parallel; return {event_id: event dict, None if missing, or the exception}"""
+    def fetch(event_id):
+        try:
+            response = http.get(f'{event_service_url}/api/events/{event_id}', timeout=timeout)
+            if response.status_code == 404:
+                return event_id, None
+            response.raise_for_status()
+            return event_id, response.json()
+        except Exception as e:
+            return event_id, e
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return dict(executor.map(fetch, event_ids))
+
+def find_discrepancies(sold, capacities, available):
+    """Compare expected and actual availability.
+
+    sold and capacities map event IDs to ticket counts, available maps them
+    to EventService's availableTickets. Returns the discrepancies and the
+    capacities of events seen for the first time.
+    """
+    discrepancies = []
+    new_capacities = {}
+    for event_id, actual in available.items():
+        tickets_sold = sold.get(event_id, 0)
+        capacity = capacities.get(event_id)
+        if capacity is None:
+            new_capacities[event_id] = actual + tickets_sold
+            continue
+        expected = capacity - tickets_sold
+        if expected != actual:
+            discrepancies.append(Discrepancy(event_id, capacity, tickets_sold, expected, actual))
+    return discrepancies, new_capacities
+
+def repair(http, event_service_url, discrepancy, event_data, timeout=10):
+    """Set an event's availableTickets to the expected value; False if it changed meanwhile"""
+    response = http.get(f'{event_service_url}/api/events/{discrepancy.event_id}', timeout=timeout)
+    response.raise_for_status()
+    current = response.json()
+    if current.get('availableTickets') != discrepancy.actual:
+        return False
+    response = http.put(
+        f'{event_service_url}/api/events/{discrepancy.event_id}',
+        json={**event_data, 'availableTickets': discrepancy.expected},
+        timeout=timeout
+    )
+    response.raise_for_status()
+    return True
+
+def reconcile(event_service_url, concurrency=32, apply_repairs=False, rebaseline=()):
+    """Reconcile the events of the database db.session points at; return counts by outcome"""
+    EventInventory.__table__.create(db.session().get_bind(), checkfirst=True)
+    if rebaseline:
+        EventInventory.query.filter(EventInventory.event_id.in_(rebaseline)).delete(synchronize_session=False)
+
+    sold = confirmed_tickets_by_event(db.session)
+    capacities = dict(db.session.query(EventInventory.event_id, EventInventory.capacity))
+    event_ids = sorted(set(sold) | set(capacities) | set(rebaseline))
+    print(f"Checking {len(event_ids)} events...")
+
+    http = make_http_session(concurrency)
+    events = fetch_events(http, event_service_url, event_ids, concurrency)
+
+    counts = {'checked': len(event_ids), 'missing': 0, 'errors': 0, 'baselined': 0,
+              'discrepancies': 0, 'repaired': 0}
+    available = {}
+    for event_id, event in events.items():
+        if event is None:
+            counts['missing'] += 1
+            print(f"Event {event_id} not found in EventService")
+        elif isinstance(event, Exception):
+            counts['errors'] += 1
+            print(f"Error fetching event {event_id}: {event}")
+        else:
+            available[event_id] = int(event.get('availableTickets', 0))
+
+    discrepancies, new_capacities = find_discrepancies(sold, capacities, available)
+    db.session.bulk_insert_mappings(EventInventory, [
+        {'event_id': event_id, 'capacity': capacity} for event_id, capacity in new_capacities.items()
+    ])
+    db.session.commit()
+    counts['baselined'] = len(new_capacities)
+    counts['discrepancies'] = len(discrepancies)
+
+    for d in discrepancies:
+        print(f"Event {d.event_id}: capacity {d.capacity}, sold {d.sold}, "
+              f"expected {d.expected} available, EventService has {d.actual} ({d.actual - d.expected:+d})")
+        if not apply_repairs:
+            continue
+        try:
+            if repair(http, event_service_url, d, events[d.event_id]):
+                counts['repaired'] += 1
+            else:
+                print(f"Event {d.event_id} changed during the check, not repaired")
+        except Exception as e:
+            print(f"Error repairing event {d.event_id}: {e}")
+
+    return counts
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Compare sold tickets with EventService inventory')
+    parser.add_argument('--repair', action='store_true',
+                        help='Write the expected availability back to EventService (default: False)')
+    parser.add_argument('--concurrency', type=int, default=32,
+                        help='Maximum EventService requests in flight (default: 32)')
+    parser.add_argument('--rebaseline', nargs='+', default=[], metavar='EVENT_ID',
+                        help='Forget the recorded capacity of these events, e.g. after their inventory was edited')
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_arguments()
+
+    app = create_app({'SAGA_WORKERS': 0})
+    event_service_url = os.getenv('EVENT_SERVICE_URL', 'http://localhost:8081')
+    with app.app_context():
+        router = app.extensions.get('shards')
+        # Each shard holds the bookings of its own events
+        for shard in (router.shards if router else [None]):
+            if shard is not None:
+                use_shard(shard)
+                print(f"Reconciling shard {shard.index}...")
+            try:
+                counts = reconcile(event_service_url, args.concurrency, args.repair, args.rebaseline)
+                print(f"✅ {counts['checked']} events checked, {counts['discrepancies']} discrepancies, "
+                      f"{counts['repaired']} repaired, {counts['baselined']} baselined, "
+                      f"{counts['missing']} missing, {counts['errors']} errors")
+            except Exception as e:
+                db.session.rollback()
+                print(f"❌ Error reconciling inventory: {e}")
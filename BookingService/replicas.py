@@ -0,0 +1,171 @@
+"""Routing of read-only queries to database read replicas.
+
+Replicas are used round-robin. A replica that raises a database error is
+taken out of rotation and retried after a cool-down, and the query is rerun
+on the primary. Users who have just written are pinned to the primary for a
+short while so they always see their own bookings despite replication lag.
+
+Which users a client has just written for travels with the client, in a
+value signed with the app's secret that the web layer keeps in a cookie,
+so any worker process or node serving its next read knows to use the
+primary.
+"""
+import hashlib
+import hmac
+import itertools
+import threading
+import time
+
+class Replica:
+    def __init__(self, url, engine_options=None):
+        self.url = url
+        self.engine_options = engine_options or {}
+        self.engine = None
+        self.session_factory = None
+        self.down_until = 0
+        self.lock = threading.Lock()
+
+    def session(self):
+        if self.session_factory is None:
+            with self.lock:
+                if self.session_factory is None:
+                    # Imported lazily like the other clients
+                    from sqlalchemy import create_engine
+                    from sqlalchemy.orm import sessionmaker
+                    self.engine = create_engine(self.url, **self.engine_options)
+                    self.session_factory = sessionmaker(bind=self.engine)
+        return self.session_factory()
+
+class ReplicaRouter:
+    def __init__(self, urls, secret, retry_interval=30, sticky_seconds=5, max_sticky_users=20,
+                 engine_options=None, clock=time.time):
+        self.replicas = [Replica(url, engine_options) for url in urls]
+        self.secret = secret.encode() if isinstance(secret, str) else secret
+        self.retry_interval = retry_interval
+        self.sticky_seconds = sticky_seconds
+        self.max_sticky_users = max_sticky_users
+        self.clock = clock
+        self.counter = itertools.count()
+        self.lock = threading.Lock()
+        self.stats = {'replica_reads': 0, 'primary_reads': 0, 'replica_errors': 0}
+
+    def record_write(self, sticky, user_id):
+        """Pin a user's reads to the primary after they write.
+
+        sticky maps user ids to the time until which their reads go to the
+        primary, as decoded from the client by decode_sticky.
+        """
+        sticky.pop(str(user_id), None)
+        sticky[str(user_id)] = self.clock() + self.sticky_seconds
+        # A client writes for one user at a time; keep only the latest few
+        while len(sticky) > self.max_sticky_users:
+            del sticky[next(iter(sticky))]
+
+    def is_sticky(self, sticky, user_id):
+        until = sticky.get(str(user_id)) if sticky else None
+        return until is not None and until > self.clock()
+
+    def _sign(self, payload):
+        return hmac.new(self.secret, payload.encode(), hashlib.sha256).hexdigest()
+
+    def encode_sticky(self, sticky):
+        """Signed 'user:until,...' value for the client to send back"""
+        payload = ','.join(f'{user_id}:{until:.3f}' for user_id, until in sticky.items())
+        return f'{payload}.{self._sign(payload)}'
+
+    def decode_sticky(self, value):
+        """Unexpired entries of a value from encode_sticky; {} if missing or forged"""
+        if not value or '.' not in value:
+            return {}
+        payload, _, signature = value.rpartition('.')
+        if not hmac.compare_digest(signature, self._sign(payload)):
+            return {}
+        now = self.clock()
+        sticky = {}
+        for entry in filter(None, payload.split(',')):
+            user_id, _, until = entry.rpartition(':')
+            try:
+                if float(until) > now:
+                    sticky[user_id] = float(until)
+            except ValueError:
+                return {}
+        return sticky
+
+    def check(self, replica):
+        """Probe a replica with a trivial query and record the outcome"""
+        from sqlalchemy import text
+        session = replica.session()
+        try:
+            session.execute(text('SELECT 1'))
+            replica.down_until = 0
+            return True
+        except Exception as e:
+            print(f"Read replica {self.replicas.index(replica)} is unhealthy: {e}")
+            replica.down_until = self.clock() + self.retry_interval
+            return False
+        finally:
+            session.close()
+
+    def healthy_replica(self):
+        """Next healthy replica in round-robin order, or None.
+        
+        A replica whose cool-down has expired is probed before it is given
+        real traffic again.
+        """
+        now = self.clock()
+        for _ in range(len(self.replicas)):
+            replica = self.replicas[next(self.counter) % len(self.replicas)]
+            if replica.down_until == 0:
+                return replica
+            if replica.down_until <= now and self.check(replica):
+                return replica
+        return None
+
+    def _count(self, name):
+        with self.lock:
+            self.stats[name] += 1
+
+    def run(self, query, primary_session, sticky=None, user_id=None, primary_if_missing=False, owner=None):
+        """Run query(session) on a replica, falling back to the primary session.
+
+        query must return plain data, since the replica session is closed
+        before returning. sticky holds the users the client has just
+        written for. With primary_if_missing, a None result from a replica
+        is retried on the primary in case the row has not replicated yet.
+        owner(result) names the user a result belongs to, for reads that do
+        not know it up front; if the client has just written for that user,
+        the result may be stale and is read again on the primary.
+        """
+        from sqlalchemy.exc import DBAPIError
+
+        replica = None if user_id is not None and self.is_sticky(sticky, user_id) else self.healthy_replica()
+        if replica is not None:
+            session = replica.session()
+            try:
+                result = query(session)
+                if result is None:
+                    fresh = not primary_if_missing
+                else:
+                    fresh = owner is None or not self.is_sticky(sticky, owner(result))
+                if fresh:
+                    self._count('replica_reads')
+                    return result
+            except DBAPIError as e:
+                print(f"Read replica {self.replicas.index(replica)} failed, using primary: {e}")
+                replica.down_until = self.clock() + self.retry_interval
+                self._count('replica_errors')
+            finally:
+                session.close()
+
+        self._count('primary_reads')
+        return query(primary_session)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'replicas': [
+                    {'index': index, 'healthy': replica.down_until == 0}
+                    for index, replica in enumerate(self.replicas)
+                ],
+                **self.stats
+            }
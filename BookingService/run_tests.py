@@ -1,28 +1,102 @@
+"""Run the BookingService tests in parallel, and the micro-benchmarks on request.
+
+Every test file runs as a script in its own process, so files share no
+module state, and up to --jobs files run at once. Test files that need
+PostgreSQL, EventService or RabbitMQ to be running are left out unless
+--integration is given.
+
+Timings depend on the machine and on what else it is doing, so the
+micro-benchmarks only run with --bench, and only then can a regression fail
+the run. They run after the tests, on their own, so they are not timed
+while tests compete for the CPU.
+
+    python run_tests.py                      # unit tests only
+    python run_tests.py --integration        # also the tests against running services
+    python run_tests.py --bench -j 4         # unit tests, then benchmarks
+    python run_tests.py --benchmarks-only
+    python run_tests.py test_saga.py test_seatmap.py
+"""
+import argparse
+import glob
 import os
+import subprocess
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Need the real database, EventService or RabbitMQ
+INTEGRATION_TESTS = ['test_db.py', 'test_event_service.py', 'test_rabbitmq.py', 'test_api.py', 'test_pending_booking.py']
+
+def discover(integration):
+    files = sorted(os.path.basename(path) for path in glob.glob(os.path.join(HERE, 'test_*.py')))
+    if integration:
+        return files
+    return [name for name in files if name not in INTEGRATION_TESTS]
 
-def run_test(test_name, test_file):
-    print(f"\n\n{'=' * 50}")
-    print(f"Running {test_name}...")
-    print(f"{'=' * 50}")
-    
-    # Run the test script
-    os.system(f"python {test_file}")
+def run_file(name, timeout):
+    """Run one test file; returns (name, passed, seconds, output)"""
+    started = time.perf_counter()
+    try:
+        result = subprocess.run([sys.executable, name], cwd=HERE, capture_output=True, text=True, timeout=timeout)
+        passed, output = result.returncode == 0, result.stdout + result.stderr
+    except subprocess.TimeoutExpired as e:
+        passed, output = False, f"{e.stdout or ''}{e.stderr or ''}\nTimed out after {timeout}s"
+    return name, passed, time.perf_counter() - started, output
+
+def run_tests(files, jobs, timeout):
+    """Run test files in parallel and return the names of those that failed"""
+    failed = []
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        futures = [pool.submit(run_file, name, timeout) for name in files]
+        for future in as_completed(futures):
+            name, passed, seconds, output = future.result()
+            print(f"{'✅' if passed else '❌'} {name} ({seconds:.1f}s)")
+            if not passed:
+                failed.append(name)
+                print(output)
+    return sorted(failed)
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Run BookingService tests in parallel, and the micro-benchmarks with --bench')
+    parser.add_argument('files', nargs='*',
+                        help='Test files to run (default: every test_*.py)')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1,
+                        help='Test files run at once (default: number of CPUs)')
+    parser.add_argument('--integration', action='store_true',
+                        help='Also run the tests that need running services (default: False)')
+    parser.add_argument('--timeout', type=float, default=300,
+                        help='Seconds before a test file is stopped (default: 300)')
+    parser.add_argument('--bench', action='store_true',
+                        help='Also run the micro-benchmarks after the tests; regressions fail the run (default: False)')
+    parser.add_argument('--benchmarks-only', action='store_true',
+                        help='Only run the micro-benchmarks (default: False)')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='Store the benchmark results as the new baseline; implies --bench (default: False)')
+    args = parser.parse_args()
+    args.bench = args.bench or args.benchmarks_only or args.save_baseline
+    return args
 
 if __name__ == "__main__":
-    print("Running Booking Service Tests")
-    print("============================")
-    
-    # Test database connection
-    run_test("Database Connection Test", "test_db.py")
-    
-    # Test Event Service connection
-    run_test("Event Service Connection Test", "test_event_service.py")
-    
-    # Test RabbitMQ connection
-    run_test("RabbitMQ Connection Test", "test_rabbitmq.py")
-    
-    # Test API endpoints
-    run_test("API Endpoints Test", "test_api.py")
-    
-    print("\n\nAll tests completed!") 
\ No newline at end of file
+    args = parse_arguments()
+    started = time.perf_counter()
+    failed = []
+
+    if not args.benchmarks_only:
+        files = args.files or discover(args.integration)
+        print(f"Running {len(files)} test files, {args.jobs} at a time")
+        failed = run_tests(files, args.jobs, args.timeout)
+        print(f"\n{len(files) - len(failed)} of {len(files)} test files passed")
+
+    benchmarks_passed = True
+    if args.bench:
+        print("\nRunning micro-benchmarks")
+        command = [sys.executable, 'benchmarks.py'] + (['--save-baseline'] if args.save_baseline else [])
+        benchmarks_passed = subprocess.run(command, cwd=HERE).returncode == 0
+
+    print(f"\nFinished in {time.perf_counter() - started:.1f}s")
+    if failed:
+        print(f"❌ Failed: {', '.join(failed)}")
+    if failed or not benchmarks_passed:
+        sys.exit(1)
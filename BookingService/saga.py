@@ -0,0 +1,384 @@
+"""Saga orchestration for the steps that follow a booking confirmation.
+
+Each step of a saga (payment, local commit, EventService decrement,
+notification) is a row in the saga_steps table, written in the same
+transaction as the booking it belongs to. Steps that call other services
+are attempted once on the request path; if that fails they are retried
+with exponential backoff by a pool of worker threads, so a request never
+waits on retries. A step that fails permanently runs its compensation.
+
+Steps of a saga run in order: a step waits until the one before it is done.
+Workers claim steps with a conditional update, so several processes can
+share the same table, and a claim that is not finished within its lease
+(for example because the process died) is picked up again.
+
+Step types registered with a batch handler are written behind instead:
+they are not attempted on the request path, and every batch_interval a
+flusher claims all that are due, groups them by key and performs one action
+per group. The pending rows are the durable record of what still has to be
+sent, so a crash loses nothing; a group whose action succeeded but whose
+rows were not yet marked done is sent again, as a single step would be. If
+a group is refused as a whole, its steps are run one by one, so only the
+ones that cannot succeed are compensated.
+"""
+import argparse
+import os
+import random
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+class PermanentStepError(Exception):
+    """A saga step failed in a way that retrying cannot fix"""
+
+StepHandler = namedtuple('StepHandler', ['action', 'compensate'])
+BatchHandler = namedtuple('BatchHandler', ['key', 'action'])
+
+def backoff_delay(attempts, base_delay, max_delay):
+    """Exponential backoff with jitter for the given number of failed attempts"""
+    delay = min(max_delay, base_delay * 2 ** (attempts - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+class SagaRunner:
+    def __init__(self, app, workers=4, poll_interval=5.0, batch_size=100,
+                 max_attempts=8, base_delay=2.0, max_delay=300.0, lease=60.0,
+                 batch_interval=1.0, batch_limit=5000):
+        self.app = app
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.lease = lease
+        self.batch_interval = batch_interval
+        self.batch_limit = batch_limit
+        self.handlers = {}
+        self.batch_handlers = {}
+        self.condition = threading.Condition()
+        self.thread = None
+        self.flusher = None
+        self.executor = None
+
+    def register(self, step, action, compensate=None, batch=None):
+        """action(payload) performs a step; compensate(step) undoes its effects on permanent failure.
+
+        With batch, a BatchHandler whose key(payload) groups due steps and
+        whose action(key, payloads) performs a whole group, the steps are
+        written behind by the flusher instead of run one by one.
+        """
+        self.handlers[step] = StepHandler(action, compensate)
+        if batch is not None:
+            self.batch_handlers[step] = batch
+
+    def targets(self):
+        """Databases holding saga steps: every shard, or just the primary"""
+        router = self.app.extensions.get('shards')
+        return router.shards if router else [None]
+
+    def _bind(self, target):
+        from app import use_shard
+        if target is not None:
+            use_shard(target)
+
+    def start(self):
+        """Start the background poller, worker pool and flusher if configured.
+
+        Called when the app is created, so steps left behind by a crash or
+        restart are retried without waiting for a request, and again before
+        every request, since threads do not survive a fork and forked
+        workers must start their own.
+        """
+        if not self.workers or self.running():
+            return
+        with self.condition:
+            if self.thread is None or not self.thread.is_alive():
+                self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='saga-worker')
+                self.thread = threading.Thread(target=self._run, name='saga-poller', daemon=True)
+                self.thread.start()
+            if self.batch_handlers and (self.flusher is None or not self.flusher.is_alive()):
+                self.flusher = threading.Thread(target=self._flush_periodically, name='saga-flusher', daemon=True)
+                self.flusher.start()
+
+    def running(self):
+        return (self.thread is not None and self.thread.is_alive() and
+                (not self.batch_handlers or self.flusher is not None and self.flusher.is_alive()))
+
+    def kick(self):
+        """Ask the poller to look for due steps now"""
+        self.start()
+        with self.condition:
+            self.condition.notify()
+
+    def _step_filter(self, batched=False):
+        """Condition selecting the steps written behind, or all the others"""
+        from app import SagaStep
+        if batched:
+            return SagaStep.step.in_(list(self.batch_handlers))
+        return SagaStep.step.notin_(list(self.batch_handlers))
+
+    def _claim(self, step_ids, now, batched=False):
+        """Mark steps as running under a lease; return the ids this process won"""
+        from app import db, SagaStep
+        claimed = []
+        for step_id in step_ids:
+            updated = SagaStep.query.filter(
+                SagaStep.id == step_id,
+                SagaStep.status.in_(['PENDING', 'RUNNING']),
+                SagaStep.next_attempt_at <= now,
+                self._step_filter(batched)
+            ).update({
+                'status': 'RUNNING',
+                'next_attempt_at': now + timedelta(seconds=self.lease)
+            }, synchronize_session=False)
+            if updated:
+                claimed.append(step_id)
+        db.session.commit()
+        return claimed
+
+    def claim_due_steps(self, target):
+        """Claim up to batch_size steps that are due, including expired leases"""
+        from app import db, SagaStep
+        now = datetime.utcnow()
+        with self.app.app_context():
+            self._bind(target)
+            due = [step_id for (step_id,) in db.session.query(SagaStep.id).filter(
+                SagaStep.status.in_(['PENDING', 'RUNNING']),
+                SagaStep.next_attempt_at <= now,
+                self._step_filter()
+            ).order_by(SagaStep.next_attempt_at).limit(self.batch_size)]
+            return self._claim(due, now)
+
+    def run_now(self, step_ids):
+        """Attempt steps once in the calling thread, following on to the steps
+        they unblock; failures are left for the workers and batched steps
+        for the flusher.
+
+        Must be called inside an app context bound to the steps' database.
+        """
+        queue = list(step_ids)
+        retry_scheduled = False
+        while queue:
+            for step_id in self._claim(queue, datetime.utcnow()):
+                status = self._execute(step_id)
+                retry_scheduled |= status == 'PENDING'
+            queue = self._next_steps(queue)
+        if retry_scheduled:
+            self.kick()
+
+    def run_step(self, target, step_id):
+        with self.app.app_context():
+            self._bind(target)
+            self._execute(step_id)
+            if self._next_steps([step_id]):
+                self.kick()
+
+    def _execute(self, step_id):
+        """Run one claimed step and record the outcome; return its new status"""
+        from app import db, SagaStep
+        step = SagaStep.query.get(step_id)
+        if step is None or step.status != 'RUNNING':
+            return None
+
+        handler = self.handlers[step.step]
+        step.attempts += 1
+        try:
+            handler.action(step.payload_data())
+        except PermanentStepError as e:
+            self._record_failure(step, handler, e, permanent=True)
+        except Exception as e:
+            self._record_failure(step, handler, e)
+        else:
+            self._record_success(step)
+
+        status = step.status
+        db.session.commit()
+        return status
+
+    def _record_success(self, step):
+        step.status = 'DONE'
+        step.last_error = None
+        self._advance(step)
+
+    def _record_failure(self, step, handler, error, permanent=False):
+        step.last_error = str(error)
+        if permanent or step.attempts >= self.max_attempts:
+            self._fail(step, handler)
+        else:
+            step.status = 'PENDING'
+            step.next_attempt_at = datetime.utcnow() + timedelta(
+                seconds=backoff_delay(step.attempts, self.base_delay, self.max_delay)
+            )
+
+    def _advance(self, step):
+        """Make the next waiting step of the saga runnable"""
+        from app import SagaStep
+        following = SagaStep.query.filter(
+            SagaStep.saga_id == step.saga_id,
+            SagaStep.seq > step.seq,
+            SagaStep.status == 'WAITING'
+        ).order_by(SagaStep.seq).first()
+        if following is not None:
+            following.status = 'PENDING'
+            following.next_attempt_at = datetime.utcnow()
+
+    def _fail(self, step, handler):
+        from app import SagaStep
+        print(f"Saga step {step.step} of {step.saga_id} failed permanently: {step.last_error}")
+        step.status = 'FAILED'
+        if handler.compensate is not None:
+            handler.compensate(step)
+            step.status = 'COMPENSATED'
+            # Compensation may have repurposed the remaining steps, e.g. to
+            # notify about a cancellation, so let the saga carry on
+            self._advance(step)
+        else:
+            SagaStep.query.filter(
+                SagaStep.saga_id == step.saga_id,
+                SagaStep.seq > step.seq,
+                SagaStep.status == 'WAITING'
+            ).update({'status': 'SKIPPED'}, synchronize_session=False)
+
+    def _next_steps(self, step_ids):
+        """Ids of steps made runnable now by finishing the given steps"""
+        from app import SagaStep
+        saga_ids = [saga_id for (saga_id,) in SagaStep.query.with_entities(SagaStep.saga_id).filter(
+            SagaStep.id.in_(step_ids),
+            SagaStep.status.in_(['DONE', 'COMPENSATED'])
+        )]
+        if not saga_ids:
+            return []
+        return [step_id for (step_id,) in SagaStep.query.with_entities(SagaStep.id).filter(
+            SagaStep.saga_id.in_(saga_ids),
+            SagaStep.status == 'PENDING',
+            SagaStep.attempts == 0
+        )]
+
+    def run_pending(self):
+        """Run every due step in the calling thread; return how many ran"""
+        count = 0
+        for target in self.targets():
+            for step_id in self.claim_due_steps(target):
+                self.run_step(target, step_id)
+                count += 1
+        return count
+
+    def flush_batches(self):
+        """Perform the due batched steps of every database, one action per group; return how many ran"""
+        count = 0
+        for target in self.targets():
+            with self.app.app_context():
+                self._bind(target)
+                count += self._flush(target)
+        return count
+
+    def _flush(self, target):
+        from app import db, SagaStep
+        if not self.batch_handlers:
+            return 0
+        now = datetime.utcnow()
+        due = [step_id for (step_id,) in db.session.query(SagaStep.id).filter(
+            SagaStep.status.in_(['PENDING', 'RUNNING']),
+            SagaStep.next_attempt_at <= now,
+            self._step_filter(batched=True)
+        ).order_by(SagaStep.next_attempt_at).limit(self.batch_limit)]
+        claimed = self._claim(due, now, batched=True)
+        if not claimed:
+            return 0
+
+        groups = {}
+        for step in SagaStep.query.filter(SagaStep.id.in_(claimed)).order_by(SagaStep.id):
+            batch = self.batch_handlers[step.step]
+            groups.setdefault((step.step, batch.key(step.payload_data())), []).append(step)
+
+        unblocked = []
+        for (name, key), steps in groups.items():
+            handler = self.handlers[name]
+            try:
+                self.batch_handlers[name].action(key, [step.payload_data() for step in steps])
+            except PermanentStepError as e:
+                # Run the steps of a refused group on their own, so only the
+                # ones that cannot succeed are compensated
+                print(f"Batched {name} for {key} refused, running its {len(steps)} steps one by one: {e}")
+                step_ids = [step.id for step in steps]
+                for step_id in step_ids:
+                    self._execute(step_id)
+                unblocked += self._next_steps(step_ids)
+                continue
+            except Exception as e:
+                for step in steps:
+                    step.attempts += 1
+                    self._record_failure(step, handler, e)
+            else:
+                for step in steps:
+                    step.attempts += 1
+                    self._record_success(step)
+            db.session.commit()
+            unblocked += self._next_steps([step.id for step in steps])
+
+        if unblocked:
+            self.run_now(unblocked)
+        return len(claimed)
+
+    def _flush_periodically(self):
+        while True:
+            time.sleep(self.batch_interval)
+            try:
+                self.flush_batches()
+            except Exception as e:
+                print(f"Error flushing batched saga steps: {e}")
+
+    def _run(self):
+        while True:
+            claimed = 0
+            for target in self.targets():
+                try:
+                    step_ids = self.claim_due_steps(target)
+                except Exception as e:
+                    print(f"Error polling saga steps: {e}")
+                    continue
+                for step_id in step_ids:
+                    self.executor.submit(self._run_logged, target, step_id)
+                claimed += len(step_ids)
+
+            if claimed < self.batch_size:
+                with self.condition:
+                    self.condition.wait(self.poll_interval)
+
+    def _run_logged(self, target, step_id):
+        try:
+            self.run_step(target, step_id)
+        except Exception as e:
+            print(f"Error running saga step {step_id}: {e}")
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Run saga step retries outside the web process')
+    parser.add_argument('--once', action='store_true',
+                        help='Run the steps that are due now and exit (default: False)')
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_arguments()
+
+    from app import create_app, db, SagaStep
+
+    # Started below once the tables exist, and not at all with --once
+    app = create_app({'SAGA_WORKERS': 0})
+    runner = app.extensions['saga']
+    with app.app_context():
+        for target in runner.targets():
+            SagaStep.__table__.create(target.connect() if target else db.engine, checkfirst=True)
+
+    if args.once:
+        print(f"✅ Ran {runner.run_pending() + runner.flush_batches()} saga steps")
+    else:
+        print("🔁 Processing saga steps, press Ctrl+C to exit")
+        runner.workers = int(os.getenv('SAGA_WORKERS', 4)) or 4
+        runner.start()
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            print("\nSaga worker stopped")
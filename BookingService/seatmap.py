@@ -0,0 +1,422 @@
+"""Assigned seating backed by bitsets.
+
+Each row of seats is a pair of Python ints used as bitsets: bit i of `sold`
+or `held` is set when seat i is taken. Finding N adjacent free seats in a
+row is a handful of shift-and-AND operations on the free bits, and rows
+without enough free seats are skipped by their free count, so allocating
+in a 100k-seat venue never walks individual seats.
+
+Sold seats are stored one row of the seat_rows table per seat row, with the
+bitset packed into bytes, and holds in the seat_holds table until they
+expire, so every worker process sees the same holds. Each process searches
+its own copy of a seat map, but every hold or sale bumps the version of its
+row with a conditional update. A process whose copy of a row is out of date
+cannot act on it: its write fails, and it reloads the row with its holds
+and searches again. A sale that finds its row changed only fails if its own
+seats were sold; otherwise it is retried on the new version.
+"""
+import heapq
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+class SeatConflict(Exception):
+    """The seats are no longer available"""
+
+def find_run(free, length):
+    """Index of the lowest run of `length` set bits in free, or -1"""
+    run = 1
+    while run < length and free:
+        step = min(run, length - run)
+        # Bit i now means bits i .. i+run+step-1 are all set
+        free &= free >> step
+        run += step
+    if not free:
+        return -1
+    return (free & -free).bit_length() - 1
+
+def run_bits(start, length):
+    return ((1 << length) - 1) << start
+
+def pack(bits, seats):
+    return bits.to_bytes((seats + 7) // 8, 'little')
+
+def unpack(data):
+    return int.from_bytes(data or b'', 'little')
+
+class Row:
+    __slots__ = ('section', 'number', 'seats', 'sold', 'held', 'free', 'version', 'holds')
+
+    def __init__(self, section, number, seats, sold=0, version=0):
+        self.section = section
+        self.number = number
+        self.seats = seats
+        self.sold = sold
+        self.held = 0
+        # None once the row may have changed in the database
+        self.version = version
+        self.free = seats - bin(sold).count('1')
+        # Ids of the holds with seats in this row
+        self.holds = set()
+
+    def free_bits(self):
+        return ~(self.sold | self.held) & ((1 << self.seats) - 1)
+
+    def label(self, seat):
+        return f'{self.section}-{self.number}-{seat + 1}'
+
+class Hold:
+    def __init__(self, event_id, user_id, blocks, expires_at, hold_id=None):
+        self.id = hold_id or uuid.uuid4().hex
+        self.event_id = event_id
+        self.user_id = user_id
+        # [(row, first seat index, count)]
+        self.blocks = blocks
+        self.expires_at = expires_at
+
+    @property
+    def count(self):
+        return sum(count for _, _, count in self.blocks)
+
+    def seats(self):
+        return [row.label(start + i) for row, start, count in self.blocks for i in range(count)]
+
+    def to_dict(self):
+        return {
+            'hold_id': self.id,
+            'event_id': self.event_id,
+            'user_id': self.user_id,
+            'seats': self.seats(),
+            'expires_in': max(0, round(self.expires_at - time.time()))
+        }
+
+class SeatMap:
+    """The seats of one event in memory.
+
+    Without claim and reload_row the map stands alone. With them it is a
+    copy of a shared store: claim(hold) writes a new hold there and returns
+    False if the row changed first, and reload_row(event_id, row) returns
+    the row's (sold, version, holds) as the store has them.
+    """
+
+    def __init__(self, event_id, rows, clock=time.time, claim=None, reload_row=None):
+        self.event_id = event_id
+        self.rows = rows
+        self.index = {(row.section, row.number): row for row in rows}
+        self.holds = {}
+        # (expires_at, hold id) of every hold, including ones since released
+        self.expiries = []
+        self.clock = clock
+        self.claim = claim
+        self.reload_row = reload_row
+        self.loaded_at = clock()
+        # Reentrant, since claim and reload_row run while it is held
+        self.lock = threading.RLock()
+
+    def _expire(self):
+        now = self.clock()
+        while self.expiries and self.expiries[0][0] <= now:
+            _, hold_id = heapq.heappop(self.expiries)
+            hold = self.holds.get(hold_id)
+            if hold is not None:
+                self._drop(hold)
+
+    def _add(self, hold_id, user_id, row, start, count, expires_at):
+        hold = self.holds.get(hold_id)
+        if hold is None:
+            hold = self.holds[hold_id] = Hold(self.event_id, user_id, [], expires_at, hold_id)
+            heapq.heappush(self.expiries, (expires_at, hold_id))
+        hold.blocks.append((row, start, count))
+        row.held |= run_bits(start, count)
+        row.free -= count
+        row.holds.add(hold_id)
+        return hold
+
+    def _drop(self, hold):
+        for row, start, count in hold.blocks:
+            row.held &= ~run_bits(start, count)
+            row.free += count
+            row.holds.discard(hold.id)
+        del self.holds[hold.id]
+
+    def _reload(self, row):
+        sold, version, holds = self.reload_row(self.event_id, row)
+        for hold_id in row.holds:
+            hold = self.holds[hold_id]
+            hold.blocks = [block for block in hold.blocks if block[0] is not row]
+            if not hold.blocks:
+                del self.holds[hold_id]
+        row.holds = set()
+        row.sold, row.held, row.version = sold, 0, version
+        row.free = row.seats - bin(sold).count('1')
+        self.add_holds(holds)
+
+    def add_holds(self, holds):
+        """Add (hold id, user id, row, first seat, count, expires_at) blocks held elsewhere"""
+        with self.lock:
+            now = self.clock()
+            for hold_id, user_id, row, start, count, expires_at in holds:
+                if expires_at > now:
+                    self._add(hold_id, user_id, row, start, count, expires_at)
+
+    def hold(self, user_id, count, section=None, ttl=600, attempts=5):
+        """Hold `count` adjacent seats in the first row that has them; None if no row does.
+
+        A row that changed in the shared store since it was loaded is
+        reloaded and searched again, up to `attempts` times.
+        """
+        with self.lock:
+            self._expire()
+            for row in self.rows:
+                if section is not None and row.section != section:
+                    continue
+                for _ in range(attempts):
+                    if row.version is None:
+                        self._reload(row)
+                    if row.free < count:
+                        break
+                    start = find_run(row.free_bits(), count)
+                    if start < 0:
+                        break
+                    hold = Hold(self.event_id, user_id, [(row, start, count)], self.clock() + ttl)
+                    if self.claim is None or self.claim(hold):
+                        return self._add(hold.id, user_id, row, start, count, hold.expires_at)
+                    row.version = None
+            return None
+
+    def get_hold(self, hold_id):
+        with self.lock:
+            self._expire()
+            return self.holds.get(hold_id)
+
+    def release(self, hold_id):
+        with self.lock:
+            hold = self.holds.get(hold_id)
+            if hold is None:
+                return False
+            self._drop(hold)
+            return True
+
+    def mark_stale(self, section, number):
+        """Reload a row before it is next used, e.g. after seats in it were sold or released"""
+        with self.lock:
+            row = self.index.get((section, number))
+            if row is not None:
+                row.version = None
+
+    def summary(self):
+        with self.lock:
+            self._expire()
+            sections = {}
+            for row in self.rows:
+                if row.version is None:
+                    self._reload(row)
+                section = sections.setdefault(row.section, {'rows': 0, 'seats': 0, 'free': 0})
+                section['rows'] += 1
+                section['seats'] += row.seats
+                section['free'] += row.free
+            return {'event_id': self.event_id, 'sections': sections, 'holds': len(self.holds)}
+
+def to_datetime(timestamp):
+    return datetime.fromtimestamp(timestamp, timezone.utc).replace(tzinfo=None)
+
+def to_timestamp(value):
+    return value.replace(tzinfo=timezone.utc).timestamp()
+
+class SeatMapStore:
+    """Seat maps of this process, loaded from the seat_rows and seat_holds tables.
+
+    A map is loaded again once it is refresh_interval seconds old, so seats
+    released by other processes are offered again. Must be used inside an
+    app context whose db.session points at the event's database.
+    """
+
+    def __init__(self, hold_ttl=600, refresh_interval=5, attempts=5):
+        self.hold_ttl = hold_ttl
+        self.refresh_interval = refresh_interval
+        self.attempts = attempts
+        self.maps = {}
+        self.lock = threading.Lock()
+
+    def get(self, event_id):
+        seat_map = self.maps.get(event_id)
+        if seat_map is None or time.time() - seat_map.loaded_at >= self.refresh_interval:
+            seat_map = self._load(event_id)
+            if seat_map is not None:
+                with self.lock:
+                    self.maps[event_id] = seat_map
+        return seat_map
+
+    def _load(self, event_id):
+        from app import SeatHold, SeatRow
+        # Rows are read before holds: a hold sold or added in between has
+        # bumped its row's version, so the first write to the row fails
+        records = SeatRow.query.filter_by(event_id=event_id).order_by(
+            SeatRow.section, SeatRow.row).populate_existing().all()
+        if not records:
+            return None
+        rows = [Row(r.section, r.row, r.seats, unpack(r.sold), r.version) for r in records]
+        seat_map = SeatMap(event_id, rows, claim=self._claim, reload_row=self._reload_row)
+        holds = SeatHold.query.filter(SeatHold.event_id == event_id,
+                                      SeatHold.expires_at > datetime.utcnow()).all()
+        seat_map.add_holds((h.hold_id, h.user_id, seat_map.index[(h.section, h.row)],
+                            h.first_seat, h.count, to_timestamp(h.expires_at)) for h in holds)
+        return seat_map
+
+    def _reload_row(self, event_id, row):
+        from app import SeatHold, SeatRow
+        record = SeatRow.query.filter_by(
+            event_id=event_id, section=row.section, row=row.number
+        ).populate_existing().one()
+        holds = SeatHold.query.filter(SeatHold.event_id == event_id, SeatHold.section == row.section,
+                                      SeatHold.row == row.number, SeatHold.expires_at > datetime.utcnow()).all()
+        return unpack(record.sold), record.version, [
+            (h.hold_id, h.user_id, row, h.first_seat, h.count, to_timestamp(h.expires_at)) for h in holds
+        ]
+
+    def _claim(self, hold):
+        """Commit a new hold, bumping its rows' versions; False if a row changed since it was loaded"""
+        from app import db, SeatHold, SeatRow
+        now = datetime.utcnow()
+        for row, start, count in hold.blocks:
+            updated = SeatRow.query.filter_by(
+                event_id=hold.event_id, section=row.section, row=row.number, version=row.version
+            ).update({'version': row.version + 1}, synchronize_session=False)
+            if not updated:
+                db.session.rollback()
+                return False
+            # Expired holds of the row are cleared out with the new one
+            SeatHold.query.filter(SeatHold.event_id == hold.event_id, SeatHold.section == row.section,
+                                  SeatHold.row == row.number, SeatHold.expires_at <= now
+                                  ).delete(synchronize_session=False)
+            db.session.add(SeatHold(hold_id=hold.id, event_id=hold.event_id, section=row.section, row=row.number,
+                                    user_id=hold.user_id, first_seat=start, count=count,
+                                    expires_at=to_datetime(hold.expires_at)))
+        db.session.commit()
+        for row, _, _ in hold.blocks:
+            row.version += 1
+        return True
+
+    def invalidate(self, event_id):
+        with self.lock:
+            self.maps.pop(event_id, None)
+
+    def create(self, event_id, sections):
+        """Add the rows of a new seat map to the session; sections maps names to row lengths"""
+        from app import db, SeatRow
+        for section, rows in sections.items():
+            for number, seats in enumerate(rows, start=1):
+                db.session.add(SeatRow(event_id=event_id, section=section, row=number,
+                                       seats=seats, sold=pack(0, seats), version=0))
+        self.invalidate(event_id)
+
+    def get_hold(self, event_id, hold_id):
+        """A hold as the seat_holds table has it, or None if it expired or was used"""
+        from app import SeatHold
+        seat_map = self.get(event_id)
+        if seat_map is None:
+            return None
+        records = SeatHold.query.filter(SeatHold.hold_id == hold_id, SeatHold.event_id == event_id,
+                                        SeatHold.expires_at > datetime.utcnow()).all()
+        if not records:
+            return None
+        blocks = [(seat_map.index[(r.section, r.row)], r.first_seat, r.count) for r in records]
+        return Hold(event_id, records[0].user_id, blocks, to_timestamp(records[0].expires_at), hold_id)
+
+    def release(self, event_id, hold_id):
+        """Delete a hold so its seats go back on sale; False if it was not found or expired"""
+        from app import db, SeatHold
+        released = SeatHold.query.filter(SeatHold.hold_id == hold_id, SeatHold.event_id == event_id,
+                                         SeatHold.expires_at > datetime.utcnow()
+                                         ).delete(synchronize_session=False)
+        db.session.commit()
+        seat_map = self.maps.get(event_id)
+        if seat_map is not None:
+            seat_map.release(hold_id)
+        return bool(released)
+
+    def commit_hold(self, event_id, hold_id, user_id, booking_id):
+        """Sell a hold's seats to a booking in the current transaction.
+
+        Raises SeatConflict if the hold expired, belongs to someone else, or
+        its seats were sold. If a row changed since the hold was made, for
+        example because other seats in it were sold, only the hold's own
+        seats are checked before the sale is retried on the new version. The
+        hold is deleted in the same transaction, so a rollback keeps it.
+        """
+        from app import db, SeatAssignment, SeatHold, SeatRow
+        hold = self.get_hold(event_id, hold_id)
+        if hold is None or hold.user_id != user_id:
+            raise SeatConflict('Seat hold not found or expired')
+        # A second booking of the same hold waits on this delete, then finds nothing
+        if not SeatHold.query.filter_by(hold_id=hold_id).delete(synchronize_session=False):
+            raise SeatConflict('Seat hold not found or expired')
+
+        seat_map = self.maps.get(event_id)
+        for row, start, count in hold.blocks:
+            bits = run_bits(start, count)
+            for _ in range(self.attempts):
+                record = SeatRow.query.filter_by(
+                    event_id=event_id, section=row.section, row=row.number
+                ).populate_existing().one()
+                sold = unpack(record.sold)
+                if sold & bits:
+                    raise SeatConflict('Seats were sold by another request')
+                updated = SeatRow.query.filter_by(
+                    event_id=event_id, section=row.section, row=row.number, version=record.version
+                ).update({'sold': pack(sold | bits, record.seats), 'version': record.version + 1},
+                         synchronize_session=False)
+                if updated:
+                    break
+            else:
+                raise SeatConflict('Seat row kept changing while selling seats')
+            db.session.add(SeatAssignment(booking_id=booking_id, event_id=event_id, section=row.section,
+                                          row=row.number, first_seat=start, count=count))
+            if seat_map is not None:
+                seat_map.mark_stale(row.section, row.number)
+        return hold
+
+    def release_booking(self, event_id, booking_id, attempts=5):
+        """Return a booking's seats to sale in the current transaction"""
+        from app import SeatAssignment, SeatRow
+        assignments = SeatAssignment.query.filter_by(booking_id=booking_id).all()
+        seat_map = self.maps.get(event_id)
+        for assignment in assignments:
+            for _ in range(attempts):
+                record = SeatRow.query.filter_by(
+                    event_id=event_id, section=assignment.section, row=assignment.row
+                ).populate_existing().one()
+                sold = unpack(record.sold) & ~run_bits(assignment.first_seat, assignment.count)
+                updated = SeatRow.query.filter_by(
+                    event_id=event_id, section=assignment.section, row=assignment.row, version=record.version
+                ).update({'sold': pack(sold, record.seats), 'version': record.version + 1},
+                         synchronize_session=False)
+                if updated:
+                    break
+            else:
+                raise SeatConflict('Seat row kept changing while releasing seats')
+            SeatAssignment.query.filter_by(id=assignment.id).delete(synchronize_session=False)
+            if seat_map is not None:
+                seat_map.mark_stale(assignment.section, assignment.row)
+        return len(assignments)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Manage seat map tables')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('init', help='Create the seat map tables')
+    args = parser.parse_args()
+
+    from app import create_app, db, SeatAssignment, SeatHold, SeatRow
+
+    app = create_app({'SAGA_WORKERS': 0})
+    with app.app_context():
+        router = app.extensions.get('shards')
+        for shard in (router.shards if router else [None]):
+            engine = shard.connect() if shard else db.engine
+            SeatRow.__table__.create(engine, checkfirst=True)
+            SeatAssignment.__table__.create(engine, checkfirst=True)
+            SeatHold.__table__.create(engine, checkfirst=True)
+        print("✅ Seat map tables are ready")
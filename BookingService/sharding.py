@@ -0,0 +1,223 @@
+"""Sharding of bookings across several databases by event_id.
+
+New events are placed on shards with a consistent hash ring, and the
+placement is recorded in an event directory on the first shard the first
+time an event is routed. The directory is consulted before the ring, so an
+event stays on its shard when shards are added, and only events not seen
+before can land on a new shard. Booking ids carry the index of the shard
+they were written to (id % SHARD_SLOTS), so a booking is found with one
+lookup. Ids are handed out in blocks reserved from a counter row on each
+shard, so allocation costs one short transaction per block instead of one
+per booking.
+
+Shard order in the configuration is significant: new shards must be added
+at the end and existing ones never removed or reordered. Databases sharded
+before the directory existed must run `pin` before a shard is added.
+"""
+import argparse
+import bisect
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Upper bound on the number of shards; fixed because it is baked into ids
+SHARD_SLOTS = 1024
+
+def _hash(value):
+    return int.from_bytes(hashlib.md5(str(value).encode()).digest()[:8], 'big')
+
+class HashRing:
+    """Consistent hash ring with virtual nodes for even spread"""
+
+    def __init__(self, nodes, vnodes=64):
+        self.ring = sorted((_hash(f'{node}#{i}'), node) for node in nodes for i in range(vnodes))
+        self.keys = [key for key, _ in self.ring]
+
+    def node_for(self, key):
+        index = bisect.bisect(self.keys, _hash(key)) % len(self.ring)
+        return self.ring[index][1]
+
+class Shard:
+    def __init__(self, index, url, query_cls=None, engine_options=None):
+        self.index = index
+        self.url = url
+        self.query_cls = query_cls
+        self.engine_options = engine_options or {}
+        self.engine = None
+        self.session_factory = None
+        self.lock = threading.Lock()
+        # Current reserved id block: next local id to hand out and its limit
+        self.next_id = 0
+        self.block_end = 0
+
+    def connect(self):
+        if self.engine is None:
+            with self.lock:
+                if self.engine is None:
+                    from sqlalchemy import create_engine
+                    from sqlalchemy.orm import sessionmaker
+                    engine = create_engine(self.url, **self.engine_options)
+                    options = {'query_cls': self.query_cls} if self.query_cls else {}
+                    self.session_factory = sessionmaker(bind=engine, **options)
+                    self.engine = engine
+        return self.engine
+
+    def session(self):
+        self.connect()
+        return self.session_factory()
+
+class ShardRouter:
+    def __init__(self, urls, block_size=1000, query_cls=None, engine_options=None):
+        if len(urls) > SHARD_SLOTS:
+            raise ValueError(f"At most {SHARD_SLOTS} shards are supported")
+        self.shards = [Shard(index, url, query_cls, engine_options) for index, url in enumerate(urls)]
+        self.ring = HashRing(range(len(self.shards)))
+        self.block_size = block_size
+        # event_id -> shard index; placements never change, so they are kept
+        self.placements = {}
+
+    def shard_for_event(self, event_id):
+        """The event's shard from the directory, placing it by the ring the first time"""
+        index = self.placements.get(event_id)
+        if index is None:
+            index = pin_event(self.shards[0].connect(), event_id, self.ring.node_for(event_id))
+            self.placements[event_id] = index
+        return self.shards[index]
+
+    def shard_for_booking(self, booking_id):
+        """Shard a booking id was allocated on, or None for ids from no known shard"""
+        index = booking_id % SHARD_SLOTS
+        return self.shards[index] if index < len(self.shards) else None
+
+    def allocate_booking_id(self, shard):
+        """Globally unique booking id that encodes the shard"""
+        with shard.lock:
+            if shard.next_id >= shard.block_end:
+                block = reserve_id_block(shard.connect())
+                shard.next_id = block * self.block_size
+                shard.block_end = shard.next_id + self.block_size
+            local_id = shard.next_id
+            shard.next_id += 1
+        # Local id 0 would give shard 0 the id 0; start every shard at 1
+        return (local_id + 1) * SHARD_SLOTS + shard.index
+
+    def scatter(self, query):
+        """Run query(session) on every shard in parallel; return the results in shard order"""
+        def run(shard):
+            session = shard.session()
+            try:
+                return query(session)
+            finally:
+                session.close()
+
+        with ThreadPoolExecutor(max_workers=len(self.shards)) as executor:
+            return list(executor.map(run, self.shards))
+
+_id_blocks_table = None
+
+def id_blocks_table():
+    """Single-row counter of id blocks reserved on a shard"""
+    global _id_blocks_table
+    if _id_blocks_table is None:
+        from sqlalchemy import BigInteger, Column, Integer, MetaData, Table
+        _id_blocks_table = Table(
+            'booking_id_blocks', MetaData(),
+            Column('id', Integer, primary_key=True),
+            Column('next_block', BigInteger, nullable=False)
+        )
+    return _id_blocks_table
+
+_event_shards_table = None
+
+def event_shards_table():
+    """Directory of the shard each event was placed on, kept on the first shard"""
+    global _event_shards_table
+    if _event_shards_table is None:
+        from sqlalchemy import Column, Integer, MetaData, String, Table
+        _event_shards_table = Table(
+            'event_shards', MetaData(),
+            Column('event_id', String(50), primary_key=True),
+            Column('shard', Integer, nullable=False)
+        )
+    return _event_shards_table
+
+def pin_event(engine, event_id, index):
+    """Shard index recorded for an event, recording index if it has none yet"""
+    from sqlalchemy.exc import IntegrityError
+    table = event_shards_table()
+    query = table.select().where(table.c.event_id == str(event_id))
+    with engine.connect() as connection:
+        row = connection.execute(query).first()
+    if row is not None:
+        return row.shard
+    try:
+        with engine.begin() as connection:
+            connection.execute(table.insert().values(event_id=str(event_id), shard=index))
+        return index
+    except IntegrityError:
+        # Placed by another process just now
+        with engine.connect() as connection:
+            return connection.execute(query).one().shard
+
+def reserve_id_block(engine):
+    """Atomically take the next id block number from a shard"""
+    table = id_blocks_table()
+    with engine.begin() as connection:
+        # The update locks the counter row until commit, so concurrent
+        # reservations from other processes get different blocks
+        connection.execute(table.update().where(table.c.id == 1).values(next_block=table.c.next_block + 1))
+        return connection.execute(table.select().where(table.c.id == 1)).one().next_block - 1
+
+def init_shard(engine, metadata, directory=False):
+    """Create the booking tables and the id block counter on a shard, and the
+    event directory on the first one"""
+    metadata.create_all(engine)
+    if directory:
+        event_shards_table().create(engine, checkfirst=True)
+    table = id_blocks_table()
+    table.create(engine, checkfirst=True)
+    with engine.begin() as connection:
+        if connection.execute(table.select()).first() is None:
+            connection.execute(table.insert().values(id=1, next_block=0))
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Manage BookingService database shards')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('init', help='Create the schema on every configured shard')
+    commands.add_parser('pin', help='Record the shard of every event that already has bookings')
+    locate = commands.add_parser('locate', help='Show the shard for an event or booking')
+    locate.add_argument('--event-id', help='Event ID to place on the ring')
+    locate.add_argument('--booking-id', type=int, help='Booking ID to decode')
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_arguments()
+
+    from app import create_app, db
+
+    app = create_app({'SAGA_WORKERS': 0})
+    router = app.extensions.get('shards')
+    if router is None:
+        print("❌ Sharding is not configured; set SHARD_DATABASE_URLS")
+    elif args.command == 'init':
+        for shard in router.shards:
+            init_shard(shard.connect(), db.metadata, directory=shard.index == 0)
+            print(f"✅ Initialized shard {shard.index}")
+    elif args.command == 'pin':
+        from sqlalchemy import select
+        from app import Booking
+        directory = router.shards[0].connect()
+        event_shards_table().create(directory, checkfirst=True)
+        for shard in router.shards:
+            with shard.connect().connect() as connection:
+                event_ids = connection.execute(select(Booking.event_id).distinct()).scalars().all()
+            misplaced = [event_id for event_id in event_ids if pin_event(directory, event_id, shard.index) != shard.index]
+            print(f"✅ Pinned {len(event_ids) - len(misplaced)} events to shard {shard.index}")
+            for event_id in misplaced:
+                print(f"❌ Event {event_id} has bookings on shard {shard.index} but is pinned elsewhere")
+    else:
+        if args.event_id:
+            print(f"Event {args.event_id} -> shard {router.shard_for_event(args.event_id).index}")
+        if args.booking_id is not None:
+            shard = router.shard_for_booking(args.booking_id)
+            print(f"Booking {args.booking_id} -> shard {shard.index if shard else 'unknown'}")
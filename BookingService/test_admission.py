@@ -0,0 +1,148 @@
+import os
+
+os.environ['RABBITMQ_HOST'] = '127.0.0.1'
+os.environ['SAGA_WORKERS'] = '0'
+
+from admission import AdmissionController, TokenBucket
+from app import create_app, db
+from fake_services import shared_event_service
+from testing import make_app
+
+event_service = shared_event_service()
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def print_test_header(test_name):
+    print("\n" + "=" * 50)
+    print(f"TEST: {test_name}")
+    print("=" * 50)
+
+def test_token_bucket_refills():
+    print_test_header("Token Bucket - Burst and Refill")
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2, capacity=3, clock=clock)
+
+    assert all(bucket.try_acquire()[0] for _ in range(3))
+    admitted, retry_after = bucket.try_acquire()
+    assert not admitted
+    assert retry_after == 0.5
+
+    clock.now += 0.5
+    assert bucket.try_acquire()[0]
+
+    print("✅ Test passed!")
+
+def test_controller_limits_users_and_events_independently():
+    print_test_header("Admission - Per User and Per Event Limits")
+    clock = FakeClock()
+    controller = AdmissionController(user_rate=1, user_burst=1, event_rate=1, event_burst=2, clock=clock)
+
+    assert controller.admit(1, 'evt-a')[0]
+    controller.release()
+    admitted, reason, _ = controller.admit(1, 'evt-b')
+    assert not admitted and 'user' in reason
+
+    assert controller.admit(2, 'evt-a')[0]
+    controller.release()
+    admitted, reason, _ = controller.admit(3, 'evt-a')
+    assert not admitted and 'event' in reason
+
+    counters = controller.snapshot()['counters']
+    assert counters == {
+        'admitted': 2,
+        'rejected_user_rate': 1,
+        'rejected_event_rate': 1,
+        'shed_in_flight': 0,
+        'shed_latency': 0
+    }
+
+    print("✅ Test passed!")
+
+def test_controller_sheds_on_in_flight_and_latency():
+    print_test_header("Admission - Load Shedding")
+    clock = FakeClock()
+    controller = AdmissionController(user_rate=0, event_rate=0, max_in_flight=1,
+                                     latency_threshold=0.5, latency_window=5, clock=clock)
+
+    assert controller.admit(1, 'evt')[0]
+    assert not controller.admit(2, 'evt')[0]
+    controller.release()
+
+    controller.record_latency('event_service', 2.0)
+    assert controller.slow_stage() == 'event_service'
+    assert not controller.admit(3, 'evt')[0]
+
+    # Stale samples stop shedding once the window has passed
+    clock.now += 6
+    assert controller.admit(4, 'evt')[0]
+
+    print("✅ Test passed!")
+
+def test_booking_endpoint_returns_429_with_retry_after():
+    print_test_header("Admission - 429 From Booking Endpoint")
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+        'ADMISSION_ENABLED': True,
+        'ADMISSION_USER_RATE': 0.1,
+        'ADMISSION_USER_BURST': 1
+    })
+    with app.app_context():
+        db.create_all()
+    event_service.add_event('evt-hot')
+    client = app.test_client()
+
+    booking = {'user_id': 7, 'event_id': 'evt-hot', 'tickets': 1}
+    assert client.post('/api/bookings', json=booking).status_code == 201
+
+    response = client.post('/api/bookings', json=booking)
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) >= 1
+
+    metrics = client.get('/metrics/admission').get_json()
+    assert metrics['enabled']
+    assert metrics['in_flight'] == 0
+    assert metrics['counters']['rejected_user_rate'] == 1
+    assert 'event_service' in metrics['stage_latency_ms']
+
+    print("✅ Test passed!")
+
+def test_only_booking_routes_are_limited():
+    print_test_header("Admission - Booking Routes Limited, Admin and Health Exempt")
+    app = make_app(ADMIN_TOKEN='secret', SEAT_MAPS_ENABLED=True, ADMISSION_ENABLED=True,
+                   ADMISSION_EVENT_RATE=0.01, ADMISSION_EVENT_BURST=1)
+    event_service.add_event('evt-empty')
+    client = app.test_client()
+
+    # The event's only token goes to the first booking
+    assert client.post('/api/bookings', json={'user_id': 1, 'event_id': 'evt-empty', 'tickets': 1}).status_code == 201
+    for path in ('/api/bookings', '/api/bookings/pending'):
+        response = client.post(path, json={'user_id': 2, 'event_id': 'evt-empty', 'tickets': 1})
+        assert response.status_code == 429, path
+        assert 'event' in response.get_json()['error']
+        assert int(response.headers['Retry-After']) >= 1
+
+    # Health checks and admin calls never take a token, even for the same event
+    for path in ('/health', '/health/live', '/health/ready', '/metrics/admission'):
+        assert client.get(path).status_code != 429, path
+    admin = {'Authorization': 'Bearer secret'}
+    assert client.get('/admin/profiler', headers=admin).status_code == 200
+    response = client.put('/api/bookings/event/evt-empty/seat-map', headers=admin,
+                          json={'user_id': 2, 'event_id': 'evt-empty', 'sections': {'A': [10]}})
+    assert response.status_code == 201
+
+    counters = client.get('/metrics/admission').get_json()['counters']
+    assert counters['admitted'] == 1 and counters['rejected_event_rate'] == 2
+
+    print("✅ Test passed!")
+
+if __name__ == "__main__":
+    test_token_bucket_refills()
+    test_controller_limits_users_and_events_independently()
+    test_controller_sheds_on_in_flight_and_latency()
+    test_booking_endpoint_returns_429_with_retry_after()
+    test_only_booking_routes_are_limited()
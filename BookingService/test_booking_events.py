@@ -0,0 +1,164 @@
+import json
+import os
+import tempfile
+import threading
+import time
+
+os.environ['RABBITMQ_HOST'] = '127.0.0.1'
+os.environ['SAGA_WORKERS'] = '0'
+
+from app import db, record_status_transition, Booking, SagaStep
+from fake_services import shared_event_service
+from testing import make_app
+
+event_service = shared_event_service()
+
+def print_test_header(test_name):
+    print("\n" + "=" * 50)
+    print(f"TEST: {test_name}")
+    print("=" * 50)
+
+def make_stream_app(directory, **config):
+    # A file database, so the confirming thread has its own connection
+    app = make_app(directory, **config)
+    event_service.add_event('evt-stream', price=10.0, available_tickets=100)
+    return app
+
+def create_pending(app):
+    response = app.test_client().post('/api/bookings/pending', json={'user_id': 1, 'event_id': 'evt-stream', 'tickets': 1})
+    assert response.status_code == 201
+    return response.get_json()['booking']['id']
+
+def confirm_later(app, booking_id, delay=0.1):
+    def confirm():
+        time.sleep(delay)
+        assert app.test_client().put(f'/api/bookings/{booking_id}/confirm').status_code == 200
+    thread = threading.Thread(target=confirm)
+    thread.start()
+    return thread
+
+def next_event(chunks):
+    for chunk in chunks:
+        chunk = chunk.decode() if isinstance(chunk, bytes) else chunk
+        if chunk.startswith('event: status'):
+            return json.loads(chunk.split('data: ', 1)[1])
+
+def test_stream_pushes_committed_changes():
+    print_test_header("Booking Events - SSE Stream")
+    with tempfile.TemporaryDirectory() as directory:
+        app = make_stream_app(directory)
+        booking_id = create_pending(app)
+
+        response = app.test_client().get(f'/api/bookings/{booking_id}/events', buffered=False)
+        assert response.status_code == 200
+        assert response.mimetype == 'text/event-stream'
+        chunks = iter(response.response)
+        assert next_event(chunks)['status'] == 'PENDING'
+
+        thread = confirm_later(app, booking_id)
+        pushed = next_event(chunks)
+        thread.join()
+        assert pushed['booking_id'] == booking_id
+        assert pushed['status'] == 'CONFIRMED' and pushed['previous_status'] == 'PENDING'
+
+        assert app.test_client().get('/metrics/booking-events').get_json()['streams'] == 1
+        # The client going away releases the subscription
+        response.close()
+        stats = app.test_client().get('/metrics/booking-events').get_json()
+        assert stats['streams'] == 0 and stats['delivered'] == 1
+    print("✅ Test passed!")
+
+def test_long_poll():
+    print_test_header("Booking Events - Long Poll")
+    with tempfile.TemporaryDirectory() as directory:
+        app = make_stream_app(directory)
+        client = app.test_client()
+        booking_id = create_pending(app)
+
+        # Nothing changes within the timeout
+        body = client.get(f'/api/bookings/{booking_id}/events?mode=poll&since=PENDING&timeout=0.1').get_json()
+        assert body['changed'] is False and body['status'] == 'PENDING'
+
+        thread = confirm_later(app, booking_id)
+        started = time.monotonic()
+        body = client.get(f'/api/bookings/{booking_id}/events?mode=poll&since=PENDING&timeout=10').get_json()
+        thread.join()
+        assert body['changed'] is True and body['status'] == 'CONFIRMED'
+        assert time.monotonic() - started < 5
+
+        # A client that is behind gets the current status at once
+        body = client.get(f'/api/bookings/{booking_id}/events?mode=poll&since=PENDING&timeout=10').get_json()
+        assert body['changed'] is True and body['status'] == 'CONFIRMED'
+    print("✅ Test passed!")
+
+def test_only_committed_changes_are_published():
+    print_test_header("Booking Events - Rolled Back Changes")
+    with tempfile.TemporaryDirectory() as directory:
+        app = make_stream_app(directory)
+        booking_id = create_pending(app)
+        hub = app.extensions['booking_events']
+
+        with hub.subscribe(booking_id) as subscription, app.app_context():
+            booking = Booking.query.get(booking_id)
+            record_status_transition(booking, 'PENDING', 'CANCELLED')
+            booking.status = 'CANCELLED'
+            db.session.rollback()
+            assert subscription.get(0) == []
+
+            booking = Booking.query.get(booking_id)
+            record_status_transition(booking, 'PENDING', 'CANCELLED')
+            booking.status = 'CANCELLED'
+            db.session.commit()
+            assert [e['status'] for e in subscription.get(0)] == ['CANCELLED']
+    print("✅ Test passed!")
+
+def test_stream_ends_once_saga_settles():
+    print_test_header("Booking Events - Confirmed and Settled")
+    with tempfile.TemporaryDirectory() as directory:
+        app = make_stream_app(directory, BOOKING_EVENTS_HEARTBEAT=0.05)
+        client = app.test_client()
+        booking_id = create_pending(app)
+        assert client.put(f'/api/bookings/{booking_id}/confirm').status_code == 200
+
+        # The notification is still outstanding without a broker, so the
+        # booking could yet change and the stream stays open
+        response = client.get(f'/api/bookings/{booking_id}/events', buffered=False)
+        chunks = iter(response.response)
+        assert next_event(chunks)['status'] == 'CONFIRMED'
+        assert next(chunks) == b": keepalive\n\n"
+
+        with app.app_context():
+            SagaStep.query.filter_by(booking_id=booking_id, step='notification').update({'status': 'DONE'})
+            db.session.commit()
+        # The next heartbeat finds nothing left to run and ends the stream
+        assert all(chunk == b": keepalive\n\n" for chunk in chunks)
+        assert app.extensions['booking_events'].snapshot()['streams'] == 0
+
+        # Nothing can change, so a poll does not wait out its timeout
+        started = time.monotonic()
+        body = client.get(f'/api/bookings/{booking_id}/events?mode=poll&since=CONFIRMED&timeout=10').get_json()
+        assert body['changed'] is False and time.monotonic() - started < 5
+    print("✅ Test passed!")
+
+def test_stream_limits():
+    print_test_header("Booking Events - Limits")
+    with tempfile.TemporaryDirectory() as directory:
+        app = make_stream_app(directory, BOOKING_EVENTS_MAX_STREAMS=1)
+        client = app.test_client()
+        booking_id = create_pending(app)
+
+        assert client.get('/api/bookings/999999/events').status_code == 404
+        first = client.get(f'/api/bookings/{booking_id}/events', buffered=False)
+        assert first.status_code == 200
+        response = client.get(f'/api/bookings/{booking_id}/events')
+        assert response.status_code == 503 and response.headers['Retry-After'] == '5'
+        first.close()
+        assert app.extensions['booking_events'].snapshot()['streams'] == 0
+    print("✅ Test passed!")
+
+if __name__ == "__main__":
+    test_stream_pushes_committed_changes()
+    test_long_poll()
+    test_only_committed_changes_are_published()
+    test_stream_ends_once_saga_settles()
+    test_stream_limits()
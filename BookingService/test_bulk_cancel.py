@@ -0,0 +1,140 @@
+import json
+import os
+import tempfile
+
+os.environ['RABBITMQ_HOST'] = '127.0.0.1'
+os.environ['SAGA_WORKERS'] = '0'
+
+import clients
+from app import db, Booking, EventSalesSummary, Payment
+from fake_services import shared_event_service
+from testing import make_app
+
+event_service = shared_event_service()
+
+ADMIN = {'Authorization': 'Bearer secret'}
+
+def print_test_header(test_name):
+    print("\n" + "=" * 50)
+    print(f"TEST: {test_name}")
+    print("=" * 50)
+
+class RecordingBroker:
+    def __init__(self, fail_batches=()):
+        self.batches = []
+        self.fail_batches = set(fail_batches)
+        self.calls = 0
+
+    def publish(self, routing_key, body, priority=None, message_id=None):
+        pass
+
+    def publish_many(self, messages):
+        self.calls += 1
+        if self.calls in self.fail_batches:
+            raise ConnectionError('broker unavailable')
+        self.batches.append([(routing_key, json.loads(body)) for routing_key, body, _, _ in messages])
+
+    def notified_bookings(self):
+        return sorted(body['booking_id'] for batch in self.batches for _, body in batch)
+
+def create_bookings(app, event_id, confirmed, pending):
+    event_service.add_event(event_id, price=10.0, available_tickets=100)
+    client = app.test_client()
+    ids = []
+    for user_id in range(1, confirmed + 1):
+        response = client.post('/api/bookings', json={'user_id': user_id, 'event_id': event_id, 'tickets': 2})
+        ids.append(response.get_json()['booking']['id'])
+    for user_id in range(confirmed + 1, confirmed + pending + 1):
+        response = client.post('/api/bookings/pending', json={'user_id': user_id, 'event_id': event_id, 'tickets': 1})
+        ids.append(response.get_json()['booking']['id'])
+    return sorted(ids)
+
+def cancel_all(app, event_id):
+    client = app.test_client()
+    response = client.post(f'/api/bookings/event/{event_id}/cancel-all', headers=ADMIN)
+    assert response.status_code == 202
+    app.extensions['bulk_cancel'].wait(event_id)
+    return client.get(f'/api/bookings/event/{event_id}/cancel-all', headers=ADMIN).get_json()
+
+def test_cancels_every_active_booking():
+    print_test_header("Bulk Cancel - Whole Event")
+    with tempfile.TemporaryDirectory() as directory:
+        app = make_app(directory, ADMIN_TOKEN='secret', BULK_CANCEL_CHUNK_SIZE=2)
+        ids = create_bookings(app, 'evt-bulk', confirmed=5, pending=2)
+        other = create_bookings(app, 'evt-bulk-other', confirmed=1, pending=0)
+
+        broker = RecordingBroker()
+        clients._broker = broker
+        requests_before = len(event_service.requests)
+        try:
+            progress = cancel_all(app, 'evt-bulk')
+        finally:
+            clients._broker = None
+
+        assert progress['status'] == 'DONE'
+        assert progress['total'] == progress['cancelled'] == progress['notified'] == 7
+        # No per-booking inventory writes, one batch of notifications per chunk
+        assert len(event_service.requests) == requests_before
+        assert [len(batch) for batch in broker.batches] == [2, 2, 2, 1]
+        assert broker.notified_bookings() == ids
+        assert all(key == 'booking.cancelled.evt-bulk' and body['reason'] == 'EVENT_CANCELLED'
+                   for batch in broker.batches for key, body in batch)
+
+        with app.app_context():
+            assert {booking.status for booking in Booking.query.filter_by(event_id='evt-bulk')} == {'CANCELLED'}
+            assert Booking.query.get(other[0]).status == 'CONFIRMED'
+            payments = Payment.query.filter(Payment.booking_id.in_(ids)).all()
+            assert len(payments) == 5 and {payment.status for payment in payments} == {'REFUNDED'}
+            summary = EventSalesSummary.query.get('evt-bulk').to_dict()
+            assert summary['tickets_sold'] == 0 and summary['revenue'] == 0
+            assert summary['bookings'] == {'PENDING': 0, 'CONFIRMED': 0, 'CANCELLED': 7, 'PAYMENT_FAILED': 0}
+    print("✅ Test passed!")
+
+def test_resumes_after_failure():
+    print_test_header("Bulk Cancel - Resume")
+    with tempfile.TemporaryDirectory() as directory:
+        app = make_app(directory, ADMIN_TOKEN='secret', BULK_CANCEL_CHUNK_SIZE=2)
+        ids = create_bookings(app, 'evt-bulk-resume', confirmed=3, pending=2)
+
+        broker = RecordingBroker(fail_batches={2})
+        clients._broker = broker
+        try:
+            progress = cancel_all(app, 'evt-bulk-resume')
+            # The second chunk was cancelled but its notifications failed
+            assert progress['status'] == 'FAILED' and 'broker unavailable' in progress['last_error']
+            assert progress['cancelled'] == 4 and progress['notified'] == 2
+
+            progress = cancel_all(app, 'evt-bulk-resume')
+        finally:
+            clients._broker = None
+
+        assert progress['status'] == 'DONE' and progress['last_error'] is None
+        assert progress['total'] == progress['cancelled'] == progress['notified'] == 5
+        # Every booking notified exactly once
+        assert broker.notified_bookings() == ids
+    print("✅ Test passed!")
+
+def test_admin_only():
+    print_test_header("Bulk Cancel - Admin Only")
+    with tempfile.TemporaryDirectory() as directory:
+        app = make_app(directory, ADMIN_TOKEN='secret', BULK_CANCEL_CHUNK_SIZE=2)
+        client = app.test_client()
+        assert client.post('/api/bookings/event/evt-bulk-admin/cancel-all').status_code == 401
+        assert client.get('/api/bookings/event/evt-bulk-admin/cancel-all', headers=ADMIN).status_code == 404
+    print("✅ Test passed!")
+
+def test_lost_claim_without_job_conflicts():
+    print_test_header("Bulk Cancel - Lost Claim")
+    with tempfile.TemporaryDirectory() as directory:
+        app = make_app(directory, ADMIN_TOKEN='secret', BULK_CANCEL_CHUNK_SIZE=2)
+        # Another process took the claim, then rolled its job back
+        app.extensions['bulk_cancel'].claim = lambda event_id: False
+        response = app.test_client().post('/api/bookings/event/evt-bulk-lost/cancel-all', headers=ADMIN)
+        assert response.status_code == 409
+    print("✅ Test passed!")
+
+if __name__ == "__main__":
+    test_cancels_every_active_booking()
+    test_resumes_after_failure()
+    test_admin_only()
+    test_lost_claim_without_job_conflicts()
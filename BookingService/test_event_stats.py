@@ -0,0 +1,132 @@
+import os
+import sqlite3
+import tempfile
+
+os.environ['RABBITMQ_HOST'] = '127.0.0.1'
+os.environ['SAGA_WORKERS'] = '0'
+
+from app import create_app, db, Booking, EventSalesSummary
+from fake_services import shared_event_service
+from rebuild_event_stats import rebuild_event_stats
+
+event_service = shared_event_service()
+
+app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://'})
+
+def print_test_header(test_name):
+    print("\n" + "=" * 50)
+    print(f"TEST: {test_name}")
+    print("=" * 50)
+
+def reset_database():
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+
+def get_stats(client, event_id):
+    response = client.get(f'/api/bookings/event/{event_id}/stats')
+    assert response.status_code == 200
+    return response.get_json()
+
+def test_stats_for_unknown_event():
+    print_test_header("Stats - Event Without Bookings")
+    reset_database()
+
+    stats = get_stats(app.test_client(), 'no-bookings')
+
+    assert stats['tickets_sold'] == 0
+    assert stats['revenue'] == 0
+    assert stats['bookings'] == {'PENDING': 0, 'CONFIRMED': 0, 'CANCELLED': 0, 'PAYMENT_FAILED': 0}
+
+    print("✅ Test passed!")
+
+def test_stats_follow_status_transitions():
+    print_test_header("Stats - Incremental Updates")
+    reset_database()
+    event_service.add_event('evt-1', price=10.0)
+    client = app.test_client()
+
+    response = client.post('/api/bookings', json={'user_id': 1, 'event_id': 'evt-1', 'tickets': 2})
+    assert response.status_code == 201
+    confirmed_id = response.get_json()['booking']['id']
+
+    response = client.post('/api/bookings/pending', json={'user_id': 2, 'event_id': 'evt-1', 'tickets': 3})
+    assert response.status_code == 201
+    pending_id = response.get_json()['booking']['id']
+
+    stats = get_stats(client, 'evt-1')
+    assert stats['tickets_sold'] == 2
+    assert stats['revenue'] == 20.0
+    assert stats['bookings']['CONFIRMED'] == 1
+    assert stats['bookings']['PENDING'] == 1
+
+    assert client.put(f'/api/bookings/{pending_id}/confirm').status_code == 200
+    assert client.put(f'/api/bookings/{confirmed_id}/cancel').status_code == 200
+
+    stats = get_stats(client, 'evt-1')
+    assert stats['tickets_sold'] == 3
+    assert stats['revenue'] == 30.0
+    assert stats['bookings'] == {'PENDING': 0, 'CONFIRMED': 1, 'CANCELLED': 1, 'PAYMENT_FAILED': 0}
+
+    print("✅ Test passed!")
+
+def test_rebuild_matches_incremental_summary():
+    print_test_header("Stats - Rebuild From History")
+    reset_database()
+    with app.app_context():
+        for i, status in enumerate(['CONFIRMED', 'CONFIRMED', 'CANCELLED', 'PENDING', 'PAYMENT_FAILED']):
+            db.session.add(Booking(user_id=i, event_id='evt-2', tickets=2, total_price=40, status=status))
+        db.session.add(Booking(user_id=9, event_id='evt-3', tickets=1, total_price=15, status='CONFIRMED'))
+        db.session.commit()
+
+        assert rebuild_event_stats(batch_size=2) == 2
+
+        summary = EventSalesSummary.query.get('evt-2').to_dict()
+        assert summary['tickets_sold'] == 4
+        assert summary['revenue'] == 80.0
+        assert summary['bookings'] == {'PENDING': 1, 'CONFIRMED': 2, 'CANCELLED': 1, 'PAYMENT_FAILED': 1}
+        assert EventSalesSummary.query.get('evt-3').tickets_sold == 1
+
+    print("✅ Test passed!")
+
+def test_rebuild_blocks_summary_writes():
+    print_test_header("Stats - Rebuild Blocks Concurrent Changes")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'bookings.db')
+        file_app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}'})
+        event_service.add_event('evt-4', price=10.0)
+        with file_app.app_context():
+            db.create_all()
+        client = file_app.test_client()
+        for user_id in (1, 2, 3):
+            assert client.post('/api/bookings', json={'user_id': user_id, 'event_id': 'evt-4', 'tickets': 1}).status_code == 201
+
+        blocked = []
+        def write_summary(scanned):
+            # A booking change committing mid-scan would be overwritten by
+            # the rebuilt rows, so it must not get the write lock
+            other = sqlite3.connect(path, timeout=0.1)
+            try:
+                other.execute("UPDATE event_sales_summary SET cancelled_count = cancelled_count + 1")
+                other.commit()
+            except sqlite3.OperationalError as e:
+                blocked.append(str(e))
+            finally:
+                other.close()
+
+        with file_app.app_context():
+            assert rebuild_event_stats(batch_size=2, on_batch=write_summary) == 1
+            assert blocked == ['database is locked'] * 2
+
+        assert client.put('/api/bookings/1/cancel').status_code == 200
+        stats = get_stats(client, 'evt-4')
+        assert stats['tickets_sold'] == 2
+        assert stats['bookings'] == {'PENDING': 0, 'CONFIRMED': 2, 'CANCELLED': 1, 'PAYMENT_FAILED': 0}
+
+    print("✅ Test passed!")
+
+if __name__ == "__main__":
+    test_stats_for_unknown_event()
+    test_stats_follow_status_transitions()
+    test_rebuild_matches_incremental_summary()
+    test_rebuild_blocks_summary_writes()
@@ -0,0 +1,66 @@
+import csv
+import io
+import json
+import os
+
+os.environ['SAGA_WORKERS'] = '0'
+
+from app import create_app, db, Booking, Payment
+
+app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://'})
+
+def print_test_header(test_name):
+    print("\n" + "=" * 50)
+    print(f"TEST: {test_name}")
+    print("=" * 50)
+
+def seed_bookings(count):
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        for i in range(count):
+            booking = Booking(user_id=i, event_id='evt-x', tickets=1, total_price=12.5, status='CONFIRMED')
+            db.session.add(booking)
+            db.session.flush()
+            if i % 2 == 0:
+                db.session.add(Payment(booking_id=booking.id, amount=12.5, payment_method='CREDIT_CARD',
+                                       transaction_id=f'TXN-{i}', status='COMPLETED'))
+        db.session.add(Booking(user_id=99, event_id='evt-other', tickets=1, total_price=1, status='CONFIRMED'))
+        db.session.commit()
+
+def test_export_csv_streams_all_bookings_with_payments():
+    print_test_header("Export - CSV")
+    seed_bookings(1203)
+    client = app.test_client()
+
+    response = client.get('/api/bookings/event/evt-x/export?format=csv')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/csv'
+    assert response.is_streamed
+
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert len(rows) == 1203
+    assert rows[0]['transaction_id'] == 'TXN-0'
+    assert rows[1]['payment_id'] == ''
+    assert {row['event_id'] for row in rows} == {'evt-x'}
+
+    print("✅ Test passed!")
+
+def test_export_ndjson():
+    print_test_header("Export - NDJSON")
+    seed_bookings(3)
+    client = app.test_client()
+
+    response = client.get('/api/bookings/event/evt-x/export?format=ndjson')
+    assert response.status_code == 200
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [row['user_id'] for row in rows] == [0, 1, 2]
+    assert rows[2]['payment_status'] == 'COMPLETED'
+
+    assert client.get('/api/bookings/event/evt-x/export?format=xml').status_code == 400
+
+    print("✅ Test passed!")
+
+if __name__ == "__main__":
+    test_export_csv_streams_all_bookings_with_payments()
+    test_export_ndjson()
@@ -0,0 +1,136 @@
+import os
+import tempfile
+import threading
+
+os.environ['RABBITMQ_HOST'] = '127.0.0.1'
+os.environ['SAGA_WORKERS'] = '0'
+
+from sqlalchemy.exc import IntegrityError
+
+from app import db, Booking, EventSalesSummary, Payment, SagaStep
+from group_commit import assign_primary_keys
+from fake_services import shared_event_service
+from testing import make_app
+
+event_service = shared_event_service()
+
+def print_test_header(test_name):
+    print("\n" + "=" * 50)
+    print(f"TEST: {test_name}")
+    print("=" * 50)
+
+def run_concurrently(count, target):
+    results = [None] * count
+    def run(index):
+        results[index] = target(index)
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+def test_concurrent_bookings_share_commits():
+    print_test_header("Group Commit - Concurrent Bookings")
+    with tempfile.TemporaryDirectory() as directory:
+        app = make_app(directory, GROUP_COMMIT_ENABLED=True, GROUP_COMMIT_WINDOW_MS=20)
+        event_service.add_event('evt-group', price=10.0, available_tickets=1000)
+
+        def book(index):
+            response = app.test_client().post('/api/bookings', json={
+                'user_id': index + 1, 'event_id': 'evt-group', 'tickets': 1
+            })
+            return response.status_code, response.get_json()
+
+        results = run_concurrently(20, book)
+        assert [status for status, _ in results] == [201] * 20
+        assert all(body['booking']['status'] == 'CONFIRMED' for _, body in results)
+        assert all(body['payment']['booking_id'] == body['booking']['id'] for _, body in results)
+
+        with app.app_context():
+            assert Booking.query.filter_by(status='CONFIRMED').count() == 20
+            assert Payment.query.count() == 20
+            assert SagaStep.query.filter_by(step='event_decrement', status='DONE').count() == 20
+            summary = EventSalesSummary.query.get('evt-group')
+            assert summary.tickets_sold == 20 and summary.confirmed_count == 20 and summary.pending_count == 0
+
+        stats = app.test_client().get('/metrics/group-commit').get_json()
+        # Two units per booking, several sharing each commit
+        assert stats['enabled'] and stats['units'] == 40
+        assert stats['batches'] < 40 and stats['errors'] == 0
+    print("✅ Test passed!")
+
+def test_failing_unit_only_fails_its_request():
+    print_test_header("Group Commit - Error Isolation")
+    with tempfile.TemporaryDirectory() as directory:
+        app = make_app(directory, GROUP_COMMIT_ENABLED=True, GROUP_COMMIT_WINDOW_MS=50)
+        writer = app.extensions['group_commit']
+
+        def insert(index):
+            def work():
+                # Booking 3 reuses the id of booking 2, so it violates the primary key
+                booking = Booking(id=1000 + min(index, 2), user_id=index, event_id='evt-isolation',
+                                  tickets=1, total_price=10, status='PENDING')
+                db.session.add(booking)
+                return booking
+            try:
+                return writer.submit(work)
+            except IntegrityError as e:
+                return e
+
+        results = run_concurrently(5, insert)
+        failed = [result for result in results if isinstance(result, IntegrityError)]
+        assert len(failed) == 2
+        assert sorted(r.id for r in results if isinstance(r, Booking)) == [1000, 1001, 1002]
+        stats = writer.snapshot()
+        assert stats['fallbacks'] >= 1 and stats['errors'] == 2
+
+        with app.app_context():
+            assert Booking.query.filter_by(event_id='evt-isolation').count() == 3
+    print("✅ Test passed!")
+
+class SequenceSession:
+    """Stands in for a PostgreSQL session, handing out ids from per-table sequences"""
+    def __init__(self, new):
+        self.new = new
+        self.queries = []
+        self.dialect = type('Dialect', (), {'name': 'postgresql'})()
+
+    def connection(self):
+        return self
+
+    def execute(self, statement, params):
+        self.queries.append(params)
+        start = 1000 * len(self.queries)
+        ids = list(range(start, start + params['count']))
+        return type('Result', (), {'scalars': lambda result: type('Scalars', (), {'all': lambda scalars: ids})()})()
+
+def test_assigns_ids_to_every_table():
+    print_test_header("Group Commit - Primary Keys")
+    app = make_app()
+    with app.app_context():
+        bookings = [Booking(user_id=1, event_id='evt-keys', tickets=1, total_price=10.0) for _ in range(2)]
+        steps = [SagaStep(saga_id='saga-keys', booking_id=1, seq=index, step='notification') for index in range(3)]
+        payment = Payment(booking_id=1, amount=10.0)
+        session = SequenceSession(bookings + steps + [payment])
+        assign_primary_keys(session)
+
+        # BIGINT-on-PostgreSQL ids are assigned as well as plain INTEGER ones
+        assert sorted(query['table'] for query in session.queries) == ['bookings', 'payments', 'saga_steps']
+        assert all(obj.id is not None for obj in session.new)
+        assert len({booking.id for booking in bookings}) == 2
+        assert len({step.id for step in steps}) == 3
+    print("✅ Test passed!")
+
+def test_disabled_by_default():
+    print_test_header("Group Commit - Disabled")
+    app = make_app()
+    assert 'group_commit' not in app.extensions
+    assert app.test_client().get('/metrics/group-commit').get_json() == {'enabled': False}
+    print("✅ Test passed!")
+
+if __name__ == "__main__":
+    test_concurrent_bookings_share_commits()
+    test_failing_unit_only_fails_its_request()
+    test_assigns_ids_to_every_table()
+    test_disabled_by_default()
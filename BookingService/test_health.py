@@ -0,0 +1,116 @@
+import os
+import threading
+import time
+
+os.environ['RABBITMQ_HOST'] = '127.0.0.1'
+os.environ['SAGA_WORKERS'] = '0'
+
+import clients
+from fake_services import shared_event_service
+from health import HealthProber
+from testing import make_app
+
+event_service = shared_event_service()
+
+def print_test_header(test_name):
+    print("\n" + "=" * 50)
+    print(f"TEST: {test_name}")
+    print("=" * 50)
+
+class FakeBroker:
+    def __init__(self):
+        self.down = False
+
+    def ping(self):
+        if self.down:
+            raise ConnectionError('broker unreachable')
+
+def wait_for(client, status, timeout=5):
+    deadline = time.monotonic() + timeout
+    while True:
+        response = client.get('/health/ready')
+        if response.get_json()['status'] == status or time.monotonic() > deadline:
+            return response
+        time.sleep(0.02)
+
+def test_readiness_follows_dependencies():
+    print_test_header("Health - Readiness")
+    app = make_app(HEALTH_PROBE_INTERVAL=0.05)
+    client = app.test_client()
+    broker = FakeBroker()
+    clients._broker = broker
+    try:
+        response = wait_for(client, 'UP')
+        assert response.status_code == 200
+        checks = response.get_json()['checks']
+        assert set(checks) == {'database', 'broker', 'event_service'}
+        assert all(check['status'] == 'UP' for check in checks.values())
+
+        broker.down = True
+        response = wait_for(client, 'DOWN')
+        assert response.status_code == 503
+        assert response.get_json()['checks']['broker']['error'] == 'broker unreachable'
+        # Liveness does not depend on the broker
+        assert client.get('/health/live').status_code == 200
+        assert client.get('/health').get_json() == {'status': 'UP'}
+
+        broker.down = False
+        assert wait_for(client, 'UP').status_code == 200
+    finally:
+        # Park the prober so it stops checking once the fake broker is gone
+        app.extensions['health'].interval = 3600
+        clients._broker = None
+    print("✅ Test passed!")
+
+def test_hanging_check_times_out():
+    print_test_header("Health - Hanging Check")
+    release = threading.Event()
+    calls = []
+
+    def hang():
+        calls.append(1)
+        release.wait()
+
+    prober = HealthProber({'database': lambda: None, 'event_service': hang}, timeout=0.05)
+    started = time.monotonic()
+    results = prober.probe()
+    assert time.monotonic() - started < 1
+    assert results['database']['status'] == 'UP'
+    assert results['event_service'] == {'status': 'DOWN', 'error': 'No answer within 0.05s'}
+    assert prober.status()['status'] == 'DOWN'
+
+    # The hanging check is not started again while it runs
+    prober.probe()
+    assert len(calls) == 1
+    release.set()
+    time.sleep(0.05)
+    assert prober.probe()['event_service']['status'] == 'UP'
+    assert prober.status()['status'] == 'UP'
+    print("✅ Test passed!")
+
+def test_optional_checks_and_stale_results():
+    print_test_header("Health - Optional Checks and Stale Results")
+    now = [0.0]
+
+    def failing():
+        raise RuntimeError('EventService answered 503')
+
+    prober = HealthProber({'database': lambda: None, 'event_service': failing},
+                          required=['database'], interval=5, timeout=1, clock=lambda: now[0])
+    assert prober.status() == {'status': 'DOWN', 'reason': 'Not probed yet', 'checks': {}}
+
+    prober.probe()
+    body = prober.status()
+    # Reported, but not required for readiness
+    assert body['status'] == 'UP'
+    assert body['checks']['event_service']['error'] == 'EventService answered 503'
+
+    now[0] = 30
+    body = prober.status()
+    assert body['status'] == 'DOWN' and body['reason'] == 'Health results are stale'
+    print("✅ Test passed!")
+
+if __name__ == "__main__":
+    test_readiness_follows_dependencies()
+    test_hanging_check_times_out()
+    test_optional_checks_and_stale_results()
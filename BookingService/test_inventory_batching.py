@@ -0,0 +1,197 @@
+import json
+import os
+import tempfile
+import time
+from datetime import datetime
+
+os.environ['RABBITMQ_HOST'] = '127.0.0.1'
+# Flushes are driven by the tests through flush_batches; only
+# test_workers_flush_and_notify starts background threads
+os.environ['SAGA_WORKERS'] = '0'
+
+import clients
+from app import db, Booking, Payment, SagaStep, unflushed_tickets
+from fake_services import shared_event_service
+from testing import make_app
+
+event_service = shared_event_service()
+
+def print_test_header(test_name):
+    print("\n" + "=" * 50)
+    print(f"TEST: {test_name}")
+    print("=" * 50)
+
+class RecordingBroker:
+    def __init__(self):
+        self.published = []
+
+    def publish(self, routing_key, body, priority=None, message_id=None):
+        self.published.append(json.loads(body))
+
+    def publish_many(self, messages):
+        for _, body, _, _ in messages:
+            self.published.append(json.loads(body))
+
+def book_calls(event_id):
+    return [path for method, path in event_service.requests if method == 'PUT' and path == f'/api/events/{event_id}/book']
+
+def decrement_statuses():
+    return sorted(step.status for step in SagaStep.query.filter_by(step='event_decrement'))
+
+def test_decrements_are_flushed_per_event():
+    print_test_header("Inventory Batching - One Call per Event")
+    app = make_app(INVENTORY_BATCH_INTERVAL=1)
+    event_service.add_event('evt-batch-a', price=10.0, available_tickets=10)
+    event_service.add_event('evt-batch-b', price=10.0, available_tickets=10)
+    client = app.test_client()
+
+    for user_id in range(1, 5):
+        response = client.post('/api/bookings', json={'user_id': user_id, 'event_id': 'evt-batch-a', 'tickets': 2})
+        assert response.status_code == 201
+    response = client.post('/api/bookings', json={'user_id': 9, 'event_id': 'evt-batch-b', 'tickets': 3})
+    assert response.status_code == 201
+
+    # Nothing has been sent yet, but the sold tickets are reserved locally
+    assert book_calls('evt-batch-a') == []
+    assert event_service.events['evt-batch-a']['availableTickets'] == 10
+    response = client.post('/api/bookings', json={'user_id': 5, 'event_id': 'evt-batch-a', 'tickets': 3})
+    assert response.status_code == 400
+
+    with app.app_context():
+        assert unflushed_tickets('evt-batch-a') == 8
+        assert app.extensions['saga'].flush_batches() == 5
+        assert unflushed_tickets('evt-batch-a') == 0
+        assert decrement_statuses() == ['DONE'] * 5
+        # The notifications waiting on the decrements were attempted right after
+        notifications = SagaStep.query.filter_by(step='notification').all()
+        assert all(step.attempts == 1 for step in notifications)
+        assert app.extensions['saga'].flush_batches() == 0
+
+    assert len(book_calls('evt-batch-a')) == 1 and len(book_calls('evt-batch-b')) == 1
+    assert event_service.events['evt-batch-a']['availableTickets'] == 2
+    assert event_service.events['evt-batch-b']['availableTickets'] == 7
+    print("✅ Test passed!")
+
+def test_failed_flush_is_retried():
+    print_test_header("Inventory Batching - Retry After EventService Failure")
+    app = make_app(INVENTORY_BATCH_INTERVAL=1)
+    event_service.add_event('evt-batch-retry', price=10.0, available_tickets=10)
+    client = app.test_client()
+
+    for user_id in (1, 2):
+        assert client.post('/api/bookings', json={'user_id': user_id, 'event_id': 'evt-batch-retry', 'tickets': 1}).status_code == 201
+
+    with app.app_context():
+        event_service.fail_writes = True
+        try:
+            app.extensions['saga'].flush_batches()
+        finally:
+            event_service.fail_writes = False
+        steps = SagaStep.query.filter_by(step='event_decrement').all()
+        assert [step.status for step in steps] == ['PENDING', 'PENDING']
+        assert all(step.attempts == 1 and step.next_attempt_at > datetime.utcnow() for step in steps)
+        # The tickets stay reserved while the flush waits for its retry
+        assert unflushed_tickets('evt-batch-retry') == 2
+
+        SagaStep.query.filter_by(status='PENDING').update({'next_attempt_at': datetime.utcnow()})
+        db.session.commit()
+        assert app.extensions['saga'].flush_batches() == 2
+        assert decrement_statuses() == ['DONE', 'DONE']
+
+    assert event_service.events['evt-batch-retry']['availableTickets'] == 8
+    print("✅ Test passed!")
+
+def test_refused_batch_falls_back_to_single_decrements():
+    print_test_header("Inventory Batching - Refused Batch")
+    app = make_app(INVENTORY_BATCH_INTERVAL=1)
+    event_service.add_event('evt-batch-refused', price=10.0, available_tickets=10)
+    client = app.test_client()
+
+    booking_ids = []
+    for user_id in (1, 2):
+        response = client.post('/api/bookings', json={'user_id': user_id, 'event_id': 'evt-batch-refused', 'tickets': 2})
+        booking_ids.append(response.get_json()['booking']['id'])
+    # Tickets sold elsewhere before the flush: only one booking still fits
+    event_service.events['evt-batch-refused']['availableTickets'] = 3
+
+    with app.app_context():
+        app.extensions['saga'].flush_batches()
+        first, second = (Booking.query.get(booking_id) for booking_id in booking_ids)
+        assert first.status == 'CONFIRMED'
+        assert second.status == 'CANCELLED'
+        assert Payment.query.filter_by(booking_id=second.id).one().status == 'REFUNDED'
+        assert decrement_statuses() == ['COMPENSATED', 'DONE']
+
+    assert event_service.events['evt-batch-refused']['availableTickets'] == 1
+    print("✅ Test passed!")
+
+def test_pending_bookings_count_unflushed_tickets():
+    print_test_header("Inventory Batching - Pending Bookings")
+    app = make_app(INVENTORY_BATCH_INTERVAL=1)
+    event_service.add_event('evt-batch-pending', price=10.0, available_tickets=10)
+    client = app.test_client()
+
+    assert client.post('/api/bookings', json={'user_id': 1, 'event_id': 'evt-batch-pending', 'tickets': 7}).status_code == 201
+    # EventService still counts 10 tickets, but 7 of them are sold
+    response = client.post('/api/bookings/pending', json={'user_id': 2, 'event_id': 'evt-batch-pending', 'tickets': 4})
+    assert response.status_code == 400
+    response = client.post('/api/bookings/pending', json={'user_id': 2, 'event_id': 'evt-batch-pending', 'tickets': 3})
+    assert response.status_code == 201
+    pending_id = response.get_json()['booking']['id']
+
+    # Sold before the pending booking was paid for
+    assert client.post('/api/bookings', json={'user_id': 3, 'event_id': 'evt-batch-pending', 'tickets': 1}).status_code == 201
+    response = client.put(f'/api/bookings/{pending_id}/confirm')
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Not enough tickets available'
+    with app.app_context():
+        booking = Booking.query.get(pending_id)
+        assert booking.status == 'PENDING'
+        assert Payment.query.filter_by(booking_id=pending_id).count() == 0
+        assert app.extensions['saga'].flush_batches() == 2
+
+    assert event_service.events['evt-batch-pending']['availableTickets'] == 2
+    assert client.put(f'/api/bookings/{pending_id}/confirm').status_code == 400
+    print("✅ Test passed!")
+
+def test_workers_flush_and_notify():
+    print_test_header("Inventory Batching - Background Workers")
+    directory = tempfile.mkdtemp()
+    broker = RecordingBroker()
+    clients._broker = broker
+    app = make_app(directory, INVENTORY_BATCH_INTERVAL=0.05, SAGA_WORKERS=2, SAGA_POLL_INTERVAL=0.05)
+    event_service.add_event('evt-batch-workers', price=10.0, available_tickets=10)
+    client = app.test_client()
+    try:
+        response = client.post('/api/bookings', json={'user_id': 1, 'event_id': 'evt-batch-workers', 'tickets': 2})
+        assert response.status_code == 201
+        booked_id = response.get_json()['booking']['id']
+        response = client.post('/api/bookings/pending', json={'user_id': 2, 'event_id': 'evt-batch-workers', 'tickets': 3})
+        pending_id = response.get_json()['booking']['id']
+        assert client.put(f'/api/bookings/{pending_id}/confirm').status_code == 200
+
+        # The flusher decrements EventService once the interval passes, and
+        # the notifications waiting on the decrements go out after it
+        def confirmed():
+            return sorted(message['booking_id'] for message in broker.published if message['status'] == 'CONFIRMED')
+        deadline = time.monotonic() + 5
+        while confirmed() != sorted([booked_id, pending_id]) and time.monotonic() < deadline:
+            time.sleep(0.02)
+        assert confirmed() == sorted([booked_id, pending_id])
+        assert event_service.events['evt-batch-workers']['availableTickets'] == 5
+        with app.app_context():
+            assert unflushed_tickets('evt-batch-workers') == 0
+            assert decrement_statuses() == ['DONE', 'DONE']
+    finally:
+        # Park the background threads for the rest of the run
+        app.extensions['saga'].poll_interval = 3600
+        app.extensions['saga'].batch_interval = 3600
+        clients._broker = None
+    print("✅ Test passed!")
+
+if __name__ == "__main__":
+    test_decrements_are_flushed_per_event()
+    test_failed_flush_is_retried()
+    test_refused_batch_falls_back_to_single_decrements()
+    test_pending_bookings_count_unflushed_tickets()
+    test_workers_flush_and_notify()
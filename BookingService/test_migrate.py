@@ -0,0 +1,68 @@
+import os
+import tempfile
+
+os.environ['RABBITMQ_HOST'] = '127.0.0.1'
+os.environ['SAGA_WORKERS'] = '0'
+
+from sqlalchemy import inspect, text
+
+from app import db, Booking, EventSalesSummary, SagaStep
+from migrate import upgrade, widen_booking_ids
+from testing import make_app
+
+def print_test_header(test_name):
+    print("\n" + "=" * 50)
+    print(f"TEST: {test_name}")
+    print("=" * 50)
+
+def index_columns(engine, table):
+    with engine.connect() as connection:
+        return [index['column_names'] for index in inspect(connection).get_indexes(table)]
+
+def test_upgrade_adds_event_stats_schema():
+    print_test_header("Migrate - Sales Summary and Event Index")
+    app = make_app(tempfile.mkdtemp())
+    with app.app_context():
+        engine = db.engine
+        # A database from before the summary and the index existed
+        EventSalesSummary.__table__.drop(engine)
+        with engine.begin() as connection:
+            connection.execute(text('DROP INDEX ix_bookings_event_id'))
+            connection.execute(Booking.__table__.insert(), [
+                {'user_id': 1, 'event_id': 'evt-old', 'tickets': 2, 'total_price': 20, 'status': 'CONFIRMED'},
+                {'user_id': 2, 'event_id': 'evt-old', 'tickets': 1, 'total_price': 10, 'status': 'CANCELLED'}
+            ])
+        assert ['event_id'] not in index_columns(engine, 'bookings')
+
+        upgrade(engine)
+        assert ['event_id'] in index_columns(engine, 'bookings')
+        summary = EventSalesSummary.query.get('evt-old')
+        assert summary.tickets_sold == 2
+        assert summary.cancelled_count == 1
+
+        # Running it again changes nothing
+        upgrade(engine)
+        assert index_columns(engine, 'bookings').count(['event_id']) == 1
+        assert EventSalesSummary.query.count() == 1
+
+    print("✅ Test passed!")
+
+def test_upgrade_adds_saga_steps():
+    print_test_header("Migrate - Saga Steps")
+    app = make_app(tempfile.mkdtemp())
+    with app.app_context():
+        engine = db.engine
+        SagaStep.__table__.drop(engine)
+
+        upgrade(engine)
+        with engine.connect() as connection:
+            assert inspect(connection).has_table('saga_steps')
+        assert ['status', 'next_attempt_at'] in index_columns(engine, 'saga_steps')
+        # SQLite integer keys hold 64-bit booking ids already
+        assert widen_booking_ids(engine) == []
+
+    print("✅ Test passed!")
+
+if __name__ == "__main__":
+    test_upgrade_adds_event_stats_schema()
+    test_upgrade_adds_saga_steps()
@@ -0,0 +1,121 @@
+import os
+
+os.environ['RABBITMQ_HOST'] = '127.0.0.1'
+os.environ['SAGA_WORKERS'] = '0'
+
+import pika
+
+import clients
+from app import create_app, db, notification_routing_key
+from clients import BrokerConnection
+from fake_services import shared_event_service
+from rabbitmq_consumer import binding_patterns
+
+event_service = shared_event_service()
+
+def print_test_header(test_name):
+    print("\n" + "=" * 50)
+    print(f"TEST: {test_name}")
+    print("=" * 50)
+
+class RecordingChannel:
+    def __init__(self, fail_publishes=0):
+        self.calls = []
+        self.is_open = True
+        self.fail_publishes = fail_publishes
+
+    def __getattr__(self, name):
+        def record(**kwargs):
+            if name == 'basic_publish' and self.fail_publishes:
+                self.fail_publishes -= 1
+                raise pika.exceptions.AMQPConnectionError('connection reset')
+            self.calls.append((name, kwargs))
+        return record
+
+class RecordingConnection:
+    channels = []
+
+    def __init__(self, parameters):
+        self.is_open = True
+
+    def channel(self):
+        return self.channels.pop(0)
+
+    def close(self):
+        self.is_open = False
+
+class RecordingBroker:
+    def __init__(self):
+        self.published = []
+
+    def publish(self, routing_key, body, priority=None, message_id=None):
+        self.published.append((routing_key, priority))
+
+def test_routing_keys():
+    print_test_header("Notification Routing - Routing Keys")
+    assert notification_routing_key({'status': 'CONFIRMED', 'event_id': '64f1c2'}) == 'booking.confirmed.64f1c2'
+    assert notification_routing_key({'status': 'PENDING', 'event_id': 'a.b'}) == 'booking.pending.a_b'
+    assert notification_routing_key({}) == 'booking.unknown.unknown'
+
+    assert binding_patterns() == ['booking.*.*']
+    assert binding_patterns(['CONFIRMED', 'cancelled'], ['e1']) == ['booking.confirmed.e1', 'booking.cancelled.e1']
+    print("✅ Test passed!")
+
+def test_publish_uses_topic_exchange_and_priority():
+    print_test_header("Notification Routing - Exchange, Queue and Priority")
+    original = pika.BlockingConnection
+    first, second = RecordingChannel(fail_publishes=1), RecordingChannel()
+    RecordingConnection.channels = [first, second]
+    pika.BlockingConnection = RecordingConnection
+    try:
+        broker = BrokerConnection('localhost', exchange='bookings', bindings={'notes': ['booking.#']}, max_priority=7)
+        # The first channel drops the publish, so it is retried on a new connection
+        broker.publish('booking.confirmed.e1', '{}', priority=5, message_id='m1')
+        broker.publish('booking.pending.e1', '{}', priority=0)
+    finally:
+        pika.BlockingConnection = original
+
+    names = [name for name, _ in second.calls]
+    assert names == ['exchange_declare', 'queue_declare', 'queue_bind', 'basic_publish', 'basic_publish']
+    calls = dict(second.calls[:3])
+    assert calls['exchange_declare'] == {'exchange': 'bookings', 'exchange_type': 'topic', 'durable': True}
+    assert calls['queue_declare']['arguments'] == {'x-max-priority': 7}
+    assert calls['queue_bind'] == {'queue': 'notes', 'exchange': 'bookings', 'routing_key': 'booking.#'}
+
+    published = [kwargs for name, kwargs in second.calls if name == 'basic_publish']
+    assert [p['routing_key'] for p in published] == ['booking.confirmed.e1', 'booking.pending.e1']
+    assert all(p['exchange'] == 'bookings' for p in published)
+    assert [p['properties'].priority for p in published] == [5, 0]
+    assert published[0]['properties'].delivery_mode == 2
+    assert published[0]['properties'].message_id == 'm1'
+    print("✅ Test passed!")
+
+def test_booking_notifications_are_routed_by_status_and_event():
+    print_test_header("Notification Routing - Booking Flow")
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://'})
+    with app.app_context():
+        db.create_all()
+    event_service.add_event('evt-routing', price=10.0, available_tickets=10)
+
+    broker = RecordingBroker()
+    clients._broker = broker
+    try:
+        client = app.test_client()
+        response = client.post('/api/bookings', json={'user_id': 1, 'event_id': 'evt-routing', 'tickets': 2})
+        assert response.status_code == 201
+        booking_id = response.get_json()['booking']['id']
+        assert client.put(f'/api/bookings/{booking_id}/cancel').status_code == 200
+    finally:
+        clients._broker = None
+
+    assert broker.published == [
+        ('booking.pending.evt-routing', 0),
+        ('booking.confirmed.evt-routing', 5),
+        ('booking.cancelled.evt-routing', 5)
+    ]
+    print("✅ Test passed!")
+
+if __name__ == "__main__":
+    test_routing_keys()
+    test_publish_uses_topic_exchange_and_priority()
+    test_booking_notifications_are_routed_by_status_and_event()
@@ -0,0 +1,59 @@
+import gzip
+import json
+import os
+import tempfile
+from datetime import date
+
+from sqlalchemy import create_engine
+
+from app import db, Booking
+from partitions import add_months, months_to_create, partition_name, stream_rows, write_ndjson
+
+def print_test_header(test_name):
+    print("\n" + "=" * 50)
+    print(f"TEST: {test_name}")
+    print("=" * 50)
+
+def test_months_to_create_starts_after_existing_partitions():
+    print_test_header("Partitions - Months To Create")
+    today = date(2026, 11, 15)
+
+    assert add_months(date(2026, 11, 1), 2) == date(2027, 1, 1)
+    assert add_months(date(2026, 1, 1), -1) == date(2025, 12, 1)
+    assert partition_name('bookings', date(2027, 1, 1)) == 'bookings_p202701'
+
+    # The legacy partition already covers November, so start in December
+    assert months_to_create(date(2026, 12, 1), today, 2) == [date(2026, 12, 1), date(2027, 1, 1)]
+    assert months_to_create(date(2027, 2, 1), today, 2) == []
+    assert months_to_create(None, today, 1) == [date(2026, 11, 1), date(2026, 12, 1)]
+
+    print("✅ Test passed!")
+
+def test_archive_streams_rows_to_ndjson():
+    print_test_header("Partitions - Streaming NDJSON Archive")
+    directory = tempfile.mkdtemp()
+    engine = create_engine(f"sqlite:///{os.path.join(directory, 'bookings.db')}")
+    db.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(Booking.__table__.insert(), [
+            {'user_id': i, 'event_id': 'evt', 'tickets': 1, 'total_price': 10, 'status': 'CONFIRMED'}
+            for i in range(7)
+        ])
+
+    path = os.path.join(directory, 'bookings.ndjson.gz')
+    with engine.connect() as connection:
+        batches = list(stream_rows(connection, 'bookings', batch_size=3))
+        assert [len(batch) for batch in batches] == [3, 3, 1]
+        count = write_ndjson((row for batch in stream_rows(connection, 'bookings', 3) for row in batch), path)
+
+    assert count == 7
+    with gzip.open(path, 'rt') as archive:
+        rows = [json.loads(line) for line in archive]
+    assert [row['user_id'] for row in rows] == list(range(7))
+    assert rows[0]['status'] == 'CONFIRMED'
+
+    print("✅ Test passed!")
+
+if __name__ == "__main__":
+    test_months_to_create_starts_after_existing_partitions()
+    test_archive_streams_rows_to_ndjson()
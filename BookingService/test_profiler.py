@@ -0,0 +1,115 @@
+import os
+import time
+
+os.environ['RABBITMQ_HOST'] = '127.0.0.1'
+os.environ['SAGA_WORKERS'] = '0'
+
+from app import create_app, db
+from profiler import RequestProfiler
+
+ADMIN = {'Authorization': 'Bearer secret'}
+
+def print_test_header(test_name):
+    print("\n" + "=" * 50)
+    print(f"TEST: {test_name}")
+    print("=" * 50)
+
+def make_app(**config):
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+        'ADMIN_TOKEN': 'secret',
+        'PROFILER_ENABLED': True,
+        **config
+    })
+
+    def slow():
+        time.sleep(0.1)
+        return 'done'
+    app.add_url_rule('/slow', 'slow', slow)
+    with app.app_context():
+        db.create_all()
+    return app
+
+def test_admin_endpoints_need_the_token():
+    print_test_header("Profiler - Admin Authentication")
+    client = make_app().test_client()
+
+    assert client.get('/admin/profiler').status_code == 401
+    assert client.get('/admin/profiler', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+    assert client.get('/admin/profiler', headers=ADMIN).status_code == 200
+
+    disabled = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://'}).test_client()
+    assert disabled.get('/admin/profiler', headers=ADMIN).status_code == 403
+
+    print("✅ Test passed!")
+
+def test_settings_are_validated():
+    print_test_header("Profiler - Settings Validation")
+    client = make_app(PROFILER_SAMPLE_RATE=0.5).test_client()
+
+    for body in ({'sample_rate': '0.5'}, {'sample_rate': 2}, {'sample_rate': True},
+                 {'slow_threshold_ms': -1}, {'slow_threshold_ms': '500'}, {'slow_threshold_ms': None, 'sample_rate': []},
+                 [0.5]):
+        assert client.put('/admin/profiler', json=body, headers=ADMIN).status_code == 400, body
+    assert client.get('/admin/profiler', headers=ADMIN).get_json()['sample_rate'] == 0.5
+
+    response = client.put('/admin/profiler', json={'sample_rate': 0, 'slow_threshold_ms': 250}, headers=ADMIN)
+    assert response.status_code == 200
+    assert response.get_json()['sample_rate'] == 0
+
+    print("✅ Test passed!")
+
+def test_sampled_requests_build_hot_function_table():
+    print_test_header("Profiler - Sampling")
+    client = make_app().test_client()
+
+    # Nothing is profiled until sampling is switched on
+    client.get('/slow')
+    assert client.get('/admin/profiler', headers=ADMIN).get_json()['profiled_requests'] == 0
+
+    response = client.put('/admin/profiler', json={'sample_rate': 1.0}, headers=ADMIN)
+    assert response.status_code == 200
+    client.get('/slow')
+
+    profile = client.get('/admin/profiler?sort=cumulative&limit=50', headers=ADMIN).get_json()
+    assert profile['profiled_requests'] == 1
+    assert any(entry['function'].startswith('slow ') for entry in profile['hot_functions'])
+
+    assert client.put('/admin/profiler', json={'sample_rate': 2}, headers=ADMIN).status_code == 400
+    client.delete('/admin/profiler', headers=ADMIN)
+    assert client.get('/admin/profiler', headers=ADMIN).get_json()['hot_functions'] == []
+
+    print("✅ Test passed!")
+
+def test_slow_requests_are_captured():
+    print_test_header("Profiler - Slow Request Capture")
+    client = make_app(PROFILER_SLOW_MS=50).test_client()
+
+    client.get('/health')
+    client.get('/slow')
+
+    captures = client.get('/admin/profiler/slow', headers=ADMIN).get_json()['requests']
+    assert [capture['path'] for capture in captures] == ['/slow']
+    assert captures[0]['duration_ms'] >= 50
+    assert captures[0]['samples'] > 0
+    assert 'slow' in captures[0]['stacks'][0]['stack']
+
+    print("✅ Test passed!")
+
+def test_sampling_fraction():
+    print_test_header("Profiler - Sample Rate")
+    values = iter([0.1, 0.9, 0.3, 0.7])
+    profiler = RequestProfiler(sample_rate=0.5, rand=lambda: next(values))
+
+    for _ in range(4):
+        profiler.finish_request(profiler.start_request(), 'GET', '/')
+    assert profiler.profiled_requests == 2
+
+    print("✅ Test passed!")
+
+if __name__ == "__main__":
+    test_admin_endpoints_need_the_token()
+    test_settings_are_validated()
+    test_sampled_requests_build_hot_function_table()
+    test_slow_requests_are_captured()
+    test_sampling_fraction()
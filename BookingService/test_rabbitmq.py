@@ -10,6 +10,7 @@ load_dotenv()
 # Try both variable names to handle potential typo in .env file
 rabbitmq_host = os.getenv('RABBITMQ_HOST', os.getenv('RABBMQ_HOST', 'localhost'))
 rabbitmq_queue = os.getenv('RABBITMQ_QUEUE', 'booking_notifications')
+rabbitmq_exchange = os.getenv('RABBITMQ_EXCHANGE', 'booking_events')
 
 def test_rabbitmq_connection():
     try:
@@ -18,8 +19,11 @@ def test_rabbitmq_connection():
         
         print(f"✅ Successfully connected to RabbitMQ at {rabbitmq_host}")
         
-        # Declare the queue
-        channel.queue_declare(queue=rabbitmq_queue, durable=True)
+        # Declare the exchange and the queue bound to it
+        channel.exchange_declare(exchange=rabbitmq_exchange, exchange_type='topic', durable=True)
+        channel.queue_declare(queue=rabbitmq_queue, durable=True,
+                              arguments={'x-max-priority': int(os.getenv('RABBITMQ_MAX_PRIORITY', 10))})
+        channel.queue_bind(queue=rabbitmq_queue, exchange=rabbitmq_exchange, routing_key='booking.#')
         print(f"✅ Successfully declared queue: {rabbitmq_queue}")
         
         # Send a test message
@@ -30,15 +34,15 @@ def test_rabbitmq_connection():
         }
         
         channel.basic_publish(
-            exchange='',
-            routing_key=rabbitmq_queue,
+            exchange=rabbitmq_exchange,
+            routing_key='booking.test.none',
             body=json.dumps(test_message),
             properties=pika.BasicProperties(
                 delivery_mode=2,  # make message persistent
             )
         )
         
-        print(f"✅ Successfully published test message to queue: {rabbitmq_queue}")
+        print(f"✅ Successfully published test message to exchange: {rabbitmq_exchange}")
         
         connection.close()
         return True
@@ -0,0 +1,95 @@
+import os
+
+os.environ['RABBITMQ_HOST'] = '127.0.0.1'
+os.environ['SAGA_WORKERS'] = '0'
+
+from app import create_app, db, Booking, EventInventory, SagaStep
+from fake_services import shared_event_service
+from reconcile_inventory import find_discrepancies, reconcile
+
+event_service = shared_event_service()
+
+app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://'})
+
+def print_test_header(test_name):
+    print("\n" + "=" * 50)
+    print(f"TEST: {test_name}")
+    print("=" * 50)
+
+def reset_database():
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+
+def add_booking(event_id, tickets, status='CONFIRMED'):
+    booking = Booking(user_id=1, event_id=event_id, tickets=tickets, total_price=10 * tickets, status=status)
+    db.session.add(booking)
+    db.session.commit()
+    return booking
+
+def test_find_discrepancies():
+    print_test_header("Reconcile - Expected Availability")
+    discrepancies, new_capacities = find_discrepancies(
+        sold={'a': 5, 'b': 2, 'c': 1},
+        capacities={'a': 10, 'b': 10},
+        available={'a': 5, 'b': 9, 'c': 4}
+    )
+
+    assert [(d.event_id, d.expected, d.actual) for d in discrepancies] == [('b', 8, 9)]
+    # First sighting of c: its capacity is what is left plus what was sold
+    assert new_capacities == {'c': 5}
+
+    print("✅ Test passed!")
+
+def test_reconcile_reports_and_repairs_drift():
+    print_test_header("Reconcile - Report and Repair")
+    reset_database()
+    event_service.add_event('evt-rec-1', available_tickets=7)
+    event_service.add_event('evt-rec-2', available_tickets=4)
+
+    with app.app_context():
+        add_booking('evt-rec-1', 3)
+        add_booking('evt-rec-1', 2, status='CANCELLED')
+        add_booking('evt-rec-2', 1)
+
+        counts = reconcile(event_service.url)
+        assert counts['baselined'] == 2
+        assert counts['discrepancies'] == 0
+        assert EventInventory.query.get('evt-rec-1').capacity == 10
+
+        # A decrement that never reached EventService
+        add_booking('evt-rec-1', 2)
+        counts = reconcile(event_service.url)
+        assert counts['discrepancies'] == 1
+        assert counts['repaired'] == 0
+        assert event_service.events['evt-rec-1']['availableTickets'] == 7
+
+        counts = reconcile(event_service.url, apply_repairs=True)
+        assert counts['repaired'] == 1
+        assert event_service.events['evt-rec-1']['availableTickets'] == 5
+        assert reconcile(event_service.url)['discrepancies'] == 0
+
+    print("✅ Test passed!")
+
+def test_reconcile_skips_decrements_still_in_the_saga():
+    print_test_header("Reconcile - Queued Saga Decrements")
+    reset_database()
+    event_service.add_event('evt-rec-3', available_tickets=10)
+
+    with app.app_context():
+        reconcile(event_service.url)
+
+        booking = add_booking('evt-rec-3', 4)
+        db.session.add(SagaStep(saga_id=f'confirm-{booking.id}', booking_id=booking.id, seq=3,
+                                step='event_decrement', status='PENDING'))
+        db.session.commit()
+
+        # EventService will be updated by the saga retry; that is not drift
+        assert reconcile(event_service.url)['discrepancies'] == 0
+
+    print("✅ Test passed!")
+
+if __name__ == "__main__":
+    test_find_discrepancies()
+    test_reconcile_reports_and_repairs_drift()
+    test_reconcile_skips_decrements_still_in_the_saga()
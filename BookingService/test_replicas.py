@@ -0,0 +1,155 @@
+import os
+import tempfile
+
+os.environ['RABBITMQ_HOST'] = '127.0.0.1'
+os.environ['SAGA_WORKERS'] = '0'
+
+from sqlalchemy import create_engine
+
+from app import create_app, db, Booking
+from fake_services import shared_event_service
+
+event_service = shared_event_service()
+
+def print_test_header(test_name):
+    print("\n" + "=" * 50)
+    print(f"TEST: {test_name}")
+    print("=" * 50)
+
+def create_databases():
+    """A primary and a replica database that start out identical"""
+    directory = tempfile.mkdtemp()
+    primary_url = f"sqlite:///{os.path.join(directory, 'primary.db')}"
+    replica_url = f"sqlite:///{os.path.join(directory, 'replica.db')}"
+    db.metadata.create_all(create_engine(replica_url))
+    return primary_url, replica_url
+
+def add_booking(url, user_id, booking_id=100):
+    """Insert a booking directly, as replication would"""
+    engine = create_engine(url)
+    with engine.begin() as connection:
+        connection.execute(Booking.__table__.insert(), {
+            'id': booking_id, 'user_id': user_id, 'event_id': 'evt-r', 'tickets': 1,
+            'total_price': 10, 'status': 'CONFIRMED'
+        })
+
+def test_reads_go_to_replica_and_writes_stick_to_primary():
+    print_test_header("Replicas - Routing and Read Your Writes")
+    primary_url, replica_url = create_databases()
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': primary_url,
+        'DATABASE_REPLICA_URLS': replica_url
+    })
+    with app.app_context():
+        db.create_all()
+    event_service.add_event('evt-r', price=10.0)
+    client = app.test_client()
+
+    # Only the replica has this user's history, so a hit proves the routing
+    add_booking(replica_url, user_id=1)
+    assert len(client.get('/api/bookings/user/1').get_json()) == 1
+
+    # The user's own booking lands on the primary and has not replicated yet
+    response = client.post('/api/bookings', json={'user_id': 2, 'event_id': 'evt-r', 'tickets': 1})
+    assert response.status_code == 201
+    booking_id = response.get_json()['booking']['id']
+
+    assert len(client.get('/api/bookings/user/2').get_json()) == 1
+    assert client.get(f'/api/bookings/{booking_id}').status_code == 200
+
+    metrics = client.get('/metrics/replicas').get_json()
+    assert metrics['replica_reads'] == 1
+    assert metrics['primary_reads'] == 2
+
+    print("✅ Test passed!")
+
+def test_unhealthy_replica_falls_back_to_primary():
+    print_test_header("Replicas - Fallback to Primary")
+    primary_url, _ = create_databases()
+    missing_replica = f"sqlite:///{tempfile.mkdtemp()}/missing/replica.db"
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': primary_url,
+        'DATABASE_REPLICA_URLS': missing_replica
+    })
+    with app.app_context():
+        db.create_all()
+    add_booking(primary_url, user_id=3)
+    client = app.test_client()
+
+    assert len(client.get('/api/bookings/user/3').get_json()) == 1
+    assert len(client.get('/api/bookings/user/3').get_json()) == 1
+
+    metrics = client.get('/metrics/replicas').get_json()
+    assert metrics['replica_errors'] == 1
+    assert metrics['primary_reads'] == 2
+    assert metrics['replicas'] == [{'index': 0, 'healthy': False}]
+
+    print("✅ Test passed!")
+
+def test_changed_booking_is_read_from_primary():
+    print_test_header("Replicas - Read a Changed Booking")
+    primary_url, replica_url = create_databases()
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': primary_url,
+        'DATABASE_REPLICA_URLS': replica_url
+    })
+    with app.app_context():
+        db.create_all()
+    event_service.add_event('evt-r', price=10.0)
+    for url in (primary_url, replica_url):
+        add_booking(url, user_id=5, booking_id=200)
+        add_booking(url, user_id=6, booking_id=201)
+    client = app.test_client()
+
+    # The cancellation has not replicated yet
+    assert client.put('/api/bookings/200/cancel').status_code == 200
+    assert client.get('/api/bookings/200').get_json()['booking']['status'] == 'CANCELLED'
+    # Bookings of other users are still read from the replica
+    assert client.get('/api/bookings/201').status_code == 200
+
+    metrics = client.get('/metrics/replicas').get_json()
+    assert metrics['replica_reads'] == 1
+    assert metrics['primary_reads'] == 1
+
+    print("✅ Test passed!")
+
+def test_read_your_writes_on_another_worker():
+    print_test_header("Replicas - Stickiness Across Workers")
+    primary_url, replica_url = create_databases()
+    config = {
+        'SQLALCHEMY_DATABASE_URI': primary_url,
+        'DATABASE_REPLICA_URLS': replica_url,
+        'SECRET_KEY': 'shared'
+    }
+    # Two apps stand in for two worker processes behind a load balancer
+    first, second = create_app(config), create_app(config)
+    with first.app_context():
+        db.create_all()
+    event_service.add_event('evt-r', price=10.0)
+
+    response = first.test_client().post('/api/bookings', json={'user_id': 7, 'event_id': 'evt-r', 'tickets': 1})
+    assert response.status_code == 201
+    cookie = response.headers['Set-Cookie'].split(';')[0].split('=', 1)[1]
+
+    # The client's cookie sends its read to the primary on the other worker too
+    client = second.test_client()
+    client.set_cookie('localhost', 'booking_reads_primary', cookie)
+    assert len(client.get('/api/bookings/user/7').get_json()) == 1
+
+    # A cookie signed with another secret, or altered, is ignored
+    for forged in (cookie.replace('7:', '8:'), create_app({**config, 'SECRET_KEY': 'other'}).extensions['replicas']
+                   .encode_sticky({'7': 4102444800.0})):
+        client.set_cookie('localhost', 'booking_reads_primary', forged)
+        assert client.get('/api/bookings/user/7').get_json() == []
+
+    metrics = client.get('/metrics/replicas').get_json()
+    assert metrics['primary_reads'] == 1
+    assert metrics['replica_reads'] == 2
+
+    print("✅ Test passed!")
+
+if __name__ == "__main__":
+    test_reads_go_to_replica_and_writes_stick_to_primary()
+    test_unhealthy_replica_falls_back_to_primary()
+    test_changed_booking_is_read_from_primary()
+    test_read_your_writes_on_another_worker()
@@ -0,0 +1,184 @@
+import os
+import tempfile
+import time
+from datetime import datetime
+
+os.environ['RABBITMQ_HOST'] = '127.0.0.1'
+# Retries are driven by the tests through run_pending, not background threads
+os.environ['SAGA_WORKERS'] = '0'
+
+from app import db, Booking, EventSalesSummary, Payment, SagaStep
+from fake_services import shared_event_service
+from saga import backoff_delay
+from testing import make_app
+
+event_service = shared_event_service()
+
+def print_test_header(test_name):
+    print("\n" + "=" * 50)
+    print(f"TEST: {test_name}")
+    print("=" * 50)
+
+def steps_by_name(booking_id):
+    return {step.step: step for step in SagaStep.query.filter_by(booking_id=booking_id)}
+
+def make_due(booking_id):
+    """Skip the backoff delay of a booking's pending steps"""
+    SagaStep.query.filter_by(booking_id=booking_id, status='PENDING').update({'next_attempt_at': datetime.utcnow()})
+    db.session.commit()
+
+def test_decrement_runs_inline_and_is_logged():
+    print_test_header("Saga - Step Log on Success")
+    app = make_app()
+    event_service.add_event('evt-saga-ok', price=10.0, available_tickets=5)
+    client = app.test_client()
+
+    response = client.post('/api/bookings', json={'user_id': 1, 'event_id': 'evt-saga-ok', 'tickets': 2})
+    assert response.status_code == 201
+    assert event_service.events['evt-saga-ok']['availableTickets'] == 3
+
+    with app.app_context():
+        steps = steps_by_name(response.get_json()['booking']['id'])
+        assert steps['payment'].status == 'DONE'
+        assert steps['local_commit'].status == 'DONE'
+        assert steps['event_decrement'].status == 'DONE'
+        # No broker in the tests, so the notification is waiting for a retry
+        assert steps['notification'].status == 'PENDING'
+        assert steps['notification'].attempts == 1
+
+    print("✅ Test passed!")
+
+def test_failed_decrement_is_retried():
+    print_test_header("Saga - Retry After EventService Failure")
+    app = make_app()
+    event_service.add_event('evt-saga-retry', price=10.0, available_tickets=5)
+    client = app.test_client()
+
+    event_service.fail_writes = True
+    try:
+        response = client.post('/api/bookings', json={'user_id': 2, 'event_id': 'evt-saga-retry', 'tickets': 2})
+    finally:
+        event_service.fail_writes = False
+    # The booking is confirmed without waiting for EventService to recover
+    assert response.status_code == 201
+    booking_id = response.get_json()['booking']['id']
+    assert event_service.events['evt-saga-retry']['availableTickets'] == 5
+
+    with app.app_context():
+        decrement = steps_by_name(booking_id)['event_decrement']
+        assert decrement.status == 'PENDING'
+        assert decrement.next_attempt_at > datetime.utcnow()
+        assert steps_by_name(booking_id)['notification'].status == 'WAITING'
+
+        # Not due yet, so nothing runs
+        assert app.extensions['saga'].run_pending() == 0
+        make_due(booking_id)
+        app.extensions['saga'].run_pending()
+        db.session.expire_all()
+        assert steps_by_name(booking_id)['event_decrement'].status == 'DONE'
+        assert steps_by_name(booking_id)['notification'].status == 'PENDING'
+    assert event_service.events['evt-saga-retry']['availableTickets'] == 3
+
+    print("✅ Test passed!")
+
+def test_refused_decrement_is_compensated():
+    print_test_header("Saga - Compensation on Permanent Failure")
+    app = make_app()
+    event_service.add_event('evt-saga-gone', price=10.0, available_tickets=5)
+    client = app.test_client()
+
+    event_service.fail_writes = True
+    try:
+        response = client.post('/api/bookings', json={'user_id': 3, 'event_id': 'evt-saga-gone', 'tickets': 2})
+    finally:
+        event_service.fail_writes = False
+    booking_id = response.get_json()['booking']['id']
+
+    # The tickets sell out elsewhere before the retry
+    event_service.events['evt-saga-gone']['availableTickets'] = 1
+    with app.app_context():
+        make_due(booking_id)
+        app.extensions['saga'].run_pending()
+        db.session.expire_all()
+
+        steps = steps_by_name(booking_id)
+        assert steps['event_decrement'].status == 'COMPENSATED'
+        assert steps['notification'].payload_data()['status'] == 'CANCELLED'
+        assert Booking.query.get(booking_id).status == 'CANCELLED'
+        assert Payment.query.filter_by(booking_id=booking_id).one().status == 'REFUNDED'
+
+        summary = EventSalesSummary.query.get('evt-saga-gone')
+        assert summary.confirmed_count == 0
+        assert summary.cancelled_count == 1
+        assert summary.tickets_sold == 0
+
+    print("✅ Test passed!")
+
+def test_cancel_skips_outstanding_steps():
+    print_test_header("Saga - Cancellation Skips Unsent Steps")
+    app = make_app()
+    event_service.add_event('evt-saga-cancel', price=10.0, available_tickets=5)
+    client = app.test_client()
+
+    event_service.fail_writes = True
+    try:
+        response = client.post('/api/bookings', json={'user_id': 4, 'event_id': 'evt-saga-cancel', 'tickets': 2})
+    finally:
+        event_service.fail_writes = False
+    booking_id = response.get_json()['booking']['id']
+    assert client.put(f'/api/bookings/{booking_id}/cancel').status_code == 200
+
+    with app.app_context():
+        steps = steps_by_name(booking_id)
+        assert steps['event_decrement'].status == 'SKIPPED'
+        assert steps['notification'].status == 'SKIPPED'
+        make_due(booking_id)
+        assert app.extensions['saga'].run_pending() == 0
+    # Never decremented, so nothing was given back either
+    assert event_service.events['evt-saga-cancel']['availableTickets'] == 5
+
+    print("✅ Test passed!")
+
+def test_workers_retry_left_over_steps_at_startup():
+    print_test_header("Saga - Workers Start With the App")
+    directory = tempfile.mkdtemp()
+    app = make_app(directory)
+    event_service.add_event('evt-saga-restart', price=10.0, available_tickets=5)
+
+    event_service.fail_writes = True
+    try:
+        response = app.test_client().post('/api/bookings', json={'user_id': 5, 'event_id': 'evt-saga-restart', 'tickets': 2})
+    finally:
+        event_service.fail_writes = False
+    booking_id = response.get_json()['booking']['id']
+    with app.app_context():
+        make_due(booking_id)
+
+    # A restarted process retries the step without serving any request
+    restarted = make_app(directory, SAGA_WORKERS=1, SAGA_POLL_INTERVAL=0.05)
+    deadline = time.monotonic() + 5
+    while event_service.events['evt-saga-restart']['availableTickets'] != 3 and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert event_service.events['evt-saga-restart']['availableTickets'] == 3
+    assert restarted.extensions['saga'].running()
+    # Park the poller for the rest of the run
+    restarted.extensions['saga'].poll_interval = 3600
+
+    print("✅ Test passed!")
+
+def test_backoff_grows_and_is_capped():
+    print_test_header("Saga - Backoff Delay")
+    for attempts in range(1, 5):
+        delay = backoff_delay(attempts, base_delay=2, max_delay=300)
+        assert 2 ** attempts / 2 <= delay <= 2 ** attempts
+    assert backoff_delay(20, base_delay=2, max_delay=300) <= 300
+
+    print("✅ Test passed!")
+
+if __name__ == "__main__":
+    test_decrement_runs_inline_and_is_logged()
+    test_failed_decrement_is_retried()
+    test_refused_decrement_is_compensated()
+    test_cancel_skips_outstanding_steps()
+    test_workers_retry_left_over_steps_at_startup()
+    test_backoff_grows_and_is_capped()
@@ -0,0 +1,190 @@
+import os
+import tempfile
+import time
+
+os.environ['RABBITMQ_HOST'] = '127.0.0.1'
+os.environ['SAGA_WORKERS'] = '0'
+
+from app import SeatAssignment
+from fake_services import shared_event_service
+from seatmap import Row, SeatMap, find_run, pack, unpack
+from testing import make_app
+
+event_service = shared_event_service()
+
+ADMIN = {'Authorization': 'Bearer secret'}
+SEATS = {'ADMIN_TOKEN': 'secret', 'SEAT_MAPS_ENABLED': True}
+
+def print_test_header(test_name):
+    print("\n" + "=" * 50)
+    print(f"TEST: {test_name}")
+    print("=" * 50)
+
+def test_find_run():
+    print_test_header("Seat Map - Contiguous Free Seats")
+    assert find_run(0b1111, 4) == 0
+    assert find_run(0b1111, 5) == -1
+    assert find_run(0b1110111, 3) == 0
+    assert find_run(0b1110110, 3) == 4
+    assert find_run(0b1011011011, 2) == 0
+    assert find_run(0b1011011010, 2) == 3
+    assert find_run(0, 1) == -1
+    free = ((1 << 300) - 1) & ~(1 << 150)
+    assert find_run(free, 150) == 0
+    assert find_run(free, 151) == -1
+    assert find_run(free >> 1 << 1, 149) == 1
+    assert find_run(free >> 1 << 1, 150) == -1
+
+    assert unpack(pack(0b101, 20)) == 0b101
+    assert len(pack(0, 20)) == 3
+
+    print("✅ Test passed!")
+
+def test_hold_release_and_expiry():
+    print_test_header("Seat Map - Holds")
+    now = [0.0]
+    seat_map = SeatMap('evt', [Row('A', 1, 4), Row('A', 2, 6)], clock=lambda: now[0])
+
+    first = seat_map.hold(1, 3, ttl=60)
+    assert first.seats() == ['A-1-1', 'A-1-2', 'A-1-3']
+    # Row 1 has one seat left, so the next group goes to row 2
+    second = seat_map.hold(2, 3, ttl=60)
+    assert second.seats() == ['A-2-1', 'A-2-2', 'A-2-3']
+    assert seat_map.hold(3, 4, ttl=60) is None
+
+    assert seat_map.release(first.id)
+    assert seat_map.hold(3, 4, ttl=60).seats() == ['A-1-1', 'A-1-2', 'A-1-3', 'A-1-4']
+
+    now[0] = 61
+    assert seat_map.get_hold(second.id) is None
+    assert seat_map.summary()['sections']['A']['free'] == 10
+
+    print("✅ Test passed!")
+
+def test_allocation_in_large_venue_is_fast():
+    print_test_header("Seat Map - 100k Seat Venue")
+    rows = [Row(section, number, 250) for section in 'ABCD' for number in range(1, 101)]
+    seat_map = SeatMap('big', rows)
+
+    started = time.perf_counter()
+    holds = [seat_map.hold(user_id, 4, ttl=600) for user_id in range(20000)]
+    per_hold = (time.perf_counter() - started) / len(holds)
+
+    assert all(holds)
+    assert seat_map.summary()['sections']['A']['free'] == 25000 - 4 * 62 * 100
+    print(f"Average hold time: {per_hold * 1e6:.1f} µs")
+    assert per_hold < 0.001
+
+    print("✅ Test passed!")
+
+def test_booking_with_seat_hold():
+    print_test_header("Seat Map - Booking and Cancelling Held Seats")
+    app = make_app(**SEATS)
+    event_service.add_event('evt-seats', price=10.0, available_tickets=100)
+    client = app.test_client()
+
+    assert client.put('/api/bookings/event/evt-seats/seat-map', json={'sections': {'A': [4, 4]}}).status_code == 401
+    response = client.put('/api/bookings/event/evt-seats/seat-map',
+                          json={'sections': {'A': [4, 4], 'B': [10]}}, headers=ADMIN)
+    assert response.status_code == 201
+    assert response.get_json()['sections']['B'] == {'rows': 1, 'seats': 10, 'free': 10}
+
+    response = client.post('/api/bookings/event/evt-seats/seats/hold', json={'user_id': 1, 'count': 3, 'section': 'B'})
+    assert response.status_code == 201
+    hold = response.get_json()
+    assert hold['seats'] == ['B-1-1', 'B-1-2', 'B-1-3']
+
+    # Only the user who holds the seats can book them
+    response = client.post('/api/bookings', json={'user_id': 2, 'event_id': 'evt-seats', 'hold_id': hold['hold_id']})
+    assert response.status_code == 409
+
+    response = client.post('/api/bookings', json={'user_id': 1, 'event_id': 'evt-seats', 'hold_id': hold['hold_id']})
+    assert response.status_code == 201
+    booking = response.get_json()
+    assert booking['booking']['tickets'] == 3
+    assert booking['seats'] == hold['seats']
+    assert event_service.events['evt-seats']['availableTickets'] == 97
+
+    # The hold is used up, and the sold seats are not offered again
+    response = client.post('/api/bookings', json={'user_id': 1, 'event_id': 'evt-seats', 'hold_id': hold['hold_id']})
+    assert response.status_code == 409
+    response = client.post('/api/bookings/event/evt-seats/seats/hold', json={'user_id': 2, 'count': 8, 'section': 'B'})
+    assert response.status_code == 409
+
+    assert client.put(f"/api/bookings/{booking['booking']['id']}/cancel").status_code == 200
+    with app.app_context():
+        assert SeatAssignment.query.count() == 0
+    response = client.post('/api/bookings/event/evt-seats/seats/hold', json={'user_id': 2, 'count': 10, 'section': 'B'})
+    assert response.status_code == 201
+
+    print("✅ Test passed!")
+
+def test_holds_are_shared_between_processes():
+    print_test_header("Seat Map - Holds in Two Processes")
+    directory = tempfile.mkdtemp()
+    first, second = make_app(directory, **SEATS), make_app(directory, **SEATS)
+    event_service.add_event('evt-race', price=10.0, available_tickets=100)
+    first.test_client().put('/api/bookings/event/evt-race/seat-map', json={'sections': {'A': [4]}}, headers=ADMIN)
+    # The second process loads the seat map before the first one holds seats
+    assert second.test_client().get('/api/bookings/event/evt-race/seat-map').get_json()['holds'] == 0
+
+    holds = [
+        app.test_client().post('/api/bookings/event/evt-race/seats/hold', json={'user_id': user_id, 'count': 2}).get_json()
+        for user_id, app in ((1, first), (2, second))
+    ]
+    assert holds[0]['seats'] == ['A-1-1', 'A-1-2']
+    assert holds[1]['seats'] == ['A-1-3', 'A-1-4']
+    response = first.test_client().post('/api/bookings/event/evt-race/seats/hold', json={'user_id': 3, 'count': 1})
+    assert response.status_code == 409
+
+    # Holds made in one process can be booked in the other, and disjoint
+    # holds in the same row both sell
+    response = second.test_client().post('/api/bookings', json={'user_id': 1, 'event_id': 'evt-race', 'hold_id': holds[0]['hold_id']})
+    assert response.status_code == 201
+    response = second.test_client().post('/api/bookings', json={'user_id': 2, 'event_id': 'evt-race', 'hold_id': holds[1]['hold_id']})
+    assert response.status_code == 201
+
+    for app in (first, second):
+        assert app.test_client().get('/api/bookings/event/evt-race/seat-map').get_json()['sections']['A']['free'] == 0
+    with first.app_context():
+        assert SeatAssignment.query.count() == 2
+
+    print("✅ Test passed!")
+
+def test_failed_booking_keeps_holds():
+    print_test_header("Seat Map - Failed Booking Keeps Holds")
+    app = make_app(**SEATS)
+    event_service.add_event('evt-retry', price=10.0, available_tickets=100)
+    client = app.test_client()
+    client.put('/api/bookings/event/evt-retry/seat-map', json={'sections': {'A': [4]}}, headers=ADMIN)
+    holds = [
+        client.post('/api/bookings/event/evt-retry/seats/hold', json={'user_id': user_id, 'count': 2}).get_json()
+        for user_id in (1, 2)
+    ]
+
+    store = app.extensions['seat_maps']
+    commit_hold = store.commit_hold
+    def fail_after_selling(*args):
+        commit_hold(*args)
+        raise RuntimeError('database went away')
+    store.commit_hold = fail_after_selling
+    response = client.post('/api/bookings', json={'user_id': 1, 'event_id': 'evt-retry', 'hold_id': holds[0]['hold_id']})
+    assert response.status_code == 500
+    del store.commit_hold
+
+    # Neither the failed hold nor anyone else's was lost
+    assert client.get('/api/bookings/event/evt-retry/seat-map').get_json()['holds'] == 2
+    for user_id, hold in zip((1, 2), holds):
+        response = client.post('/api/bookings', json={'user_id': user_id, 'event_id': 'evt-retry', 'hold_id': hold['hold_id']})
+        assert response.status_code == 201
+        assert response.get_json()['seats'] == hold['seats']
+
+    print("✅ Test passed!")
+
+if __name__ == "__main__":
+    test_find_run()
+    test_hold_release_and_expiry()
+    test_allocation_in_large_venue_is_fast()
+    test_booking_with_seat_hold()
+    test_holds_are_shared_between_processes()
+    test_failed_booking_keeps_holds()
@@ -0,0 +1,106 @@
+import os
+import tempfile
+
+os.environ['RABBITMQ_HOST'] = '127.0.0.1'
+os.environ['SAGA_WORKERS'] = '0'
+
+from sqlalchemy import create_engine
+
+from app import create_app, db, Booking
+from fake_services import shared_event_service
+from sharding import SHARD_SLOTS, HashRing, init_shard
+
+event_service = shared_event_service()
+
+def print_test_header(test_name):
+    print("\n" + "=" * 50)
+    print(f"TEST: {test_name}")
+    print("=" * 50)
+
+def test_hash_ring_moves_few_keys_when_a_shard_is_added():
+    print_test_header("Sharding - Consistent Hashing")
+    keys = [f'event-{i}' for i in range(2000)]
+    before = HashRing(range(4))
+    after = HashRing(range(5))
+
+    moved = sum(before.node_for(key) != after.node_for(key) for key in keys)
+    # Ideally 1/5 of the keys move to the new shard
+    assert moved < len(keys) * 0.3
+    assert all(after.node_for(key) == 4 for key in keys if before.node_for(key) != after.node_for(key))
+
+    print("✅ Test passed!")
+
+def test_bookings_are_routed_to_event_shards():
+    print_test_header("Sharding - Routing, Lookup and Scatter-Gather")
+    directory = tempfile.mkdtemp()
+    shard_urls = [f"sqlite:///{os.path.join(directory, f'shard{i}.db')}" for i in range(3)]
+    for index, url in enumerate(shard_urls):
+        init_shard(create_engine(url), db.metadata, directory=index == 0)
+
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+        'SHARD_DATABASE_URLS': ','.join(shard_urls),
+        'SHARD_ID_BLOCK_SIZE': 2
+    })
+    router = app.extensions['shards']
+    client = app.test_client()
+
+    # Pick events that land on different shards
+    events = {}
+    for i in range(100):
+        events.setdefault(router.shard_for_event(f'evt-s{i}').index, f'evt-s{i}')
+    assert len(events) == 3
+    for event_id in events.values():
+        event_service.add_event(event_id, price=10.0)
+
+    booking_ids = {}
+    for shard_index, event_id in events.items():
+        for _ in range(3):
+            response = client.post('/api/bookings', json={'user_id': 42, 'event_id': event_id, 'tickets': 1})
+            assert response.status_code == 201
+            booking_id = response.get_json()['booking']['id']
+            assert booking_id % SHARD_SLOTS == shard_index
+            booking_ids.setdefault(shard_index, []).append(booking_id)
+
+    # Each shard holds only its own events' bookings
+    for shard_index, url in enumerate(shard_urls):
+        with create_engine(url).connect() as connection:
+            rows = connection.execute(Booking.__table__.select()).fetchall()
+        assert {row.event_id for row in rows} == {events[shard_index]}
+        assert sorted(row.id for row in rows) == sorted(booking_ids[shard_index])
+
+    # Single-shard lookups by id
+    some_id = booking_ids[2][1]
+    assert client.get(f'/api/bookings/{some_id}').get_json()['booking']['event_id'] == events[2]
+    assert client.put(f'/api/bookings/{some_id}/cancel').status_code == 200
+    assert client.get(f'/api/bookings/{SHARD_SLOTS + 7}').status_code == 404
+
+    # User history gathers from every shard
+    history = client.get('/api/bookings/user/42').get_json()
+    assert len(history) == 9
+    assert {item['booking']['event_id'] for item in history} == set(events.values())
+
+    stats = client.get(f'/api/bookings/event/{events[2]}/stats').get_json()
+    assert stats['bookings']['CONFIRMED'] == 2
+    assert stats['bookings']['CANCELLED'] == 1
+
+    # A shard added later takes new events only; the others stay where their bookings are
+    added = f"sqlite:///{os.path.join(directory, 'shard3.db')}"
+    init_shard(create_engine(added), db.metadata)
+    grown = create_app({
+        'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+        'SHARD_DATABASE_URLS': ','.join(shard_urls + [added]),
+        'SHARD_ID_BLOCK_SIZE': 2
+    })
+    grown_router = grown.extensions['shards']
+    assert any(grown_router.ring.node_for(f'evt-s{i}') == 3 for i in range(100))
+    assert all(grown_router.shard_for_event(f'evt-s{i}').index != 3 for i in range(100))
+    stats = grown.test_client().get(f'/api/bookings/event/{events[2]}/stats').get_json()
+    assert stats['bookings']['CONFIRMED'] == 2
+    assert any(grown_router.shard_for_event(f'evt-new{i}').index == 3 for i in range(100))
+
+    print("✅ Test passed!")
+
+if __name__ == "__main__":
+    test_hash_ring_moves_few_keys_when_a_shard_is_added()
+    test_bookings_are_routed_to_event_shards()
@@ -0,0 +1,165 @@
+import os
+import threading
+
+os.environ['RABBITMQ_HOST'] = '127.0.0.1'
+os.environ['SAGA_WORKERS'] = '0'
+
+import json
+import time
+
+import clients
+from app import notification_envelope, send_notification
+from fake_services import FakeUserService, shared_event_service
+from testing import make_app
+from user_directory import UserDirectory
+
+user_service = FakeUserService().start()
+for user_id in range(1, 6):
+    user_service.add_user(user_id)
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def print_test_header(test_name):
+    print("\n" + "=" * 50)
+    print(f"TEST: {test_name}")
+    print("=" * 50)
+
+def lookups():
+    return len(user_service.requests)
+
+def test_profiles_are_cached_until_ttl():
+    print_test_header("User Directory - LRU and TTL Cache")
+    clock = FakeClock()
+    directory = UserDirectory(user_service.url, ttl=60, max_entries=2, clock=clock)
+    start = lookups()
+
+    assert directory.email_for(1) == 'user1@users.test'
+    assert directory.email_for(1) == 'user1@users.test'
+    assert lookups() == start + 1
+
+    # Unknown users are cached too and get the placeholder address
+    assert directory.email_for(99) == 'user99@example.com'
+    assert directory.email_for(99) == 'user99@example.com'
+    assert lookups() == start + 2
+
+    # Least recently used entry is evicted beyond max_entries
+    directory.get(2)
+    assert 1 not in directory.cache
+    assert lookups() == start + 3
+
+    clock.now = 61
+    directory.get(2)
+    assert lookups() == start + 4
+
+    print("✅ Test passed!")
+
+def test_batch_lookup_fetches_only_misses():
+    print_test_header("User Directory - Batch Lookup")
+    directory = UserDirectory(user_service.url, batch_size=2)
+    directory.get(1)
+    start = lookups()
+
+    emails = directory.emails_for([1, 2, 3, 4, 42])
+    assert emails == {
+        1: 'user1@users.test', 2: 'user2@users.test', 3: 'user3@users.test',
+        4: 'user4@users.test', 42: 'user42@example.com'
+    }
+    # Four misses in batches of two
+    assert lookups() == start + 2
+    assert user_service.requests[-2][1].endswith('ids=2%2C3')
+
+    print("✅ Test passed!")
+
+def test_concurrent_lookups_are_coalesced():
+    print_test_header("User Directory - Request Coalescing")
+    directory = UserDirectory(user_service.url)
+    start = lookups()
+    results = []
+
+    user_service.delay = 0.2
+    try:
+        threads = [threading.Thread(target=lambda: results.append(directory.email_for(5))) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        user_service.delay = 0
+
+    assert results == ['user5@users.test'] * 5
+    assert lookups() == start + 1
+    assert directory.stats['coalesced'] == 4
+
+    print("✅ Test passed!")
+
+def test_failures_fall_back_and_back_off():
+    print_test_header("User Directory - UserService Down")
+    clock = FakeClock()
+    directory = UserDirectory(user_service.url, error_backoff=30, clock=clock)
+    start = lookups()
+
+    user_service.fail = True
+    try:
+        assert directory.email_for(3) == 'user3@example.com'
+        # No further calls during the cool-down, and the failure is not cached
+        assert directory.email_for(3) == 'user3@example.com'
+        assert lookups() == start + 1
+    finally:
+        user_service.fail = False
+
+    clock.now = 31
+    assert directory.email_for(3) == 'user3@users.test'
+
+    print("✅ Test passed!")
+
+class RecordingBroker:
+    def __init__(self):
+        self.published = []
+
+    def publish(self, routing_key, body, priority=None, message_id=None):
+        self.published.append((json.loads(body), message_id))
+
+def test_bookings_do_not_wait_on_user_service():
+    print_test_header("User Directory - Lookups Off the Request Path")
+    app = make_app(USER_LOOKUP_TIMEOUT=0.1)
+    shared_event_service().add_event('evt-directory', price=10.0)
+    broker = RecordingBroker()
+    clients._broker = broker
+    clients._user_directory = UserDirectory(user_service.url, timeout=2)
+    user_service.delay = 1
+    try:
+        started = time.monotonic()
+        response = app.test_client().post('/api/bookings', json={'user_id': 4, 'event_id': 'evt-directory', 'tickets': 1})
+        assert response.status_code == 201
+        # A slow UserService costs the request at most the lookup timeout, not its own
+        assert time.monotonic() - started < 0.9
+        assert broker.published[0][0]['user_email'] == 'user4@example.com'
+
+        # Saga workers resolve the recipient of a confirmation when they send it
+        user_service.delay = 0
+        clients._user_directory = UserDirectory(user_service.url)
+        payload = {'booking_id': 1, 'user_id': 4, 'event_id': 'evt-directory', 'status': 'CONFIRMED'}
+        with app.app_context():
+            send_notification(payload)
+        sent, message_id = broker.published[-1]
+        assert sent['user_email'] == 'user4@users.test'
+        # A retry that resolves the recipient differently keeps the message id
+        assert message_id == notification_envelope({**payload, 'user_email': 'user4@example.com'})[3]
+    finally:
+        user_service.delay = 0
+        clients._broker = None
+        clients._user_directory = None
+
+    print("✅ Test passed!")
+
+if __name__ == "__main__":
+    test_profiles_are_cached_until_ttl()
+    test_batch_lookup_fetches_only_misses()
+    test_concurrent_lookups_are_coalesced()
+    test_failures_fall_back_and_back_off()
+    test_bookings_do_not_wait_on_user_service()
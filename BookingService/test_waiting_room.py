@@ -0,0 +1,142 @@
+import os
+import tempfile
+import time
+
+os.environ['RABBITMQ_HOST'] = '127.0.0.1'
+os.environ['SAGA_WORKERS'] = '0'
+
+from app import db, Booking, WaitingRoomEvent
+from fake_services import shared_event_service
+from testing import make_app
+
+event_service = shared_event_service()
+
+ADMIN = {'Authorization': 'Bearer secret'}
+
+def print_test_header(test_name):
+    print("\n" + "=" * 50)
+    print(f"TEST: {test_name}")
+    print("=" * 50)
+
+def wait_for_ticket(client, ticket_id, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        ticket = client.get(f'/api/bookings/waiting-room/{ticket_id}').get_json()
+        if ticket['state'] == 'DONE':
+            return ticket
+        time.sleep(0.02)
+    raise AssertionError(f"Ticket {ticket_id} was not processed in time")
+
+def test_waiting_room_queues_and_dispatches_in_order():
+    print_test_header("Waiting Room - Queue and Dispatch")
+    # The dispatcher thread needs its own connection, so use a file database
+    app = make_app(tempfile.mkdtemp(), ADMIN_TOKEN='secret')
+    event_service.add_event('evt-big', price=5.0, available_tickets=3)
+    client = app.test_client()
+
+    response = client.put('/api/bookings/event/evt-big/waiting-room', json={'enabled': True, 'rate': 50}, headers=ADMIN)
+    assert response.status_code == 200
+    assert response.get_json()['enabled']
+
+    tickets = []
+    for user_id in range(1, 5):
+        response = client.post('/api/bookings', json={'user_id': user_id, 'event_id': 'evt-big', 'tickets': 1})
+        assert response.status_code == 202
+        tickets.append(response.get_json())
+
+    # Retrying while queued keeps the same place in line
+    retry = client.post('/api/bookings', json={'user_id': 1, 'event_id': 'evt-big', 'tickets': 1}).get_json()
+    assert retry['ticket_id'] == tickets[0]['ticket_id']
+
+    results = [wait_for_ticket(client, ticket['ticket_id']) for ticket in tickets]
+    assert [result['status_code'] for result in results] == [201, 201, 201, 400]
+    assert results[0]['result']['booking']['status'] == 'CONFIRMED'
+
+    with app.app_context():
+        assert [b.user_id for b in Booking.query.order_by(Booking.id)] == [1, 2, 3]
+
+    assert client.get('/api/bookings/waiting-room/unknown').status_code == 404
+
+    print("✅ Test passed!")
+
+def test_disabled_waiting_room_books_inline():
+    print_test_header("Waiting Room - Disabled Event")
+    app = make_app(ADMIN_TOKEN='secret')
+    event_service.add_event('evt-small')
+    client = app.test_client()
+
+    assert client.put('/api/bookings/event/evt-small/waiting-room', json={'enabled': False}, headers=ADMIN).status_code == 200
+    response = client.post('/api/bookings', json={'user_id': 1, 'event_id': 'evt-small', 'tickets': 1})
+    assert response.status_code == 201
+
+    print("✅ Test passed!")
+
+def test_workers_share_the_line():
+    print_test_header("Waiting Room - Shared Between Workers")
+    directory = tempfile.mkdtemp()
+    # Two apps on one database stand in for two worker processes
+    first = make_app(directory, ADMIN_TOKEN='secret')
+    second = make_app(directory, ADMIN_TOKEN='secret')
+    event_service.add_event('evt-shared', price=5.0, available_tickets=10)
+
+    response = first.test_client().put('/api/bookings/event/evt-shared/waiting-room',
+                                       json={'enabled': True, 'rate': 2}, headers=ADMIN)
+    assert response.status_code == 200
+    # The other worker sees the room open without being told
+    assert second.test_client().get('/api/bookings/event/evt-shared/waiting-room').get_json()['enabled']
+
+    def open_slots_at(next_slot_at):
+        with first.app_context():
+            WaitingRoomEvent.query.filter_by(event_id='evt-shared').update({'next_slot_at': next_slot_at})
+            db.session.commit()
+
+    # Hold dispatching back until everyone is in line
+    open_slots_at(time.time() + 3600)
+    tickets = []
+    for user_id in range(1, 5):
+        app = first if user_id % 2 else second
+        response = app.test_client().post('/api/bookings', json={'user_id': user_id, 'event_id': 'evt-shared', 'tickets': 1})
+        assert response.status_code == 202
+        tickets.append(response.get_json())
+    # One line: positions run on across both workers
+    assert [ticket['position'] for ticket in tickets] == [1, 2, 3, 4]
+
+    open_slots_at(0.0)
+    # Either worker answers for a ticket queued on the other
+    results = [wait_for_ticket(second.test_client(), ticket['ticket_id']) for ticket in tickets]
+    assert all(result['status_code'] == 201 for result in results)
+    with first.app_context():
+        assert [b.user_id for b in Booking.query.order_by(Booking.id)] == [1, 2, 3, 4]
+
+    # Both dispatchers take slots from the same rate: a burst of two, then a wait
+    room = first.extensions['waiting_room']
+    open_slots_at(0.0)
+    with first.app_context():
+        assert room.take_slot('evt-shared') == (True, 0)
+    with second.app_context():
+        assert second.extensions['waiting_room'].take_slot('evt-shared') == (True, 0)
+        admitted, retry_after = second.extensions['waiting_room'].take_slot('evt-shared')
+        assert not admitted and 0 < retry_after <= 0.5
+
+    print("✅ Test passed!")
+
+def test_configuring_needs_the_admin_token():
+    print_test_header("Waiting Room - Admin Authentication")
+    client = make_app(ADMIN_TOKEN='secret').test_client()
+    url = '/api/bookings/event/evt-guarded/waiting-room'
+
+    assert client.put(url, json={'enabled': True}).status_code == 401
+    assert client.put(url, json={'enabled': True}, headers={'Authorization': 'Bearer wrong'}).status_code == 401
+    assert client.get(url).get_json()['enabled'] is False
+
+    # Without an ADMIN_TOKEN nobody can open a waiting room
+    disabled = make_app().test_client()
+    assert disabled.put(url, json={'enabled': True}, headers=ADMIN).status_code == 403
+
+    print("✅ Test passed!")
+
+if __name__ == "__main__":
+    test_waiting_room_queues_and_dispatches_in_order()
+    test_disabled_waiting_room_books_inline()
+    test_workers_share_the_line()
+    test_configuring_needs_the_admin_token()
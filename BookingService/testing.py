@@ -0,0 +1,21 @@
+"""Helpers shared by the test files.
+
+Not named test_*.py, so neither run_tests.py nor pytest collects it.
+Import it after setting the environment variables the app reads at import.
+"""
+import os
+
+from app import create_app, db
+
+def make_app(directory=None, **config):
+    """An app with its tables created, configured with config.
+
+    With a directory the database is a SQLite file in it, so background
+    threads such as the saga workers or the group commit writer get
+    connections of their own; otherwise it is in memory.
+    """
+    database_url = f'sqlite:///{os.path.join(directory, "bookings.db")}' if directory else 'sqlite://'
+    app = create_app({'SQLALCHEMY_DATABASE_URI': database_url, **config})
+    with app.app_context():
+        db.create_all()
+    return app
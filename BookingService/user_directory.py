@@ -0,0 +1,150 @@
+"""Cached lookups of user profiles in UserService.
+
+Notifications need the recipient's email, and fetching it from UserService
+on every booking would add a blocking round trip. Profiles are kept in an
+LRU cache with a TTL, concurrent lookups of the same user share one
+request, and many users are resolved with one batch request. If UserService
+fails, lookups return nothing for a cool-down period instead of waiting on
+it again, and callers fall back to a placeholder address.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+class _Pending:
+    """A lookup in flight that other threads can wait for"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.profile = None
+
+    def set(self, profile):
+        self.profile = profile
+        self.done.set()
+
+    def wait(self, timeout):
+        self.done.wait(timeout)
+        return self.profile
+
+class UserDirectory:
+    def __init__(self, base_url, service_token=None, ttl=300, max_entries=10000, timeout=1.0,
+                 error_backoff=30, batch_size=100, http=None, clock=time.monotonic):
+        self.base_url = base_url
+        self.service_token = service_token
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.error_backoff = error_backoff
+        self.batch_size = batch_size
+        self.http = http
+        self.clock = clock
+        self.lock = threading.Lock()
+        # user_id -> (expires_at, profile or None for unknown users)
+        self.cache = OrderedDict()
+        self.inflight = {}
+        self.down_until = 0
+        self.stats = {'hits': 0, 'misses': 0, 'coalesced': 0, 'requests': 0, 'errors': 0}
+
+    def get(self, user_id, timeout=None):
+        """Profile of one user, or None if unknown or UserService is unavailable"""
+        return self.get_many([user_id], timeout).get(int(user_id))
+
+    def get_many(self, user_ids, timeout=None):
+        """Profiles of several users as {user_id: profile}; unresolved users are left out.
+
+        timeout overrides the seconds to wait on UserService for this call.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        results = {}
+        to_fetch = []
+        waiting = {}
+        now = self.clock()
+        with self.lock:
+            for user_id in dict.fromkeys(int(user_id) for user_id in user_ids):
+                entry = self.cache.get(user_id)
+                if entry is not None and entry[0] > now:
+                    self.cache.move_to_end(user_id)
+                    results[user_id] = entry[1]
+                    self.stats['hits'] += 1
+                elif user_id in self.inflight:
+                    waiting[user_id] = self.inflight[user_id]
+                    self.stats['coalesced'] += 1
+                else:
+                    self.inflight[user_id] = _Pending()
+                    to_fetch.append(user_id)
+                    self.stats['misses'] += 1
+
+        if to_fetch:
+            fetched = self._fetch(to_fetch, timeout)
+            with self.lock:
+                for user_id in to_fetch:
+                    profile = fetched.get(user_id) if fetched is not None else None
+                    # Failures are not cached, so the next lookup tries again
+                    if fetched is not None:
+                        self._store(user_id, profile)
+                    self.inflight.pop(user_id).set(profile)
+                    results[user_id] = profile
+
+        for user_id, pending in waiting.items():
+            results[user_id] = pending.wait(timeout * 2)
+
+        return {user_id: profile for user_id, profile in results.items() if profile is not None}
+
+    def email_for(self, user_id, timeout=None):
+        profile = self.get(user_id, timeout)
+        if profile and profile.get('email'):
+            return profile['email']
+        return f"user{user_id}@example.com"
+
+    def emails_for(self, user_ids):
+        """{user_id: email} for several users with one round trip per batch"""
+        profiles = self.get_many(user_ids)
+        return {
+            int(user_id): (profiles.get(int(user_id)) or {}).get('email') or f"user{user_id}@example.com"
+            for user_id in user_ids
+        }
+
+    def _store(self, user_id, profile):
+        self.cache[user_id] = (self.clock() + self.ttl, profile)
+        self.cache.move_to_end(user_id)
+        while len(self.cache) > self.max_entries:
+            self.cache.popitem(last=False)
+
+    def _fetch(self, user_ids, timeout):
+        """{user_id: profile} from UserService, or None if it failed"""
+        if self.clock() < self.down_until:
+            return None
+
+        if self.http is None:
+            from clients import get_http_session
+            http = get_http_session()
+        else:
+            http = self.http
+        headers = {'x-service-token': self.service_token} if self.service_token else {}
+
+        profiles = {}
+        try:
+            for start in range(0, len(user_ids), self.batch_size):
+                batch = user_ids[start:start + self.batch_size]
+                with self.lock:
+                    self.stats['requests'] += 1
+                response = http.get(
+                    f'{self.base_url}/api/users/lookup',
+                    params={'ids': ','.join(str(user_id) for user_id in batch)},
+                    headers=headers,
+                    timeout=timeout
+                )
+                response.raise_for_status()
+                for profile in response.json():
+                    profiles[int(profile['id'])] = profile
+        except Exception as e:
+            print(f"Error looking up users in UserService: {e}")
+            with self.lock:
+                self.stats['errors'] += 1
+            self.down_until = self.clock() + self.error_backoff
+            return None
+        return profiles
+
+    def snapshot(self):
+        with self.lock:
+            return {'cached_users': len(self.cache), **self.stats}
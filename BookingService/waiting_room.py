@@ -0,0 +1,326 @@
+"""Virtual waiting room for high-demand events.
+
+While an event's waiting room is enabled, booking requests are queued and
+handed a ticket instead of being processed inline. Dispatchers drain each
+event's line in arrival order at a fixed rate, so the load on EventService
+and the database stays flat however many clients arrive at once. Clients
+poll their ticket for its position and result.
+
+Tickets are rows of the waiting_room_tickets table and each event's rate is
+a row of waiting_rooms, so every worker process shares one line and one
+rate per event. Each process runs a dispatcher thread once it has queued or
+been asked about a ticket; dispatchers take the event's next dispatch slot
+with a conditional update on the room's version, then claim the first
+ticket in line under a lease, so several can run at once without exceeding
+the rate, and a ticket whose dispatcher died is picked up again.
+"""
+import argparse
+import json
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, or_
+from sqlalchemy.exc import IntegrityError
+
+class WaitingRoom:
+    """Per-event booking lines in the database, drained by a dispatcher per process.
+
+    `process` is called as process(user_id, event_id, tickets) inside an
+    application context and must return (response_body, status_code).
+    Events in enabled_events have their waiting room open until configured
+    otherwise.
+    """
+
+    def __init__(self, app, process, default_rate=10, max_queue_length=100000, result_ttl=600,
+                 enabled_events=(), lease=60.0, poll_interval=1.0, refresh_interval=1.0):
+        self.app = app
+        self.process = process
+        self.default_rate = default_rate
+        self.max_queue_length = max_queue_length
+        self.result_ttl = result_ttl
+        self.enabled_events = set(enabled_events)
+        self.lease = lease
+        self.poll_interval = poll_interval
+        # Seconds is_enabled trusts its answer before asking the database again
+        self.refresh_interval = refresh_interval
+        # event_id -> (enabled, monotonic time it was read)
+        self.enabled_cache = {}
+        self.expired_at = 0.0
+        self.condition = threading.Condition()
+        self.thread = None
+
+    def targets(self):
+        """Databases holding waiting room tickets: every shard, or just the primary"""
+        router = self.app.extensions.get('shards')
+        return router.shards if router else [None]
+
+    def _bind(self, target):
+        from app import use_shard
+        if target is not None:
+            use_shard(target)
+
+    def configure(self, event_id, enabled, rate=None):
+        """Open or close an event's waiting room; must be called in an app context"""
+        from app import db, use_event_shard, WaitingRoomEvent
+        use_event_shard(event_id)
+        room = WaitingRoomEvent.query.get(event_id)
+        if room is None:
+            room = WaitingRoomEvent(event_id=event_id, next_slot_at=0.0, version=0)
+            db.session.add(room)
+        room.enabled = enabled
+        if rate:
+            room.rate = rate
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Created by another process just now
+            db.session.rollback()
+            return self.configure(event_id, enabled, rate)
+        self.enabled_cache.pop(event_id, None)
+        if enabled:
+            self.kick()
+        return self.event_status(event_id)
+
+    def event_status(self, event_id):
+        from app import use_event_shard, WaitingRoomEvent, WaitingRoomTicket
+        use_event_shard(event_id)
+        room = WaitingRoomEvent.query.get(event_id)
+        enabled = room.enabled if room is not None else event_id in self.enabled_events
+        rate = room.rate if room is not None else None
+        return {
+            'event_id': event_id,
+            'enabled': enabled,
+            'rate': rate or (self.default_rate if enabled else None),
+            'waiting': WaitingRoomTicket.query.filter_by(event_id=event_id, state='WAITING').count()
+        }
+
+    def is_enabled(self, event_id):
+        if event_id is None:
+            return False
+        cached = self.enabled_cache.get(event_id)
+        if cached is not None and time.monotonic() - cached[1] < self.refresh_interval:
+            return cached[0]
+
+        from app import use_event_shard, WaitingRoomEvent
+        use_event_shard(event_id)
+        room = WaitingRoomEvent.query.get(event_id)
+        enabled = room.enabled if room is not None else event_id in self.enabled_events
+        self.enabled_cache[event_id] = (enabled, time.monotonic())
+        return enabled
+
+    def enqueue(self, user_id, event_id, tickets):
+        """Queue a booking request; return (ticket, error)"""
+        from app import db, use_event_shard, WaitingRoomTicket
+        use_event_shard(event_id)
+        active_key = f'{user_id}:{event_id}'
+        existing = WaitingRoomTicket.query.filter_by(active_key=active_key).first()
+        if existing is not None:
+            # One place in line per user and event; retries get the same ticket
+            return self.ticket_status(existing), None
+
+        if WaitingRoomTicket.query.filter_by(event_id=event_id, state='WAITING').count() >= self.max_queue_length:
+            return None, 'Waiting room is full'
+
+        ticket = WaitingRoomTicket(
+            ticket_id=uuid.uuid4().hex,
+            user_id=user_id,
+            event_id=event_id,
+            tickets=tickets,
+            state='WAITING',
+            active_key=active_key,
+            created_at=datetime.utcnow()
+        )
+        db.session.add(ticket)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Queued by a concurrent retry of the same user
+            db.session.rollback()
+            return self.ticket_status(WaitingRoomTicket.query.filter_by(active_key=active_key).one()), None
+        self.kick()
+        return self.ticket_status(ticket), None
+
+    def ticket_status(self, ticket):
+        """The ticket as returned to the client, with its place in line"""
+        from app import WaitingRoomTicket
+        position = 0
+        if ticket.state == 'WAITING':
+            position = WaitingRoomTicket.query.filter(
+                WaitingRoomTicket.event_id == ticket.event_id,
+                WaitingRoomTicket.state == 'WAITING',
+                WaitingRoomTicket.id <= ticket.id
+            ).count()
+        return ticket.to_dict(position)
+
+    def get_ticket(self, ticket_id):
+        """A ticket's status from whichever database holds it, or None"""
+        from app import WaitingRoomTicket
+        # The client may be polling a worker that has not dispatched yet
+        self.kick()
+        for target in self.targets():
+            self._bind(target)
+            ticket = WaitingRoomTicket.query.filter_by(ticket_id=ticket_id).first()
+            if ticket is not None:
+                return self.ticket_status(ticket)
+        return None
+
+    def kick(self):
+        """Start this process's dispatcher if needed and have it look for tickets now"""
+        # Started on first use rather than at app creation so forked workers
+        # each get their own thread
+        with self.condition:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, name='waiting-room-dispatcher', daemon=True)
+                self.thread.start()
+            self.condition.notify()
+
+    def _due(self, now):
+        from app import WaitingRoomTicket
+        return or_(WaitingRoomTicket.state == 'WAITING',
+                   and_(WaitingRoomTicket.state == 'PROCESSING', WaitingRoomTicket.lease_until < now))
+
+    def take_slot(self, event_id):
+        """Take the event's next dispatch slot, shared with every other dispatcher.
+
+        The room's next_slot_at moves 1 / rate seconds ahead per dispatch,
+        allowing a burst of one second's worth. Returns (admitted,
+        retry_after); a slot lost to another dispatcher is retried at once.
+        Must be called in an app context bound to the event's database.
+        """
+        from app import db, WaitingRoomEvent
+        room = WaitingRoomEvent.query.get(event_id)
+        if room is None:
+            db.session.add(WaitingRoomEvent(event_id=event_id, enabled=event_id in self.enabled_events,
+                                            next_slot_at=0.0, version=0))
+            try:
+                db.session.commit()
+            except IntegrityError:
+                db.session.rollback()
+            return False, 0
+
+        rate = room.rate or self.default_rate
+        interval = 1.0 / rate
+        now = time.time()
+        next_slot_at = max(room.next_slot_at, now)
+        retry_after = next_slot_at - now - (max(1, int(rate)) - 1) * interval
+        if retry_after > 0:
+            return False, retry_after
+
+        updated = WaitingRoomEvent.query.filter_by(event_id=event_id, version=room.version).update({
+            'next_slot_at': next_slot_at + interval,
+            'version': room.version + 1
+        }, synchronize_session=False)
+        db.session.commit()
+        return bool(updated), 0
+
+    def _claim_ticket(self, event_id, now):
+        """Claim the event's first ticket in line under a lease; return its fields or None"""
+        from app import db, WaitingRoomTicket
+        first = WaitingRoomTicket.query.filter(
+            WaitingRoomTicket.event_id == event_id, self._due(now)
+        ).order_by(WaitingRoomTicket.id).limit(10).all()
+        for ticket in first:
+            claimed = (ticket.ticket_id, ticket.user_id, ticket.event_id, ticket.tickets)
+            updated = WaitingRoomTicket.query.filter(
+                WaitingRoomTicket.id == ticket.id, self._due(now)
+            ).update({
+                'state': 'PROCESSING',
+                'lease_until': now + timedelta(seconds=self.lease)
+            }, synchronize_session=False)
+            db.session.commit()
+            if updated:
+                return claimed
+        return None
+
+    def _claim_next(self):
+        """Claim the next ticket of every event whose rate allows one; return (tickets, wait)"""
+        from app import db, WaitingRoomTicket
+        now = datetime.utcnow()
+        events = [event_id for (event_id,) in
+                  db.session.query(WaitingRoomTicket.event_id).filter(self._due(now)).distinct()]
+        claimed = []
+        wait = self.poll_interval
+        for event_id in events:
+            admitted, retry_after = self.take_slot(event_id)
+            if not admitted:
+                wait = min(wait, retry_after)
+                continue
+            ticket = self._claim_ticket(event_id, now)
+            if ticket is not None:
+                claimed.append(ticket)
+        return claimed, wait
+
+    def _expire_results(self):
+        from app import db, WaitingRoomTicket
+        if time.monotonic() - self.expired_at < self.result_ttl / 10:
+            return
+        WaitingRoomTicket.query.filter(
+            WaitingRoomTicket.state == 'DONE',
+            WaitingRoomTicket.completed_at < datetime.utcnow() - timedelta(seconds=self.result_ttl)
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        self.expired_at = time.monotonic()
+
+    def _process(self, target, ticket_id, user_id, event_id, tickets):
+        from app import db, WaitingRoomTicket
+        try:
+            with self.app.app_context():
+                result, status_code = self.process(user_id, event_id, tickets)
+        except Exception as e:
+            print(f"Error processing waiting room ticket {ticket_id}: {e}")
+            result, status_code = {'error': 'Failed to process booking'}, 500
+
+        with self.app.app_context():
+            self._bind(target)
+            WaitingRoomTicket.query.filter_by(ticket_id=ticket_id, state='PROCESSING').update({
+                'state': 'DONE',
+                'status_code': status_code,
+                'result': json.dumps(result),
+                'active_key': None,
+                'lease_until': None,
+                'completed_at': datetime.utcnow()
+            }, synchronize_session=False)
+            db.session.commit()
+
+    def _run(self):
+        while True:
+            wait = self.poll_interval
+            for target in self.targets():
+                try:
+                    with self.app.app_context():
+                        self._bind(target)
+                        self._expire_results()
+                        claimed, retry_after = self._claim_next()
+                except Exception as e:
+                    print(f"Error dispatching waiting room tickets: {e}")
+                    continue
+                wait = min(wait, retry_after)
+                for ticket in claimed:
+                    self._process(target, *ticket)
+                    wait = 0
+
+            if wait > 0:
+                with self.condition:
+                    self.condition.wait(wait)
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Manage waiting room tables')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('init', help='Create the waiting room tables')
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_arguments()
+
+    from app import create_app, db, WaitingRoomEvent, WaitingRoomTicket
+
+    app = create_app({'SAGA_WORKERS': 0})
+    with app.app_context():
+        router = app.extensions.get('shards')
+        for shard in (router.shards if router else [None]):
+            engine = shard.connect() if shard else db.engine
+            WaitingRoomEvent.__table__.create(engine, checkfirst=True)
+            WaitingRoomTicket.__table__.create(engine, checkfirst=True)
+        print("✅ Waiting room tables are ready")
@@ -33,7 +33,7 @@ async function checkQueueStatus() {
         
         // Create the queue if it doesn't exist
         console.log(`Creating queue: ${queueName}`);
-        await channel.assertQueue(queueName, { durable: true });
+        await channel.assertQueue(queueName, { durable: true, maxPriority: parseInt(process.env.RABBITMQ_MAX_PRIORITY || '10', 10) });
         console.log('✅ Queue created successfully');
         
         const newQueueInfo = await channel.checkQueue(queueName);
@@ -0,0 +1,192 @@
+const crypto = require('crypto');
+
+/**
+ * The most recently delivered message IDs, oldest evicted first
+ */
+class RecentIds {
+  /**
+   * @param {number} maxEntries - IDs remembered before the oldest is evicted
+   */
+  constructor(maxEntries = 100000) {
+    this.maxEntries = maxEntries;
+    // A Set iterates in insertion order, so the first entry is the oldest
+    this.ids = new Set();
+  }
+
+  has(messageId) {
+    return this.ids.has(messageId);
+  }
+
+  get size() {
+    return this.ids.size;
+  }
+
+  add(messageId) {
+    this.ids.delete(messageId);
+    this.ids.add(messageId);
+    while (this.ids.size > this.maxEntries) {
+      this.ids.delete(this.ids.values().next().value);
+    }
+  }
+}
+
+/**
+ * Messages of one booking waiting for their window to close
+ */
+class Batch {
+  constructor() {
+    this.message = null;
+    this.messageId = null;
+    this.tag = null;
+    this.timer = null;
+    // Tags and IDs of the messages the latest one replaced
+    this.replacedTags = [];
+    this.replacedIds = [];
+  }
+
+  add(message, messageId, tag) {
+    // Priorities can reorder a booking's messages, so the latest status is
+    // decided by the publisher's timestamp rather than arrival order
+    if (this.message === null || String(message.timestamp || '') >= String(this.message.timestamp || '')) {
+      if (this.message !== null) {
+        this.replacedTags.push(this.tag);
+        this.replacedIds.push(this.messageId);
+      }
+      this.message = message;
+      this.messageId = messageId;
+      this.tag = tag;
+    } else {
+      this.replacedTags.push(tag);
+      this.replacedIds.push(messageId);
+    }
+  }
+
+  ids() {
+    return this.replacedIds.concat([this.messageId]);
+  }
+}
+
+/**
+ * Merges a booking's notifications and drops redeliveries before they are processed.
+ *
+ * A successful booking publishes PENDING and CONFIRMED a few milliseconds
+ * apart. Messages of the same booking arriving within windowMs are merged
+ * into the one with the latest timestamp, so only that one is delivered.
+ * IDs of delivered messages are remembered in a bounded store, and repeats
+ * are acknowledged without being delivered again. Replaced messages are
+ * acknowledged only once the message that replaced them is delivered; if
+ * delivery fails they are settled and only the latest message is rejected.
+ */
+class Coalescer {
+  /**
+   * @param {Object} options
+   * @param {Function} options.deliver - async (message) => processes a message
+   * @param {Function} options.ack - (tag) => acknowledges a message
+   * @param {Function} options.reject - (tag, error) => rejects a message whose delivery failed
+   * @param {number} options.windowMs - How long to wait for newer messages of a booking, 0 to deliver at once
+   * @param {number} options.maxPending - Bookings waiting at once before the oldest is delivered early
+   * @param {RecentIds} options.seen - Store of delivered message IDs
+   */
+  constructor({ deliver, ack, reject, windowMs = 500, maxPending = 1000, seen = new RecentIds() }) {
+    this.deliver = deliver;
+    this.ack = ack;
+    this.reject = reject;
+    this.windowMs = windowMs;
+    this.maxPending = maxPending;
+    this.seen = seen;
+    // booking_id -> Batch, in the order their windows close
+    this.pending = new Map();
+    // IDs of messages waiting or being delivered
+    this.pendingIds = new Set();
+    this.stats = { received: 0, duplicates: 0, coalesced: 0, delivered: 0, failed: 0 };
+  }
+
+  /**
+   * Add a message; resolves once it is delivered if it is not held in a window
+   * @param {Object} message - The parsed message
+   * @param {string} messageId - The publisher's message ID
+   * @param {*} tag - Passed back to ack and reject
+   * @returns {Promise}
+   */
+  add(message, messageId, tag) {
+    this.stats.received += 1;
+    if (this.seen.has(messageId) || this.pendingIds.has(messageId)) {
+      this.stats.duplicates += 1;
+      this.ack(tag);
+      return Promise.resolve();
+    }
+    this.pendingIds.add(messageId);
+
+    const bookingId = message.booking_id;
+    if (bookingId === undefined || bookingId === null || this.windowMs <= 0) {
+      const batch = new Batch();
+      batch.add(message, messageId, tag);
+      return this._deliver(batch);
+    }
+
+    let batch = this.pending.get(bookingId);
+    if (batch === undefined) {
+      batch = new Batch();
+      batch.timer = setTimeout(() => this._flushBooking(bookingId), this.windowMs);
+      this.pending.set(bookingId, batch);
+    } else {
+      this.stats.coalesced += 1;
+    }
+    batch.add(message, messageId, tag);
+
+    // Unacknowledged messages are bounded by the prefetch, but a large
+    // prefetch should not hold an unbounded number of bookings back
+    const flushed = [];
+    while (this.pending.size > this.maxPending) {
+      flushed.push(this._flushBooking(this.pending.keys().next().value));
+    }
+    return Promise.all(flushed);
+  }
+
+  /**
+   * Deliver every waiting message without waiting for its window to close
+   * @returns {Promise}
+   */
+  flush() {
+    return Promise.all(Array.from(this.pending.keys(), (bookingId) => this._flushBooking(bookingId)));
+  }
+
+  _flushBooking(bookingId) {
+    const batch = this.pending.get(bookingId);
+    if (batch === undefined) {
+      return Promise.resolve();
+    }
+    this.pending.delete(bookingId);
+    clearTimeout(batch.timer);
+    return this._deliver(batch);
+  }
+
+  async _deliver(batch) {
+    try {
+      await this.deliver(batch.message);
+    } catch (error) {
+      this.stats.failed += 1;
+      // The replaced messages are settled; the latest one is retried
+      batch.replacedIds.forEach((messageId) => this.seen.add(messageId));
+      batch.replacedTags.forEach((tag) => this.ack(tag));
+      batch.ids().forEach((messageId) => this.pendingIds.delete(messageId));
+      this.reject(batch.tag, error);
+      return;
+    }
+    this.stats.delivered += 1;
+    for (const messageId of batch.ids()) {
+      this.seen.add(messageId);
+      this.pendingIds.delete(messageId);
+    }
+    batch.replacedTags.concat([batch.tag]).forEach((tag) => this.ack(tag));
+  }
+}
+
+/**
+ * The publisher's message ID, or a hash of the body for messages without one
+ * @param {Object} msg - The RabbitMQ message
+ * @returns {string}
+ */
+const messageIdOf = (msg) => msg.properties.messageId || crypto.createHash('sha1').update(msg.content).digest('hex');
+
+module.exports = { Coalescer, RecentIds, messageIdOf };
@@ -1,10 +1,22 @@
 const amqp = require('amqplib');
 const notificationService = require('../services/notificationService');
+const { Coalescer, RecentIds, messageIdOf } = require('./coalescer');
 require('dotenv').config();
 
 // RabbitMQ connection details
 const rabbitmqHost = process.env.RABBITMQ_HOST || 'localhost';
 const queueName = process.env.RABBITMQ_QUEUE || 'booking_notifications';
+const exchangeName = process.env.RABBITMQ_EXCHANGE || 'booking_events';
+const maxPriority = parseInt(process.env.RABBITMQ_MAX_PRIORITY || '10', 10);
+// Routing keys are booking.<status>.<event_id>; comma-separated patterns
+const bindingPatterns = (process.env.RABBITMQ_BINDINGS || 'booking.#').split(',').map(p => p.trim()).filter(Boolean);
+// Messages in the coalescing window are still unacknowledged, so the
+// prefetch has to cover a window's worth of them
+const prefetch = parseInt(process.env.RABBITMQ_PREFETCH || '100', 10);
+const coalesceWindowMs = parseInt(process.env.NOTIFICATION_COALESCE_MS || '500', 10);
+
+// Kept across reconnects, so redeliveries after a dropped connection are caught too
+const seenMessageIds = new RecentIds(parseInt(process.env.NOTIFICATION_DEDUPE_SIZE || '100000', 10));
 
 /**
  * Format the message data to ensure it's compatible with MongoDB schema
@@ -47,6 +59,33 @@ const acknowledgeMessage = (channel, msg, reason = 'success') => {
   }
 };
 
+/**
+ * Reject a message whose processing failed, requeueing it unless it can never succeed
+ * @param {Object} channel - The RabbitMQ channel
+ * @param {Object} msg - The message to reject
+ * @param {Error} error - Why processing failed
+ */
+const rejectMessage = (channel, msg, error) => {
+  console.error('❌ Error processing message:', error);
+  
+  // In a production environment, you might want to implement a dead-letter queue
+  try {
+    // Decide whether to requeue based on the error type
+    const requeue = error.name !== 'MongoServerError' && error.name !== 'ValidationError';
+    
+    if (requeue) {
+      console.log('⏳ Message requeued for retry');
+      channel.nack(msg, false, true);
+    } else {
+      console.log('❌ Message rejected and not requeued');
+      // Still acknowledge to remove from queue, but log the rejection
+      acknowledgeMessage(channel, msg, `error: ${error.name}`);
+    }
+  } catch (nackError) {
+    console.error('Error handling message rejection:', nackError);
+  }
+};
+
 /**
  * Start the RabbitMQ consumer
  * @returns {Promise} - Resolves when the consumer is started
@@ -61,16 +100,33 @@ const startConsumer = async () => {
     connection = await amqp.connect(`amqp://${rabbitmqHost}`);
     channel = await connection.createChannel();
     
-    // Make sure the queue exists
-    await channel.assertQueue(queueName, { durable: true });
+    // Make sure the exchange and queue exist and the queue gets the messages we want
+    await channel.assertExchange(exchangeName, 'topic', { durable: true });
+    await channel.assertQueue(queueName, { durable: true, maxPriority });
+    for (const pattern of bindingPatterns) {
+      await channel.bindQueue(queueName, exchangeName, pattern);
+    }
     
     // Get queue info to see how many messages are in the queue
     const queueInfo = await channel.checkQueue(queueName);
     console.log(`🔍 Connected to queue: ${queueName}`);
     console.log(`📊 Queue stats: ${queueInfo.messageCount} messages, ${queueInfo.consumerCount} consumers`);
     
-    // Set prefetch to 1 to ensure we process one message at a time
-    channel.prefetch(1);
+    channel.prefetch(prefetch);
+    
+    // A booking's messages are merged and redeliveries dropped before they
+    // are stored and sent
+    const coalescer = new Coalescer({
+      deliver: async (formattedData) => {
+        // Process the notification with the formatted data
+        const savedNotification = await notificationService.processNotification(formattedData);
+        console.log(`💾 Notification saved to MongoDB with ID: ${savedNotification._id}`);
+      },
+      ack: (msg) => acknowledgeMessage(channel, msg, 'successfully processed'),
+      reject: (msg, error) => rejectMessage(channel, msg, error),
+      windowMs: coalesceWindowMs,
+      seen: seenMessageIds
+    });
     
     // Consume messages from the queue
     channel.consume(queueName, async (msg) => {
@@ -97,44 +153,10 @@ const startConsumer = async () => {
           // Format the message data for MongoDB
           const formattedData = formatMessageForMongoDB(content);
           
-          // Process the notification with the formatted data
-          const savedNotification = await notificationService.processNotification(formattedData);
-          console.log(`💾 Notification saved to MongoDB with ID: ${savedNotification._id}`);
-          
-          // Acknowledge the message to remove it from the queue
-          acknowledgeMessage(channel, msg, 'successfully processed');
-          
-          // Get updated queue info
-          try {
-            const updatedQueueInfo = await channel.checkQueue(queueName);
-            console.log(`📊 Updated queue stats: ${updatedQueueInfo.messageCount} messages remaining`);
-          } catch (queueCheckError) {
-            console.error('Error checking queue stats:', queueCheckError);
-          }
-          
-          console.log('✅ Message processed successfully and removed from queue');
+          // Delivered and acknowledged once its coalescing window closes
+          await coalescer.add(formattedData, messageIdOf(msg), msg);
         } catch (error) {
-          console.error('❌ Error processing message:', error);
-          
-          // If the channel is still open, reject the message
-          // In a production environment, you might want to implement a dead-letter queue
-          try {
-            if (channel && channel.nack) {
-              // Decide whether to requeue based on the error type
-              const requeue = error.name !== 'MongoServerError' && error.name !== 'ValidationError';
-              
-              if (requeue) {
-                console.log('⏳ Message requeued for retry');
-                channel.nack(msg, false, true);
-              } else {
-                console.log('❌ Message rejected and not requeued');
-                // Still acknowledge to remove from queue, but log the rejection
-                acknowledgeMessage(channel, msg, `error: ${error.name}`);
-              }
-            }
-          } catch (nackError) {
-            console.error('Error handling message rejection:', nackError);
-          }
+          console.error('❌ Error handling message:', error);
         }
       }
     });
@@ -143,6 +165,8 @@ const startConsumer = async () => {
     process.on('SIGINT', async () => {
       console.log('Closing RabbitMQ connection...');
       try {
+        await coalescer.flush();
+        console.log('📊 Notification stats:', coalescer.stats);
         if (channel) await channel.close();
         if (connection) await connection.close();
       } catch (err) {
@@ -1,4 +1,6 @@
+const assert = require('assert');
 const amqp = require('amqplib');
+const { Coalescer, RecentIds } = require('./rabbitmq/coalescer');
 require('dotenv').config();
 
 // RabbitMQ connection details
@@ -32,7 +34,7 @@ async function publishTestMessages(count = 3) {
     channel = await connection.createChannel();
     
     console.log(`Asserting queue: ${queueName}`);
-    await channel.assertQueue(queueName, { durable: true });
+    await channel.assertQueue(queueName, { durable: true, maxPriority: parseInt(process.env.RABBITMQ_MAX_PRIORITY || '10', 10) });
     
     // Get queue info before publishing
     const queueInfoBefore = await channel.checkQueue(queueName);
@@ -88,8 +90,105 @@ async function publishTestMessages(count = 3) {
   }
 }
 
-// Get the number of messages to publish from command line argument or default to 3
-const messageCount = process.argv[2] ? parseInt(process.argv[2]) : 3;
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
 
-// Run the function
-publishTestMessages(messageCount); 
\ No newline at end of file
+const notification = (bookingId, status, second) => ({
+  booking_id: bookingId,
+  status,
+  timestamp: `2026-10-19T12:00:${String(second).padStart(2, '0')}`
+});
+
+/**
+ * Check the consumer's coalescing stage without RabbitMQ or MongoDB
+ */
+async function testCoalescing() {
+  const delivered = [];
+  const acked = [];
+  const rejected = [];
+  let failures = 0;
+  const coalescer = new Coalescer({
+    deliver: async (message) => {
+      if (failures > 0) {
+        failures -= 1;
+        throw new Error('SMTP unavailable');
+      }
+      delivered.push(message);
+    },
+    ack: (tag) => acked.push(tag),
+    reject: (tag) => rejected.push(tag),
+    windowMs: 50
+  });
+
+  // A booking's PENDING and CONFIRMED become one send
+  let tag = 0;
+  for (let bookingId = 0; bookingId < 100; bookingId++) {
+    for (const [status, second] of [['PENDING', 0], ['CONFIRMED', 1]]) {
+      tag += 1;
+      await coalescer.add(notification(bookingId, status, second), `${bookingId}-${status}`, tag);
+    }
+  }
+  // Nothing is sent or acknowledged while the windows are open
+  assert.deepStrictEqual(delivered, []);
+  assert.deepStrictEqual(acked, []);
+  await sleep(100);
+  assert.strictEqual(delivered.length, 100);
+  assert.ok(delivered.every((message) => message.status === 'CONFIRMED'));
+  assert.strictEqual(acked.length, 200);
+  assert.strictEqual(coalescer.stats.coalesced, 100);
+  console.log('✅ 200 messages of 100 bookings were delivered as 100 notifications');
+
+  // CONFIRMED has the higher priority and overtakes the older PENDING
+  delivered.length = 0;
+  acked.length = 0;
+  await coalescer.add(notification(200, 'CONFIRMED', 1), 'confirmed-200', 1);
+  await coalescer.add(notification(200, 'PENDING', 0), 'pending-200', 2);
+  await coalescer.flush();
+  assert.deepStrictEqual(delivered.map((message) => message.status), ['CONFIRMED']);
+  assert.deepStrictEqual(acked.sort(), [1, 2]);
+  console.log('✅ The latest timestamp wins when priorities reorder messages');
+
+  // Redeliveries, delivered or still waiting in their window, are dropped
+  delivered.length = 0;
+  acked.length = 0;
+  await coalescer.add(notification(200, 'CONFIRMED', 1), 'confirmed-200', 3);
+  await coalescer.add(notification(201, 'PENDING', 0), 'pending-201', 4);
+  await coalescer.add(notification(201, 'PENDING', 0), 'pending-201', 5);
+  assert.deepStrictEqual(acked, [3, 5]);
+  await coalescer.flush();
+  assert.strictEqual(delivered.length, 1);
+  assert.strictEqual(coalescer.stats.duplicates, 2);
+  console.log('✅ Redelivered messages are dropped');
+
+  // After a failed delivery the replaced PENDING is settled and the
+  // CONFIRMED goes back to the queue
+  acked.length = 0;
+  failures = 1;
+  await coalescer.add(notification(202, 'PENDING', 0), 'pending-202', 6);
+  await coalescer.add(notification(202, 'CONFIRMED', 1), 'confirmed-202', 7);
+  await coalescer.flush();
+  assert.deepStrictEqual(acked, [6]);
+  assert.deepStrictEqual(rejected, [7]);
+  await coalescer.add(notification(202, 'CONFIRMED', 1), 'confirmed-202', 8);
+  await coalescer.flush();
+  assert.deepStrictEqual(acked, [6, 8]);
+  console.log('✅ A failed delivery is retried');
+
+  // The dedupe store evicts the least recently used IDs
+  const seen = new RecentIds(2);
+  ['a', 'b', 'a', 'c'].forEach((messageId) => seen.add(messageId));
+  assert.ok(!seen.has('b') && seen.has('a') && seen.has('c') && seen.size === 2);
+  console.log('✅ The dedupe store is bounded');
+}
+
+if (process.argv[2] === '--coalesce') {
+  testCoalescing().catch((error) => {
+    console.error('❌ Coalescing test failed:', error);
+    process.exit(1);
+  });
+} else {
+  // Get the number of messages to publish from command line argument or default to 3
+  const messageCount = process.argv[2] ? parseInt(process.argv[2]) : 3;
+
+  // Run the function
+  publishTestMessages(messageCount);
+}
@@ -0,0 +1,19 @@
+const crypto = require('crypto');
+
+// Hashing first gives both sides the same length, which timingSafeEqual requires
+const digest = value => crypto.createHash('sha256').update(value).digest();
+
+module.exports = function(req, res, next) {
+  // Internal endpoints are called by other services, not end users. They
+  // stay closed until SERVICE_TOKEN is set, and callers must present it.
+  const expected = process.env.SERVICE_TOKEN;
+  if (!expected) {
+    return res.status(403).json({ message: 'Internal API is disabled; set SERVICE_TOKEN' });
+  }
+
+  const token = req.header('x-service-token');
+  if (!token || !crypto.timingSafeEqual(digest(token), digest(expected))) {
+    return res.status(401).json({ message: 'Invalid service token' });
+  }
+  next();
+};
@@ -3,6 +3,7 @@ const { Pool } = require('pg');
 const axios = require('axios');
 const router = express.Router();
 const auth = require('../middleware/auth');
+const serviceAuth = require('../middleware/serviceAuth');
 
 const pool = new Pool({
   user: process.env.DB_USER || 'postgres',
@@ -31,6 +32,33 @@ router.get('/me', auth, async (req, res) => {
   }
 });
 
+// Look up several users at once (for other services, e.g. notification recipients)
+router.get('/lookup', serviceAuth, async (req, res) => {
+  try {
+    const ids = String(req.query.ids || '')
+      .split(',')
+      .map(id => parseInt(id, 10))
+      .filter(id => !Number.isNaN(id));
+    
+    if (ids.length === 0) {
+      return res.status(400).json({ message: 'ids is required' });
+    }
+    if (ids.length > 100) {
+      return res.status(400).json({ message: 'At most 100 ids per request' });
+    }
+    
+    const userResult = await pool.query(
+      'SELECT id, username, email, full_name FROM users WHERE id = ANY($1::int[])',
+      [ids]
+    );
+    
+    res.json(userResult.rows);
+  } catch (error) {
+    console.error('Error looking up users:', error);
+    res.status(500).json({ message: 'Server error' });
+  }
+});
+
 // Get all events (communicates with Event Service)
 router.get('/events', auth, async (req, res) => {
   try {
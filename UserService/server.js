@@ -39,4 +39,7 @@ app.get('/health', (req, res) => {
 
 app.listen(PORT, () => {
   console.log(`User Service running on port ${PORT}`);
+  if (!process.env.SERVICE_TOKEN) {
+    console.warn('SERVICE_TOKEN is not set; internal endpoints such as /api/users/lookup will refuse every request');
+  }
 });